@@ -1,8 +1,14 @@
+import os
+import sys
+
 import cv2
 import mediapipe as mp
 import math
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib", "wrappers", "python"))
+from pipeline import Pipeline
+
 width = 1280
 height = 720
 
@@ -56,6 +62,42 @@ def draw_palm_box(frame, palm_landmarks, scale_factor=1, output_size=(20, 20), u
     return upscaled_frame
 
 
+def read_frame(cap):
+    ret, frame = cap.read()
+    if not ret:
+        return None
+    return cv2.flip(frame, 1)
+
+
+def detect_hands(hands, frame):
+    # Convert the BGR image to RGB
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    results = hands.process(rgb_frame)
+    return frame, results.multi_hand_landmarks
+
+
+def draw_hands(detection):
+    frame, multi_hand_landmarks = detection
+
+    if multi_hand_landmarks:
+        for hand_landmarks in multi_hand_landmarks:
+            upscaled_frame = draw_palm_box(frame, hand_landmarks.landmark, output_size=(60, 40), upscale_factor=50)
+    else:
+        # Show a black screen when no landmarks are found
+        upscaled_frame = draw_palm_box(frame, [], output_size=(60, 40), upscale_factor=50)
+    return frame, upscaled_frame
+
+
+def show_hands(frames):
+    frame, upscaled_frame = frames
+    cv2.imshow("Hand Tracking", upscaled_frame)
+    cv2.imshow("Hand", frame)
+
+    if cv2.waitKey(1) & 0xFF == ord('q'):
+        return False
+
+
 def hand_tracking():
     mp_hands = mp.solutions.hands
     hands = mp_hands.Hands(
@@ -69,33 +111,20 @@ def hand_tracking():
     cap.set(3, width)
     cap.set(4, height)
 
-    while True:
-        ret, frame = cap.read()
-
-        frame = cv2.flip(frame, 1)
-
-        # Convert the BGR image to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        results = hands.process(rgb_frame)
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                upscaled_frame = draw_palm_box(frame, hand_landmarks.landmark, output_size=(60, 40), upscale_factor=50)
-                cv2.imshow("Hand Tracking", upscaled_frame)
-        else:
-            # Show a black screen when no landmarks are found
-            black_frame_same_size = draw_palm_box(frame, [], output_size=(60, 40), upscale_factor=50)
-            cv2.imshow("Hand Tracking", black_frame_same_size)
-
-        cv2.imshow("Hand", frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    # Capture, inference, drawing and showing run at the same time, so the frame rate is that of the slowest of them
+    statistics = Pipeline([
+        ("capture", lambda: read_frame(cap)),
+        ("inference", lambda frame: detect_hands(hands, frame)),
+        ("rasterize", draw_hands),
+        ("show", show_hands),
+    ]).run()
 
     # Release
     cap.release()
     cv2.destroyAllWindows()
 
+    print(f"{statistics.fps:.1f} fps, camera to screen {statistics.latency_us / 1000:.0f} ms")
+    print("Time per frame of every stage (us):", {name: int(us) for name, us in statistics.breakdown().items()})
+
 
 hand_tracking()
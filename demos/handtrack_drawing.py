@@ -1,7 +1,13 @@
+import os
+import sys
+
 import cv2
 import mediapipe as mp
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib", "wrappers", "python"))
+from pipeline import Pipeline
+
 # Initialize MediaPipe Hands
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
@@ -16,21 +22,26 @@ hands = mp_hands.Hands(
 # Open webcam
 cap = cv2.VideoCapture(0)
 
-while cap.isOpened():
+def read_frame():
     ret, frame = cap.read()
     if not ret:
         print("Failed to grab frame")
-        break
+        return None
 
-    # Flip for mirror effect and convert color
-    frame = cv2.flip(frame, 1)
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    # Flip for mirror effect
+    return cv2.flip(frame, 1)
 
+def detect_hands(frame):
     # Process the frame with MediaPipe
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     results = hands.process(rgb_frame)
+    return frame, results.multi_hand_landmarks
 
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
+def draw_ellipses(detection):
+    frame, multi_hand_landmarks = detection
+
+    if multi_hand_landmarks:
+        for hand_landmarks in multi_hand_landmarks:
             # Collect all landmark points
             h, w, _ = frame.shape
             points = np.array([
@@ -42,10 +53,22 @@ while cap.isOpened():
             if len(points) >= 5:  # need at least 5 points for fitEllipse
                 ellipse = cv2.fitEllipse(points)
                 cv2.ellipse(frame, ellipse, (0, 255, 0), 2)
+    return frame
 
+def show(frame):
     cv2.imshow("Hand Ellipse Detection", frame)
     if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+        return False
+
+# Capture, inference, drawing and showing run at the same time, so the frame rate is that of the slowest of them
+statistics = Pipeline([
+    ("capture", read_frame),
+    ("inference", detect_hands),
+    ("rasterize", draw_ellipses),
+    ("show", show),
+]).run()
 
 cap.release()
 cv2.destroyAllWindows()
+
+print(f"{statistics.fps:.1f} fps, camera to screen {statistics.latency_us / 1000:.0f} ms")
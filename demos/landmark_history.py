@@ -0,0 +1,127 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+# The shoulders and hips, the center of which is where a person is
+TORSO = np.array([11, 12, 23, 24])
+
+class LandmarkHistory:
+    def __init__(self, capacity=1800, people=4, landmarks=33, dimensions=3, export_directory: Optional[str] = None):
+        """
+        History of the pose landmarks of the last `capacity` frames, E.G. 1800 frames is a minute at 30 fps, for gestures and
+        motion. All memory is allocated up front, a new frame overwrites the oldest one, so the memory stays the same no matter
+        how long the installation runs.
+
+        Every person gets a slot, a person keeps the slot that was nearest to them in the previous frames, so the landmarks of a
+        slot over time are the motion of one person. The landmarks of an empty slot are NaN.
+
+        Every frame is written twice, once in each half of the buffer, so any window of the newest frames is one piece of memory,
+        which is returned as a view instead of a copy.
+
+        - export_directory: When given, every full history is saved there as a numbered `.npz` file before it is overwritten,
+          so the whole session ends up on disk, see `save`.
+
+        Example code:
+        ```
+            history = LandmarkHistory(capacity=300)
+            history.append(landmarks_to_array(results.pose_landmarks, dimensions=3), timestamp_ms)
+            landmarks, timestamps = history.window(30)      # (30, 4, 33, 3) and (30,), the newest frame last
+            speed = np.diff(landmarks[:, :, 16, :2], axis=0) / np.diff(timestamps)[:, np.newaxis, np.newaxis]
+        ```
+        """
+
+        if capacity < 1:
+            raise Exception(f"The capacity of the landmark history has to be at least 1, not '{capacity}'")
+
+        self.capacity = capacity
+        self.people = people
+        self.export_directory = export_directory
+        self.exported = 0
+
+        self._landmarks = np.full((2 * capacity, people, landmarks, dimensions), np.nan, dtype=np.float32)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        # The last place every slot was seen, so a person gets their slot back after a frame without them
+        self._centers = np.full((people, 2), np.nan, dtype=np.float32)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, landmarks: np.ndarray, timestamp_ms: int) -> None:
+        """
+        Add a frame with the landmarks of every person, an array of (person, landmark, xyz), see `landmarks_to_array`. The people
+        beyond the amount of slots are left out.
+        """
+
+        if self._count >= self.capacity and self._next == 0 and self.export_directory is not None:
+            self.save(os.path.join(self.export_directory, f"landmarks_{self.exported:05}.npz"))
+            self.exported += 1
+
+        # The frame is written straight into its place in the first half, and copied to the second half
+        frame = self._landmarks[self._next]
+        frame.fill(np.nan)
+        landmarks = landmarks[:self.people]
+        if len(landmarks) > 0:
+            centers = landmarks[:, TORSO, :2].mean(axis=1)
+            slots = self._assign_slots(centers)
+            frame[slots] = landmarks
+            self._centers[slots] = centers
+
+        self._landmarks[self._next + self.capacity] = frame
+        self._timestamps[self._next] = self._timestamps[self._next + self.capacity] = timestamp_ms
+        self._next = (self._next + 1) % self.capacity
+        self._count += 1
+
+    def window(self, frames: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns read-only views of the landmarks (frame, person, landmark, xyz) and timestamps of the newest `frames` frames, or
+        of the whole history, the oldest frame first. The views change when frames are appended, copy them to keep them.
+        """
+
+        frames = len(self) if frames is None else min(frames, len(self))
+        end = self._next + self.capacity
+        landmarks, timestamps = self._landmarks[end - frames:end], self._timestamps[end - frames:end]
+        landmarks.flags.writeable = timestamps.flags.writeable = False
+        return landmarks, timestamps
+
+    def save(self, path: str, frames: Optional[int] = None) -> None:
+        """
+        Save the newest `frames` frames, or the whole history, as an `.npz` file with the arrays `landmarks` and `timestamps`.
+
+        Example code:
+        ```
+            history.save("session.npz")
+            session = np.load("session.npz")
+            landmarks, timestamps = session["landmarks"], session["timestamps"]
+        ```
+        """
+
+        landmarks, timestamps = self.window(frames)
+        np.savez(path, landmarks=landmarks, timestamps=timestamps)
+
+    def clear(self) -> None:
+        self._landmarks[:] = np.nan
+        self._centers[:] = np.nan
+        self._next = 0
+        self._count = 0
+
+    def _assign_slots(self, centers: np.ndarray) -> list[int]:
+        """
+        The slot of every person by the center of their torso, the nearest pairs of a person and the last place of a slot are
+        matched first.
+        """
+
+        offsets = centers[:, np.newaxis] - self._centers[np.newaxis]
+        distances = np.sum(offsets * offsets, axis=2)
+        # Slots that were never used are matched after the others, in order
+        distances[np.isnan(distances)] = np.inf
+
+        slots = [-1] * len(centers)
+        taken = [False] * self.people
+        for pair in np.argsort(distances, axis=None, kind="stable").tolist():
+            person, slot = divmod(pair, self.people)
+            if slots[person] < 0 and not taken[slot]:
+                slots[person], taken[slot] = slot, True
+        return slots
@@ -0,0 +1,171 @@
+import numpy as np
+
+# The limbs of the body model as pairs of pose landmarks, with the `wideBoyFactor` of `draw_line`: a limb is as thick as
+# its length divided by the factor
+LIMBS = np.array([
+    (11, 12), (23, 24),                         # Shoulders, hips
+    (11, 13), (13, 15), (11, 23), (23, 25), (25, 27),   # Left arm, left side, left leg
+    (12, 14), (14, 16), (12, 24), (24, 26), (26, 28),   # Right arm, right side, right leg
+])
+LIMB_FACTORS = np.array([7, 7, 3.8, 5, 6.5, 3, 3.5, 3.8, 5, 6.5, 3, 3.5])
+
+# The chest (shoulders and hips) and neck (shoulders and mouth) polygons
+CHEST = np.array([12, 11, 23, 24])
+NECK = np.array([12, 11, 9, 10])
+
+LEFT_EYE_INNER, RIGHT_EYE_INNER = 1, 4
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_WRIST, RIGHT_WRIST, LEFT_INDEX, RIGHT_INDEX = 15, 16, 19, 20
+
+def landmarks_to_array(poses, dimensions=2) -> np.ndarray:
+    """
+    Convert the pose landmarks of MediaPipe, a list with a list of landmarks per person, to an array of (person, landmark, xy)
+    with the normalized coordinates, or of (person, landmark, xyz) with `dimensions=3`.
+    """
+
+    points = [[(landmark.x, landmark.y, landmark.z)[:dimensions] for landmark in landmarks] for landmarks in poses]
+    return np.array(points, dtype=np.float32).reshape(-1, 33, dimensions)
+
+class SkeletonRasterizer:
+    def __init__(self, shape=(30, 40), frame_size=(1280, 720), supersampling=4, mirror=False):
+        """
+        Draws the body model of the pose demos (limbs, chest, neck, head and hands) straight at the resolution of the wall,
+        instead of drawing a full frame of the camera and scaling it down.
+
+        - shape: The rows and columns of the output.
+        - frame_size: The width and height of the camera frame the body model was designed for, the thickness of the limbs and the
+          size of the head and hands are computed in its pixels, just like `draw_line` and `cv.ellipse` do on the camera frame.
+        - supersampling: Every output pixel is sampled supersampling x supersampling times, its brightness is the share of the
+          samples inside the body, which smooths the edges.
+        - mirror: Mirror the people horizontally, like `cv.flip(frame, 1)`.
+
+        All people are drawn at once, with the shapes as distance tests on the samples, so the memory per frame is that of the
+        samples instead of a camera frame.
+
+        Example code:
+        ```
+            rasterizer = SkeletonRasterizer(shape=(40, 60))
+            cw.pixels[:] = rasterizer.render(landmarks_to_array(results.pose_landmarks))
+        ```
+        """
+
+        self.shape = shape
+        self.frame_size = frame_size
+        self.supersampling = supersampling
+        self.mirror = mirror
+
+        # The centers of the samples in pixels of the camera frame
+        rows, cols = shape[0] * supersampling, shape[1] * supersampling
+        self._pitch = np.array([frame_size[0] / cols, frame_size[1] / rows], dtype=np.float32)
+        self._x = (np.arange(cols, dtype=np.float32) + 0.5) * self._pitch[0]
+        self._y = (np.arange(rows, dtype=np.float32) + 0.5) * self._pitch[1]
+        self._inside = np.zeros((rows, cols), dtype=bool)
+
+    def coverage(self, landmarks: np.ndarray) -> np.ndarray:
+        """
+        Returns how much of every output pixel is covered by a body, from 0 to 255, for the normalized landmarks of every
+        person as an array of (person, landmark, xy or xyz), see `landmarks_to_array`.
+        """
+
+        inside = self._inside
+        inside[:] = False
+        if len(landmarks) > 0:
+            self._rasterize(landmarks)
+
+        s = self.supersampling
+        covered = inside.reshape(self.shape[0], s, self.shape[1], s).sum(axis=(1, 3), dtype=np.uint16)
+        return (covered * 255 // (s * s)).astype(np.uint8)
+
+    def render(self, landmarks: np.ndarray, color=(255, 255, 255)) -> np.ndarray:
+        """Returns an uint8 image of (rows, columns, 3) with the bodies in `color` on black."""
+
+        coverage = self.coverage(landmarks)
+        return (coverage[:, :, np.newaxis].astype(np.uint16) * np.array(color, dtype=np.uint16) // 255).astype(np.uint8)
+
+    def _rasterize(self, landmarks: np.ndarray) -> None:
+        """
+        Mark the samples inside the bodies. Every shape is only tested on the window of samples of its own bounding box, the
+        windows of a kind of shape are put one after the other, so the shapes of all people are tested at once.
+        """
+
+        points = landmarks[:, :, :2].astype(np.float32) * np.array(self.frame_size, dtype=np.float32)
+        if self.mirror:
+            points[:, :, 0] = self.frame_size[0] - points[:, :, 0]
+
+        # The limbs
+        a, b = points[:, LIMBS[:, 0]], points[:, LIMBS[:, 1]]
+        radius = (np.ceil(np.linalg.norm(a - b, axis=2) / LIMB_FACTORS) / 2).astype(np.float32)
+        self._mark(self._capsules, np.minimum(a, b) - radius[:, :, np.newaxis], np.maximum(a, b) + radius[:, :, np.newaxis], a, b, radius)
+
+        # The head and the hands
+        shoulders = np.linalg.norm(points[:, LEFT_SHOULDER] - points[:, RIGHT_SHOULDER], axis=1)
+        hands = np.linalg.norm(points[:, [LEFT_WRIST, RIGHT_WRIST]] - points[:, [LEFT_INDEX, RIGHT_INDEX]], axis=2) * 0.75
+        head = (points[:, LEFT_EYE_INNER] + points[:, RIGHT_EYE_INNER]) / 2
+        centers = np.stack([head, points[:, LEFT_WRIST], points[:, RIGHT_WRIST]], axis=1)
+        axes = np.concatenate([np.stack([shoulders * 0.3, shoulders * 0.45], axis=1)[:, np.newaxis], np.repeat(hands[:, :, np.newaxis], 2, axis=2)], axis=1)
+        self._mark(self._ellipses, centers - axes, centers + axes, centers, axes)
+
+        # The chest and the neck
+        polygons = np.stack([points[:, CHEST], points[:, NECK]], axis=1)
+        self._mark(self._polygons, polygons.min(axis=2), polygons.max(axis=2), polygons)
+
+    def _mark(self, test, low: np.ndarray, high: np.ndarray, *shapes: np.ndarray) -> None:
+        """
+        Mark the samples for which `test` holds, for shapes of (person, shape) with the bounding boxes from `low` to `high` in
+        pixels of the camera frame. The window of every shape is its own bounding box, `test` gets the samples of all windows
+        one after the other, with the values of the shape of every sample.
+        """
+
+        grid = np.array(self._inside.shape[::-1])
+        start = np.clip(np.floor(low / self._pitch - 0.5).astype(int), 0, grid).reshape(-1, 2)
+        width, height = (np.clip(np.ceil(high / self._pitch).astype(int), 0, grid).reshape(-1, 2) - start).T
+        samples = width * height
+        if samples.sum() <= 0:
+            return
+
+        # The rows of the windows one after the other, a row of a window is `width` samples from the left column of the window
+        shape = np.repeat(np.arange(len(samples)), height)
+        rows = start[shape, 1] + np.arange(len(shape)) - np.repeat(np.cumsum(height) - height, height)
+        widths = width[shape]
+        first = np.cumsum(widths) - widths
+        columns = np.arange(samples.sum()) + np.repeat(start[shape, 0] - first, widths)
+
+        # Every sample is tested on the shape of its window
+        shapes = tuple(np.repeat(values.reshape(-1, *values.shape[2:]), samples, axis=0) for values in shapes)
+        inside = test(self._x[columns], np.repeat(self._y[rows], widths), *shapes)
+        self._inside.reshape(-1)[(columns + np.repeat(rows * grid[0], widths))[inside]] = True
+
+    @staticmethod
+    def _capsules(x: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray, radius: np.ndarray) -> np.ndarray:
+        """The samples within `radius` of the lines from `a` to `b`, like a thick `cv.line`."""
+
+        x, y = x - a[:, 0], y - a[:, 1]
+        dx, dy = b[:, 0] - a[:, 0], b[:, 1] - a[:, 1]
+        length2 = np.maximum(dx * dx + dy * dy, 1e-6)
+        t = x * (dx / length2) + y * (dy / length2)
+        np.clip(t, 0, 1, out=t)
+        ex, ey = x - t * dx, y - t * dy
+        return ex * ex + ey * ey <= radius * radius
+
+    @staticmethod
+    def _ellipses(x: np.ndarray, y: np.ndarray, centers: np.ndarray, axes: np.ndarray) -> np.ndarray:
+        """The samples within the axis aligned ellipses, like a filled `cv.ellipse`."""
+
+        axes = np.maximum(axes, 1e-6)
+        ex = (x - centers[:, 0]) / axes[:, 0]
+        ey = (y - centers[:, 1]) / axes[:, 1]
+        return ex * ex + ey * ey <= 1
+
+    @staticmethod
+    def _polygons(x: np.ndarray, y: np.ndarray, corners: np.ndarray) -> np.ndarray:
+        """The samples inside the polygons, by counting the edges a ray to the left of the sample crosses, like `cv.fillPoly`."""
+
+        inside = np.zeros(x.shape, dtype=bool)
+        for i in range(corners.shape[1]):
+            x0, y0 = corners[:, i, 0], corners[:, i, 1]
+            x1, y1 = corners[:, i - 1, 0], corners[:, i - 1, 1]
+            crosses = (y0 > y) != (y1 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                edge = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= crosses & (x < edge)
+        return inside
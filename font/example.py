@@ -1,9 +1,7 @@
 import cv2 as cv
 import numpy as np
 
-from font import put_text, load_character_index
-
-load_character_index()
+from font import put_text
 
 mat = np.zeros((40, 250, 3))
 
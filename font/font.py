@@ -1,22 +1,172 @@
-import numpy as np
 import os
+import tempfile
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+FONT_DIR = os.path.dirname(os.path.abspath(__file__))
+ATLAS_PATH = os.path.join(FONT_DIR, "font.atlas")
+
+# Height of every glyph, a new line starts one row below it
+GLYPH_HEIGHT = 5
+LINE_HEIGHT = GLYPH_HEIGHT + 1
+
+# The atlas file starts with a header, followed by the metrics table and the glyphs side by side as one uint8 image of 0s and 1s
+ATLAS_MAGIC = b"CWFONT01"
+ATLAS_HEADER = np.dtype([("magic", "S8"), ("glyphs", "<u2"), ("height", "<u2"), ("width", "<u4")])
+ATLAS_METRICS = np.dtype([("codepoint", "<u4"), ("column", "<u2"), ("width", "<u2")])
+
+# Amount of rendered strings that are kept, see `render_text`
+RENDER_CACHE_SIZE = 256
 
 character_index = {}
 
-def load_character_index():
-    files = [f for f in os.listdir("./font/") if f[-4:] == ".csv"]
-    for file in files:
-        data = open(f"./font/{file}", "r").read()
-        data = [[[255., 255., 255.] if c == '1' else [0., 0., 0.] for c in line.split(',')] for line in data.split("\n")]
-        character_index[chr(int(file[5:-4]))] = (np.array(data), len(data[0]), len(data))
-
-def put_text(frame, text: str, start):
-    column_start = start[1]
-    cursor = start
-    for c in text:
-        if c == "\n":
-            cursor = [cursor[0]+6, column_start]
-            continue
-        letter = character_index[c]
-        frame[cursor[0]:cursor[0]+letter[2], cursor[1]:cursor[1]+letter[1]] = letter[0]
-        cursor[1] += letter[1]+1
+class _Atlas:
+    def __init__(self, path: str) -> None:
+        """The glyphs of the atlas file, which is memory mapped so only the header and the metrics table are read when it is opened."""
+
+        header = np.fromfile(path, dtype=ATLAS_HEADER, count=1)[0]
+        if header["magic"] != ATLAS_MAGIC:
+            raise Exception(f"'{path}' is not a font atlas")
+
+        metrics = np.memmap(path, dtype=ATLAS_METRICS, mode="r", offset=ATLAS_HEADER.itemsize, shape=(int(header["glyphs"]),))
+        self.image = np.memmap(
+            path, dtype=np.uint8, mode="r", offset=ATLAS_HEADER.itemsize + metrics.nbytes, shape=(int(header["height"]), int(header["width"]))
+        )
+        self.glyphs = {chr(int(codepoint)): (int(column), int(width)) for codepoint, column, width in metrics}
+
+    def glyph(self, c: str) -> np.ndarray:
+        """The 0s and 1s of the character, a view into the atlas."""
+
+        if c not in self.glyphs:
+            raise Exception(f"The font has no character '{c}'")
+        column, width = self.glyphs[c]
+        return self.image[:, column:column + width]
+
+_atlas: Optional[_Atlas] = None
+
+def build_atlas(path: str = ATLAS_PATH) -> None:
+    """
+    Generate the atlas file from the CSV files of the characters, `char_<codepoint>.csv` with a row of 0s and 1s per line.
+
+    This only needs to happen again when a CSV file changes, `load_atlas` does it automatically when the atlas is older than the CSV files.
+    """
+
+    glyphs = []
+    for file in sorted(f for f in os.listdir(FONT_DIR) if f.startswith("char_") and f.endswith(".csv")):
+        with open(os.path.join(FONT_DIR, file)) as csv:
+            rows = [[c == "1" for c in line.split(",")] for line in csv.read().splitlines()]
+        glyphs.append((int(file[5:-4]), np.array(rows, dtype=np.uint8)))
+
+    metrics = np.zeros(len(glyphs), dtype=ATLAS_METRICS)
+    column = 0
+    for i, (codepoint, glyph) in enumerate(glyphs):
+        metrics[i] = codepoint, column, glyph.shape[1]
+        column += glyph.shape[1]
+
+    header = np.array([(ATLAS_MAGIC, len(glyphs), GLYPH_HEIGHT, column)], dtype=ATLAS_HEADER)
+    image = np.concatenate([glyph for _, glyph in glyphs], axis=1)
+
+    # Written next to the atlas and renamed, so a process which is loading it never reads a half written atlas
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(header.tobytes() + metrics.tobytes() + np.ascontiguousarray(image).tobytes())
+    os.replace(temporary, path)
+
+def load_atlas() -> _Atlas:
+    """
+    Returns the atlas, which is opened on first use. It is generated from the CSV files when it does not exist yet, or when it
+    is older than one of them.
+    """
+
+    global _atlas
+    if _atlas is not None:
+        return _atlas
+
+    csv_files = [os.path.join(FONT_DIR, f) for f in os.listdir(FONT_DIR) if f.endswith(".csv")]
+    newest_csv = max((os.path.getmtime(f) for f in csv_files), default=0)
+
+    path = ATLAS_PATH
+    if not os.path.exists(path) or os.path.getmtime(path) < newest_csv:
+        try:
+            build_atlas(path)
+        except OSError:
+            # The font directory is not writable, E.G. when it is installed system wide
+            path = os.path.join(tempfile.gettempdir(), "contourwall_font.atlas")
+            build_atlas(path)
+
+    _atlas = _Atlas(path)
+    return _atlas
+
+def load_character_index() -> None:
+    """
+    Fill `character_index` with every character of the font, as the glyph (white pixels on black), its width and its height.
+
+    Only needed for code which uses `character_index` directly, E.G. `TrackedCanvas.text`, `put_text` uses the atlas.
+    """
+
+    atlas = load_atlas()
+    for c in atlas.glyphs:
+        glyph = atlas.glyph(c)
+        character_index[c] = (np.repeat(glyph[:, :, np.newaxis] * 255, 3, axis=2), glyph.shape[1], glyph.shape[0])
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_text(text: str) -> np.ndarray:
+    """
+    Returns a read-only boolean mask of the text, True for the pixels of the characters.
+
+    There is one column between characters, and a new line starts 6 rows lower. The last `RENDER_CACHE_SIZE` strings are cached,
+    so text which is drawn every frame (E.G. a clock or a scoreboard) is only rendered once.
+
+    Example code:
+    ```
+        mask = render_text("12:34")
+        mask.shape      # (5, 21)
+    ```
+    """
+
+    atlas = load_atlas()
+    lines = [[atlas.glyph(c) for c in line] for line in text.split("\n")]
+    widths = [sum(glyph.shape[1] + 1 for glyph in line) - 1 for line in lines]
+
+    mask = np.zeros(((len(lines) - 1) * LINE_HEIGHT + GLYPH_HEIGHT, max(max(widths), 0)), dtype=bool)
+    for i, line in enumerate(lines):
+        column = 0
+        for glyph in line:
+            mask[i * LINE_HEIGHT:i * LINE_HEIGHT + GLYPH_HEIGHT, column:column + glyph.shape[1]] = glyph
+            column += glyph.shape[1] + 1
+
+    mask.flags.writeable = False
+    return mask
+
+def put_text(frame: np.ndarray, text: str, start: Sequence[int], color: Sequence[float] = (255, 255, 255), background: Optional[Sequence[float]] = None) -> None:
+    """
+    Draw the text on the frame, with its top left corner at `start` which is [row, column].
+
+    Only the pixels of the characters are drawn in `color`, unless a `background` color is given for the other pixels within
+    the text. Text which falls outside of the frame is clipped.
+
+    Example code:
+    ```
+        frame = np.zeros((40, 60, 3), dtype=np.uint8)
+        put_text(frame, "12:34", [1, 0], color=(255, 0, 0))
+    ```
+    """
+
+    mask = render_text(text)
+    row, col = start[0], start[1]
+    top, left = max(row, 0), max(col, 0)
+    bottom, right = min(row + mask.shape[0], frame.shape[0]), min(col + mask.shape[1], frame.shape[1])
+    if top >= bottom or left >= right:
+        return
+
+    region = frame[top:bottom, left:right]
+    lit = mask[top - row:bottom - row, left - col:right - col]
+    if background is not None:
+        region[:] = background
+    region[lit] = color
+
+if __name__ == "__main__":
+    build_atlas()
+    print(f"The font atlas is written to '{ATLAS_PATH}'")
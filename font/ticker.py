@@ -0,0 +1,120 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+from font import render_text
+
+class Ticker:
+    def __init__(self, text: str, shape: Sequence[int] = (40, 60), color: Sequence[int] = (255, 255, 255), background: Sequence[int] = (0, 0, 0), speed: float = 1, loop: bool = True, scale: int = 1, row: Optional[int] = None, gap: Optional[int] = None) -> None:
+        """
+        Scrolling text, which is rendered once into a strip that is wider than the wall. Every frame is a view into the strip,
+        so scrolling costs nothing but the copy into the pixel array.
+
+        - shape: The rows and columns of the wall, the windows have this shape.
+        - speed: The columns the text moves per frame, it can be a fraction. A negative speed scrolls the text to the right.
+        - loop: Whether the text starts again after it scrolled by, otherwise the ticker stops once the text has left the wall.
+        - scale: Every pixel of the font becomes `scale` by `scale` pixels.
+        - row: The row of the top of the text, by default the text is centered vertically.
+        - gap: The columns between the end of the text and its next start when looping, by default the width of the wall.
+
+        Example code:
+        ```
+            ticker = Ticker("Welcome to the ELLIE Contour Wall", scale=3, speed=0.5)
+            for window in ticker:
+                cw.pixels[:] = window
+                cw.show()
+        ```
+        """
+
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.speed = speed
+        self.loop = loop
+        self._color = tuple(color)
+        self._background = tuple(background)
+        self._scale = scale
+        self._row = row
+        self._gap = self.shape[1] if gap is None else gap
+        self._position: float = 0
+        self.set_text(text)
+
+    def set_text(self, text: str) -> None:
+        """
+        Replace the text. The strip is rebuilt from the cached rendering of the text (see `font.render_text`), and the ticker
+        continues at the same position, so the text changes without jumping back to the start.
+        """
+
+        mask = render_text(text.replace("\n", " "))
+        if self._scale > 1:
+            mask = mask.repeat(self._scale, axis=0).repeat(self._scale, axis=1)
+        self._mask = mask
+
+        height, width = self.shape
+        if self.loop:
+            # The text followed by the gap repeats every period, the first window is repeated after it (the wrap-around padding),
+            # so every window is a view into the strip
+            self._period = max(mask.shape[1] + self._gap, 1)
+            self._text_column = 0
+        else:
+            # The text enters from the right edge and leaves at the left edge
+            self._period = mask.shape[1] + width
+            self._text_column = width
+        self._strip = np.empty((height, self._period + width, 3), dtype=np.uint8)
+        self._paint()
+
+        if self.loop:
+            self._position %= self._period
+        elif self.speed < 0 and self._position == 0:
+            self._position = self._period
+
+    def set_color(self, color: Sequence[int], background: Optional[Sequence[int]] = None) -> None:
+        """Change the color of the text, and of the background when it is given, without rendering the text again."""
+
+        self._color = tuple(color)
+        if background is not None:
+            self._background = tuple(background)
+        self._paint()
+
+    @property
+    def done(self) -> bool:
+        """Whether the text has scrolled by, which is never the case when the ticker loops."""
+
+        return not self.loop and not 0 <= self._position <= self._period
+
+    def window(self) -> np.ndarray:
+        """The current frame, a (rows, columns, 3) view into the strip which must not be written to."""
+
+        offset = int(self._position) % self._period if self.loop else min(max(int(self._position), 0), self._period)
+        return self._strip[:, offset:offset + self.shape[1]]
+
+    def advance(self, frames: int = 1) -> None:
+        """Move the text by `speed` columns for every frame."""
+
+        self._position += self.speed * frames
+        if self.loop:
+            self._position %= self._period
+
+    def __iter__(self) -> "Ticker":
+        return self
+
+    def __next__(self) -> np.ndarray:
+        if self.done:
+            raise StopIteration
+        window = self.window()
+        self.advance()
+        return window
+
+    def _paint(self) -> None:
+        """Draw the text on the strip, and repeat the start of the strip after the period."""
+
+        height, width = self.shape
+        mask = self._mask
+        row = (height - mask.shape[0]) // 2 if self._row is None else self._row
+
+        self._strip[:] = self._background
+        top, bottom = max(row, 0), min(row + mask.shape[0], height)
+        if top < bottom:
+            columns = slice(self._text_column, self._text_column + mask.shape[1])
+            self._strip[top:bottom, columns][mask[top - row:bottom - row]] = self._color
+
+        if self.loop:
+            self._strip[:, self._period:] = self._strip[:, np.arange(self._period, self._period + width) % self._period]
@@ -0,0 +1,110 @@
+//! Benchmarks of the per-frame work in `util.rs`: splitting the framebuffer of the wall and reordering or gathering the framebuffer of a tile.
+//!
+//! The results are printed as JSON, in the same format as the benchmark suite of the Python wrapper
+//! (`lib/wrappers/python/benchmarks/run.py`), so runs can be compared with `lib/wrappers/python/benchmarks/compare.py`.
+//!
+//! ```bash
+//! cargo bench --bench util > util.json
+//! ```
+
+use std::time::Instant;
+
+use contourwall_core::layout::Layout;
+use contourwall_core::util::{
+    extract_mutated_pixels, gather_framebuffer, generate_index_conversion_vector,
+    reorder_framebuffer, reorder_tile_framebuffer, split_framebuffer, TileRegion,
+};
+
+const ITERATIONS: usize = 10_000;
+const WARMUP: usize = 100;
+
+fn measure<F: FnMut()>(name: &str, mut function: F) -> String {
+    for _ in 0..WARMUP {
+        function();
+    }
+
+    let mut samples: Vec<f64> = Vec::with_capacity(ITERATIONS);
+    for _ in 0..ITERATIONS {
+        let start = Instant::now();
+        function();
+        samples.push(start.elapsed().as_nanos() as f64 / 1000.0);
+    }
+
+    samples.sort_by(|a, b| a.partial_cmp(b).unwrap());
+    let percentile = |p: f64| samples[((samples.len() - 1) as f64 * p).round() as usize];
+    let mean = samples.iter().sum::<f64>() / samples.len() as f64;
+
+    format!(
+        "{{\"name\": \"{}\", \"iterations\": {}, \"mean_us\": {}, \"p50_us\": {}, \"p90_us\": {}, \"p99_us\": {}, \"max_us\": {}, \"fps\": {}}}",
+        name,
+        ITERATIONS,
+        mean,
+        percentile(0.5),
+        percentile(0.9),
+        percentile(0.99),
+        samples[samples.len() - 1],
+        1_000_000.0 / mean
+    )
+}
+
+fn main() {
+    let framebuffer: Vec<u8> = (0..7200).map(|i| (i * 7 % 256) as u8).collect();
+    let conversion_vector = generate_index_conversion_vector();
+    let mut ordered = [0u8; 1200];
+    let mut previous = [0u8; 1200];
+    let mut current = [0u8; 1200];
+    current[0..60].copy_from_slice(&framebuffer[0..60]);
+
+    let layout = Layout::six_tiles();
+    let gather_indices: Vec<Vec<usize>> = (0..6).map(|i| layout.gather_index(i)).collect();
+
+    let results = [
+        measure("core.util.split_framebuffer", || {
+            std::hint::black_box(split_framebuffer(std::hint::black_box(&framebuffer)));
+        }),
+        measure("core.util.reorder_framebuffer", || {
+            std::hint::black_box(reorder_framebuffer(
+                std::hint::black_box(&framebuffer[0..1200]),
+                &conversion_vector,
+                &mut ordered,
+            ));
+        }),
+        measure("core.util.split_and_reorder_6tile", || {
+            for tile_framebuffer in split_framebuffer(std::hint::black_box(&framebuffer)) {
+                std::hint::black_box(reorder_framebuffer(
+                    &tile_framebuffer,
+                    &conversion_vector,
+                    &mut ordered,
+                ));
+            }
+        }),
+        measure("core.util.reorder_tile_regions_6tile", || {
+            for i in 0..6 {
+                std::hint::black_box(reorder_tile_framebuffer(
+                    std::hint::black_box(&framebuffer),
+                    TileRegion::new(i, 6),
+                    &conversion_vector,
+                    &mut ordered,
+                ));
+            }
+        }),
+        measure("core.util.gather_framebuffer_6tile", || {
+            for gather_index in &gather_indices {
+                std::hint::black_box(gather_framebuffer(
+                    std::hint::black_box(&framebuffer),
+                    gather_index,
+                    &mut ordered,
+                ));
+            }
+        }),
+        measure("core.util.extract_mutated_pixels", || {
+            previous.fill(0);
+            std::hint::black_box(extract_mutated_pixels(&mut previous, &current));
+        }),
+    ];
+
+    println!(
+        "{{\"meta\": {{\"crate\": \"contourwall_core\"}}, \"results\": [\n  {}\n]}}",
+        results.join(",\n  ")
+    );
+}
@@ -0,0 +1,275 @@
+//! Discovery of the tiles which are connected over USB. All ports are probed in parallel, and the identifier of the tile
+//! behind every port is cached on disk, so a restart only needs one handshake per tile instead of a scan of every port.
+use std::{collections::HashMap, env, fs, path::PathBuf, sync::Mutex, thread};
+
+use log::{debug, error, info, trace, warn};
+use serialport::{SerialPortInfo, SerialPortType};
+
+use crate::{status_code::StatusCode, tile::Tile};
+
+/// Environment variable which overrides the location of the port cache.
+pub const PORT_CACHE_ENV: &str = "CONTOURWALL_PORT_CACHE";
+
+/// Device names of the ports which are open by a tile, see `claim_port`.
+static PORTS_IN_USE: Mutex<Vec<String>> = Mutex::new(Vec::new());
+
+/// Marks the port as open by a tile, so `find_tile` does not probe it while another tile is looked for.
+pub fn claim_port(port_name: &str) {
+    PORTS_IN_USE.lock().unwrap_or_else(|error| error.into_inner()).push(port_name.to_string());
+}
+
+/// Marks the port as no longer open by a tile.
+pub fn release_port(port_name: &str) {
+    let mut ports = PORTS_IN_USE.lock().unwrap_or_else(|error| error.into_inner());
+    if let Some(i) = ports.iter().position(|port| port == port_name) {
+        ports.swap_remove(i);
+    }
+}
+
+/// Returns the device names of the ports which are open by a tile.
+pub fn ports_in_use() -> Vec<String> {
+    PORTS_IN_USE.lock().unwrap_or_else(|error| error.into_inner()).clone()
+}
+
+/// The identifier of the tile behind every port, keyed by the USB serial number of the port, or by its device name when the
+/// port has no serial number. The serial number stays the same when the operating system hands out the device names in a
+/// different order after a power cycle.
+#[derive(Debug, Default, Clone, PartialEq, Eq)]
+pub struct PortCache {
+    pub identifiers: HashMap<String, u8>,
+}
+
+impl PortCache {
+    /// Location of the port cache, `CONTOURWALL_PORT_CACHE` when it is set, otherwise the cache directory of the user.
+    pub fn path() -> PathBuf {
+        if let Some(path) = env::var_os(PORT_CACHE_ENV) {
+            return PathBuf::from(path);
+        }
+
+        if let Some(home) = env::var_os("HOME") {
+            PathBuf::from(home).join(".cache").join("contourwall").join("port_cache")
+        } else if let Some(local_app_data) = env::var_os("LOCALAPPDATA") {
+            PathBuf::from(local_app_data).join("contourwall").join("port_cache")
+        } else {
+            env::temp_dir().join("contourwall_port_cache")
+        }
+    }
+
+    /// Parses the port cache, every line holds an identifier and the key of its port separated by a space.
+    /// Lines which cannot be parsed are ignored.
+    pub fn parse(contents: &str) -> PortCache {
+        let identifiers = contents
+            .lines()
+            .filter(|line| !line.starts_with('#'))
+            .filter_map(|line| {
+                let (identifier, key) = line.split_once(' ')?;
+                Some((key.to_string(), identifier.parse().ok()?))
+            })
+            .collect();
+        PortCache { identifiers }
+    }
+
+    pub fn serialize(&self) -> String {
+        let mut entries: Vec<(&u8, &String)> = self.identifiers.iter().map(|(key, identifier)| (identifier, key)).collect();
+        entries.sort();
+
+        let mut contents = String::from("# ContourWall port cache: <identifier> <USB serial number or device name>\n");
+        for (identifier, key) in entries {
+            contents.push_str(&format!("{} {}\n", identifier, key));
+        }
+        contents
+    }
+
+    /// Loads the port cache, an empty cache is returned when there is none.
+    pub fn load() -> PortCache {
+        match fs::read_to_string(PortCache::path()) {
+            Ok(contents) => PortCache::parse(&contents),
+            Err(_) => {
+                trace!("There is no port cache at '{}'", PortCache::path().display());
+                PortCache::default()
+            }
+        }
+    }
+
+    pub fn save(&self) {
+        let path = PortCache::path();
+        if let Some(directory) = path.parent() {
+            let _ = fs::create_dir_all(directory);
+        }
+        if let Err(error) = fs::write(&path, self.serialize()) {
+            warn!("The port cache could not be saved to '{}': {}", path.display(), error);
+        }
+    }
+}
+
+/// Returns the key of the port in the port cache, or None when the port is not a USB port and therefore cannot be a tile.
+pub fn port_key(port: &SerialPortInfo) -> Option<String> {
+    match &port.port_type {
+        SerialPortType::UsbPort(info) => Some(info.serial_number.clone().unwrap_or_else(|| port.port_name.clone())),
+        _ => None,
+    }
+}
+
+/// Opens the port as a tile and reads its identifier, None is returned when the port is not a tile.
+fn probe(port_name: &str, baud_rate: u32) -> Option<(u8, Tile)> {
+    let mut tile = match Tile::init(port_name.to_string(), baud_rate) {
+        Ok(tile) => tile,
+        Err(error) => {
+            debug!("'{}', is not an ELLIE tile, because: {:?}", port_name, error);
+            return None;
+        }
+    };
+
+    let (status_code, identifier) = tile.command_4_get_tile_identifier();
+    if status_code != StatusCode::Ok {
+        warn!("The identifier of '{}' could not be read: {:?}", port_name, status_code);
+        return None;
+    }
+    Some((identifier, tile))
+}
+
+/// Probes all ports at the same time, every port gets its own thread as probing mostly waits on the timeout of the port.
+/// The results are in the same order as the ports.
+fn probe_all(port_names: &[&str], baud_rate: u32) -> Vec<Option<(u8, Tile)>> {
+    thread::scope(|scope| {
+        let probes: Vec<_> = port_names
+            .iter()
+            .map(|&port_name| scope.spawn(move || probe(port_name, baud_rate)))
+            .collect();
+        probes.into_iter().map(|probe| probe.join().unwrap_or(None)).collect()
+    })
+}
+
+/// Finds all tiles which are connected over USB, and returns them together with their identifier.
+///
+/// When the port cache has a port for every identifier in `expected`, only those ports are validated. Otherwise, or when
+/// one of them is no longer the cached tile, all USB ports are scanned and the port cache is updated.
+pub fn discover_tiles(baud_rate: u32, expected: &[u8]) -> Vec<(u8, Tile)> {
+    let ports = serialport::available_ports().unwrap_or_else(|error| {
+        error!("{}", error);
+        Vec::new()
+    });
+    let ports: Vec<(String, String)> = ports
+        .iter()
+        .filter_map(|port| match port_key(port) {
+            Some(key) => Some((key, port.port_name.clone())),
+            None => {
+                trace!("Port: '{}' is not a USB port", port.port_name);
+                None
+            }
+        })
+        .collect();
+
+    let cache = PortCache::load();
+    let cached: Vec<(&str, u8)> = ports
+        .iter()
+        .filter_map(|(key, port_name)| Some((port_name.as_str(), *cache.identifiers.get(key)?)))
+        .collect();
+    let covers_expected = |identifiers: &[u8]| expected.iter().all(|identifier| identifiers.contains(identifier));
+
+    let cached_identifiers: Vec<u8> = cached.iter().map(|&(_, identifier)| identifier).collect();
+    if !cached.is_empty() && covers_expected(&cached_identifiers) {
+        let port_names: Vec<&str> = cached.iter().map(|&(port_name, _)| port_name).collect();
+        let tiles: Vec<(u8, Tile)> = probe_all(&port_names, baud_rate)
+            .into_iter()
+            .zip(&cached)
+            .filter_map(|(tile, &(_, cached_identifier))| tile.filter(|(identifier, _)| *identifier == cached_identifier))
+            .collect();
+
+        let identifiers: Vec<u8> = tiles.iter().map(|(identifier, _)| *identifier).collect();
+        if covers_expected(&identifiers) {
+            info!("Found {} tiles through the port cache", tiles.len());
+            return tiles;
+        }
+        // The tiles are dropped here, which closes their ports before they are probed again
+        warn!("The port cache is outdated, all ports are scanned");
+    }
+
+    let port_names: Vec<&str> = ports.iter().map(|(_, port_name)| port_name.as_str()).collect();
+    let mut cache = PortCache::default();
+    let mut tiles = Vec::new();
+    for ((key, _), tile) in ports.iter().zip(probe_all(&port_names, baud_rate)) {
+        if let Some((identifier, tile)) = tile {
+            cache.identifiers.insert(key.clone(), identifier);
+            tiles.push((identifier, tile));
+        }
+    }
+
+    cache.save();
+    tiles
+}
+
+/// Looks for the tile with `identifier` on all USB ports, except the ports in `in_use` which are open by other tiles, so
+/// nothing is written into the stream of a tile that is running. Used to find a tile again after its connection was lost,
+/// when the operating system may have given its port another device name.
+pub fn find_tile(identifier: u8, baud_rate: u32, in_use: &[String]) -> Option<Tile> {
+    let ports = serialport::available_ports().unwrap_or_default();
+    let port_names: Vec<&str> = ports
+        .iter()
+        .filter(|port| port_key(port).is_some() && !in_use.contains(&port.port_name))
+        .map(|port| port.port_name.as_str())
+        .collect();
+
+    probe_all(&port_names, baud_rate)
+        .into_iter()
+        .flatten()
+        .find(|(found, _)| *found == identifier)
+        .map(|(_, tile)| tile)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use serialport::UsbPortInfo;
+
+    #[test]
+    fn test_port_cache_round_trip() {
+        let mut cache = PortCache::default();
+        cache.identifiers.insert(String::from("A10KX3Z1"), 1);
+        cache.identifiers.insert(String::from("/dev/ttyUSB3"), 6);
+
+        assert_eq!(PortCache::parse(&cache.serialize()), cache);
+    }
+
+    #[test]
+    fn test_port_cache_ignores_invalid_lines() {
+        let cache = PortCache::parse("# comment\n2 COM4\nnot-a-number COM5\n300 COM6\n\n");
+
+        assert_eq!(cache.identifiers.len(), 1);
+        assert_eq!(cache.identifiers.get("COM4"), Some(&2));
+    }
+
+    #[test]
+    fn test_ports_in_use() {
+        claim_port("/dev/ttyTEST0");
+        claim_port("/dev/ttyTEST1");
+        release_port("/dev/ttyTEST0");
+
+        let ports = ports_in_use();
+        assert!(!ports.contains(&String::from("/dev/ttyTEST0")));
+        assert!(ports.contains(&String::from("/dev/ttyTEST1")));
+        release_port("/dev/ttyTEST1");
+    }
+
+    #[test]
+    fn test_port_key() {
+        let usb_port = |serial_number: Option<&str>| SerialPortInfo {
+            port_name: String::from("/dev/ttyUSB0"),
+            port_type: SerialPortType::UsbPort(UsbPortInfo {
+                vid: 0x10c4,
+                pid: 0xea60,
+                serial_number: serial_number.map(String::from),
+                manufacturer: None,
+                product: None,
+            }),
+        };
+        let pci_port = SerialPortInfo {
+            port_name: String::from("/dev/ttyS0"),
+            port_type: SerialPortType::PciPort,
+        };
+
+        assert_eq!(port_key(&usb_port(Some("A10KX3Z1"))), Some(String::from("A10KX3Z1")));
+        assert_eq!(port_key(&usb_port(None)), Some(String::from("/dev/ttyUSB0")));
+        assert_eq!(port_key(&pci_port), None);
+    }
+}
@@ -0,0 +1,217 @@
+//! Layout of the tiles on the wall. The layout describes where every tile is placed, and is turned into the gather maps of the tiles.
+use crate::util::{generate_index_conversion_vector, wire_order_index};
+
+/// Size of a tile in pixels, tiles are placed on a grid of this size.
+pub const TILE_SIZE: usize = 20;
+
+/// Position of a tile on the wall.
+#[repr(C)]
+#[derive(Debug, Default, Clone, Copy, PartialEq, Eq)]
+pub struct TilePlacement {
+    /// Row of the tile on the grid of tiles, row 0 is the top row
+    pub row: u16,
+    /// Column of the tile on the grid of tiles, column 0 is the left column
+    pub col: u16,
+    /// Clockwise rotation of the tile as it is mounted on the wall in degrees, either 0, 90, 180 or 270
+    pub rotation: u16,
+    /// Identifier of the tile which is stored in the EEPROM of the tile, 0 if it is not used to find the tile
+    pub identifier: u8,
+}
+
+#[derive(Debug, PartialEq, Eq)]
+pub enum LayoutError {
+    NoTiles,
+    InvalidRotation(usize),
+    OverlappingTiles(usize, usize),
+    DuplicateIdentifier(usize, usize),
+}
+
+/// The tiles of the wall and the size of the framebuffer of the wall, which is the bounding box of the tiles.
+///
+/// The tiles can be placed anywhere on the grid, so walls of any size and shape are possible. Pixels of the framebuffer
+/// which are not covered by a tile are not shown.
+#[derive(Debug, Clone)]
+pub struct Layout {
+    pub placements: Vec<TilePlacement>,
+    /// Height of the framebuffer in pixels
+    pub rows: usize,
+    /// Width of the framebuffer in pixels
+    pub cols: usize,
+}
+
+impl Layout {
+    /// Validates the placements and returns the layout.
+    ///
+    /// ## Example
+    /// ```
+    /// // An L-shaped wall of three tiles, of which the bottom tile is mounted upside down
+    /// let layout = Layout::new(vec![
+    ///     TilePlacement { row: 0, col: 0, rotation: 0, identifier: 1 },
+    ///     TilePlacement { row: 0, col: 1, rotation: 0, identifier: 2 },
+    ///     TilePlacement { row: 1, col: 0, rotation: 180, identifier: 3 },
+    /// ]).expect("Invalid layout");
+    /// ```
+    pub fn new(placements: Vec<TilePlacement>) -> Result<Layout, LayoutError> {
+        if placements.is_empty() {
+            return Err(LayoutError::NoTiles);
+        }
+
+        for (i, placement) in placements.iter().enumerate() {
+            if ![0, 90, 180, 270].contains(&placement.rotation) {
+                return Err(LayoutError::InvalidRotation(i));
+            }
+
+            for (j, other) in placements[..i].iter().enumerate() {
+                if (other.row, other.col) == (placement.row, placement.col) {
+                    return Err(LayoutError::OverlappingTiles(j, i));
+                }
+                if placement.identifier != 0 && other.identifier == placement.identifier {
+                    return Err(LayoutError::DuplicateIdentifier(j, i));
+                }
+            }
+        }
+
+        let rows = placements.iter().map(|placement| placement.row as usize + 1).max().unwrap_or(0);
+        let cols = placements.iter().map(|placement| placement.col as usize + 1).max().unwrap_or(0);
+        Ok(Layout {
+            placements,
+            rows: rows * TILE_SIZE,
+            cols: cols * TILE_SIZE,
+        })
+    }
+
+    /// A rectangular wall of `tile_rows` by `tile_cols` tiles, the tiles are ordered row by row and identified from 1 onwards.
+    pub fn grid(tile_rows: u16, tile_cols: u16) -> Result<Layout, LayoutError> {
+        let placements = (0..tile_rows)
+            .flat_map(|row| (0..tile_cols).map(move |col| (row, col)))
+            .enumerate()
+            .map(|(i, (row, col))| TilePlacement {
+                row,
+                col,
+                rotation: 0,
+                identifier: (i + 1) as u8,
+            })
+            .collect();
+        Layout::new(placements)
+    }
+
+    /// The wall of 6 tiles, in the order the ContourWall has always used: tile 0 is the top-left tile, tile 1 the bottom-left tile,
+    /// tile 2 the top-center tile, etcetera. The identifier of every tile is its index plus one.
+    pub fn six_tiles() -> Layout {
+        let placements = (0..6)
+            .map(|i| TilePlacement {
+                row: (i % 2) as u16,
+                col: (i / 2) as u16,
+                rotation: 0,
+                identifier: (i + 1) as u8,
+            })
+            .collect();
+        Layout::new(placements).expect("The layout of 6 tiles is valid")
+    }
+
+    /// Length of the framebuffer of the wall in bytes.
+    pub fn frame_len(&self) -> usize {
+        self.rows * self.cols * 3
+    }
+
+    /// Returns the gather map of the tile at `index`: element `i` is the index in the framebuffer of the wall of the `i`th byte
+    /// that is send to the tile, so the framebuffer of the tile in wire order is gathered from the framebuffer of the wall with it.
+    pub fn gather_index(&self, index: usize) -> Vec<usize> {
+        let placement = self.placements[index];
+        let index_converter_vector = generate_index_conversion_vector();
+        let last = TILE_SIZE - 1;
+
+        let mut gather_index = vec![0; 1200];
+        for row in 0..TILE_SIZE {
+            for col in 0..TILE_SIZE {
+                // Where the pixel of the tile ends up within the 20x20 pixels of the tile on the wall, after the tile is rotated
+                let (wall_row, wall_col) = match placement.rotation {
+                    90 => (col, last - row),
+                    180 => (last - row, last - col),
+                    270 => (last - col, row),
+                    _ => (row, col),
+                };
+                let wall_row = placement.row as usize * TILE_SIZE + wall_row;
+                let wall_col = placement.col as usize * TILE_SIZE + wall_col;
+
+                for channel in 0..3 {
+                    let byte = (row * TILE_SIZE + col) * 3 + channel;
+                    gather_index[index_converter_vector[byte]] = (wall_row * self.cols + wall_col) * 3 + channel;
+                }
+            }
+        }
+
+        gather_index
+    }
+}
+
+/// The gather map of a tile of the single tile and the 6 tiles mode, in which the framebuffer of the wall is always 40x60 pixels.
+///
+/// In single tile mode the tile shows the first 1200 bytes of the framebuffer, otherwise this is identical to `Layout::six_tiles`.
+pub fn legacy_gather_index(index: usize, tiles_len: usize) -> Vec<usize> {
+    wire_order_index(tiles_len)[index * 1200..(index + 1) * 1200].to_vec()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn placement(row: u16, col: u16, rotation: u16, identifier: u8) -> TilePlacement {
+        TilePlacement { row, col, rotation, identifier }
+    }
+
+    #[test]
+    fn test_six_tiles_matches_legacy_gather_index() {
+        let layout = Layout::six_tiles();
+        let wire_order_index = wire_order_index(6);
+
+        assert_eq!((layout.rows, layout.cols), (40, 60));
+        for i in 0..6 {
+            assert_eq!(layout.gather_index(i), legacy_gather_index(i, 6));
+            assert_eq!(layout.gather_index(i), wire_order_index[i * 1200..(i + 1) * 1200]);
+        }
+    }
+
+    #[test]
+    fn test_rotation() {
+        let layout = Layout::new(vec![placement(0, 1, 90, 0)]).expect("Valid layout");
+        let gather_index = layout.gather_index(0);
+        let index_converter_vector = generate_index_conversion_vector();
+
+        // The top-left pixel of a tile which is rotated 90 degrees clockwise is the top-right pixel of its place on the wall
+        assert_eq!((layout.rows, layout.cols), (20, 40));
+        assert_eq!(gather_index[index_converter_vector[0]], 39 * 3);
+        // The top-right pixel ends up bottom-right
+        assert_eq!(gather_index[index_converter_vector[19 * 3]], (19 * 40 + 39) * 3);
+    }
+
+    #[test]
+    fn test_gather_index_covers_every_pixel_of_the_tile_once() {
+        let layout = Layout::new(vec![placement(0, 0, 0, 1), placement(1, 0, 270, 2), placement(1, 1, 180, 3)])
+            .expect("Valid layout");
+
+        for i in 0..3 {
+            let mut gather_index = layout.gather_index(i);
+            gather_index.sort();
+            gather_index.dedup();
+            assert_eq!(gather_index.len(), 1200);
+        }
+    }
+
+    #[test]
+    fn test_invalid_layouts() {
+        assert_eq!(Layout::new(vec![]).unwrap_err(), LayoutError::NoTiles);
+        assert_eq!(
+            Layout::new(vec![placement(0, 0, 45, 0)]).unwrap_err(),
+            LayoutError::InvalidRotation(0)
+        );
+        assert_eq!(
+            Layout::new(vec![placement(0, 0, 0, 1), placement(0, 0, 0, 2)]).unwrap_err(),
+            LayoutError::OverlappingTiles(0, 1)
+        );
+        assert_eq!(
+            Layout::new(vec![placement(0, 0, 0, 1), placement(0, 1, 0, 1)]).unwrap_err(),
+            LayoutError::DuplicateIdentifier(0, 1)
+        );
+    }
+}
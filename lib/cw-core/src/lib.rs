@@ -67,27 +67,61 @@
 //! This library is distributed under the terms of the MIT license.
 //! See the [LICENSE](https://github.com/StrijpT-Ellie/contour-wall/blob/main/LICENSE) file for details.
 
-use std::ffi::c_char;
+use std::{ffi::c_char, time::Instant};
 
-use log::{error, info, trace, warn};
+use log::{error, info, warn};
 use rayon::prelude::*;
-use serialport::{Error, SerialPortInfo, SerialPortType};
 use util::configure_logging;
 
-use tile::Tile;
+use discovery::discover_tiles;
+use layout::{legacy_gather_index, Layout, TilePlacement};
+use scheduler::{FrameScheduler, SchedulerStatistics};
+use tile::{Tile, TileStatistics};
 
 use crate::status_code::StatusCode;
 
+pub mod discovery;
+pub mod layout;
+pub mod scheduler;
 pub mod status_code;
 pub mod tile;
 pub mod util;
 
-/// ContourWallCore class encapsulates the list of connected tiles.
+/// ContourWallCore class encapsulates the list of connected tiles, and the scheduler which paces their frames.
+///
+/// The framebuffer of the wall is `frame_rows` by `frame_cols` pixels, every tile knows where its pixels are in it.
 #[repr(C)]
 #[derive(Debug)]
 pub struct ContourWallCore {
     pub tiles_ptr: *mut Tile,
     pub tiles_len: usize,
+    pub scheduler_ptr: *mut FrameScheduler,
+    pub frame_rows: usize,
+    pub frame_cols: usize,
+}
+
+impl ContourWallCore {
+    /// Hands the ownership of the tiles and a new scheduler over to the returned ContourWallCore, they are freed by `drop`.
+    ///
+    /// Also configures logging and sizes the threadpool to the amount of tiles.
+    fn from_tiles(tiles: Vec<Tile>, frame_rows: usize, frame_cols: usize) -> ContourWallCore {
+        let tiles_len = tiles.len();
+        configure_logging();
+        if !configure_threadpool(tiles_len.clamp(1, u8::MAX as usize) as u8) {
+            warn!(
+                "Failed to configure the threadpool with {} thread",
+                tiles_len
+            )
+        }
+
+        ContourWallCore {
+            tiles_ptr: Box::into_raw(tiles.into_boxed_slice()) as *mut Tile,
+            tiles_len,
+            scheduler_ptr: Box::into_raw(Box::new(FrameScheduler::new())),
+            frame_rows,
+            frame_cols,
+        }
+    }
 }
 
 /// Initializes the full ContourWall, all the configuration and orchistration happens automatically.
@@ -98,20 +132,17 @@ pub struct ContourWallCore {
 /// the library knows which COM port is which tile. This lets the library know where to send
 /// each part of a framebuffer to the right COM port.
 ///
+/// The ports are probed in parallel, and the port of every tile is cached (see `discovery::PortCache`). On the next start
+/// only the cached ports are validated, all ports are only scanned again when that fails.
+///
 /// ## Parameters
 /// - baudrate: an unsigned 32bit integer, default value of 2.000.000
 ///
 /// ## Returns
-/// The initialized ContourWall is returned.
+/// The initialized ContourWall is returned. Tiles which are not found are part of it as disconnected tiles, which are looked
+/// for in the background, see `tile_status`.
 #[no_mangle]
 pub extern "C" fn new(baud_rate: u32) -> ContourWallCore {
-    fn error_handler(e: Error) -> Vec<SerialPortInfo> {
-        error!("{}", e);
-        Vec::new()
-    }
-
-    let ports = serialport::available_ports().unwrap_or_else(error_handler);
-
     // This could be written more optimally like this:
     // let tiles: Vec<Option<Tile>> = vec![None; 6];
     // but, that does not work due to .clone() not being implemented for Tile
@@ -121,61 +152,33 @@ pub extern "C" fn new(baud_rate: u32) -> ContourWallCore {
         tiles.push(None);
     }
 
-    for port in ports {
-        let SerialPortType::UsbPort(_) = port.port_type else {
-            trace!("Port: '{}' is a USB port", port.port_name);
+    for (identifier, mut tile) in discover_tiles(baud_rate, &[1, 2, 3, 4, 5, 6]) {
+        if !(1..=6).contains(&identifier) {
+            warn!("Tile identifier {} is not part of the 6 tile wall", identifier);
             continue;
-        };
-
-        let tile = Tile::init(port.port_name.clone(), baud_rate);
-        let mut tile = match tile {
-            Ok(tile) => {
-                tile
-            },
-            Err(error) => {
-                println!(
-                    "'{}', is not an ELLIE tile, because: {:?}",
-                    port.port_name, error
-                );
-                continue;
-            }
-        };
-        println!("{:?}", port);
-        let (status_code, identifier) = tile.command_4_get_tile_identifier();
-        if status_code == StatusCode::Ok {
-            println!("Identifier: {}", identifier);
-            tiles[identifier as usize - 1] = Some(tile);
-        } else {
-            println!("awdadwdaw");
         }
+        tile.gather_index = legacy_gather_index(identifier as usize - 1, 6);
+        tiles[identifier as usize - 1] = Some(tile);
     }
 
-    let mut tiles: Vec<Tile> = tiles.into_iter().flat_map(|tile| tile).collect();
-    println!("{}", tiles.len());
-    // TODO: Implement actual error that does not crash the program
-    assert_eq!(
-        tiles.len(),
-        6,
-        "[CW CORE ERROR] Only {}/6 tiles were found",
-        tiles.len()
-    );
-
-    let tiles_ptr = tiles.as_mut_ptr();
-    let tiles_len = tiles.len();
-    configure_logging();
-    if !configure_threadpool(tiles_len as u8) {
-        warn!(
-            "Failed to configure the threadpool with {} thread",
-            tiles_len
-        )
+    // The wall runs with the tiles that were found, the others are looked for in the background
+    let found = tiles.iter().flatten().count();
+    if found != 6 {
+        error!("[CW CORE ERROR] Only {}/6 tiles were found", found);
     }
+    let tiles: Vec<Tile> = tiles
+        .into_iter()
+        .enumerate()
+        .map(|(i, tile)| {
+            tile.unwrap_or_else(|| {
+                let mut tile = Tile::disconnected(None, i as u8 + 1, baud_rate);
+                tile.gather_index = legacy_gather_index(i, 6);
+                tile
+            })
+        })
+        .collect();
 
-    std::mem::forget(tiles);
-
-    ContourWallCore {
-        tiles_ptr,
-        tiles_len,
-    }
+    ContourWallCore::from_tiles(tiles, 40, 60)
 }
 
 /// Initializes the full ContourWall, based on manualy input of COM ports.
@@ -190,7 +193,7 @@ pub extern "C" fn new(baud_rate: u32) -> ContourWallCore {
 /// - baudrate: an unsigned 32bit integer, default value of 2.000.000
 ///
 /// ## Returns
-/// The initialized ContourWall is returned.
+/// The initialized ContourWall is returned. Tiles which cannot be opened are reopened in the background.
 #[no_mangle]
 pub extern "C" fn new_with_ports(
     com_port0: *const c_char,
@@ -220,34 +223,20 @@ pub extern "C" fn new_with_ports(
 
     for (i, com_port) in com_ports.into_iter().enumerate() {
         let tile = Tile::init(com_port.clone(), baud_rate);
-        let tile = match tile {
+        let mut tile = match tile {
             Ok(tile) => tile,
             Err(error) => {
-                println!("'{}', is not an ELLIE tile, because: {:?}", com_port, error);
-                continue;
+                warn!("'{}', is not an ELLIE tile, because: {:?}", com_port, error);
+                Tile::disconnected(Some(com_port), 0, baud_rate)
             }
         };
+        tile.gather_index = legacy_gather_index(i, 6);
         tiles[i] = Some(tile);
     }
 
-    let mut tiles: Vec<Tile> = tiles.into_iter().flat_map(|tile| tile).collect();
+    let tiles: Vec<Tile> = tiles.into_iter().flat_map(|tile| tile).collect();
 
-    let tiles_ptr = tiles.as_mut_ptr();
-    let tiles_len = tiles.len();
-    configure_logging();
-    if !configure_threadpool(tiles_len as u8) {
-        warn!(
-            "Failed to configure the threadpool with {} thread",
-            tiles_len
-        )
-    }
-
-    std::mem::forget(tiles);
-
-    ContourWallCore {
-        tiles_ptr,
-        tiles_len,
-    }
+    ContourWallCore::from_tiles(tiles, 40, 60)
 }
 
 /// Initializes the ContourWall as a single tile
@@ -265,43 +254,100 @@ pub extern "C" fn single_new_with_port(com_port: *const c_char, baud_rate: u32)
     let tile = match tile {
         Ok(tile) => tile,
         Err(error) => {
-            println!("'{}', is not an ELLIE tile, because: {:?}", com_port, error);
-            todo!();
+            warn!("'{}', is not an ELLIE tile, because: {:?}", com_port, error);
+            Tile::disconnected(Some(com_port), 0, baud_rate)
         }
     };
 
-    let mut tiles = vec![tile];
-    let tiles_ptr = tiles.as_mut_ptr();
-    let tiles_len = tiles.len();
-    configure_logging();
-    if !configure_threadpool(tiles_len as u8) {
-        error!(
-            "Failed to configure the threadpool with {} thread",
-            tiles_len
-        )
-    }
+    // The framebuffer of a single tile is the 20x20 pixels of the tile, 1200 bytes, like the wrappers allocate it
+    let tiles = vec![tile];
+    ContourWallCore::from_tiles(tiles, 20, 20)
+}
 
-    std::mem::forget(tiles);
+/// Initializes a ContourWall of any size and shape, of which the tiles are placed according to the layout.
+///
+/// The framebuffer of the wall is the bounding box of the tiles, see `Layout`. The gather map of every tile is precomputed
+/// from its placement, so the frames are send without any per-frame layout work. The threadpool gets a thread per tile.
+///
+/// Tiles which cannot be opened or found are part of the wall as disconnected tiles, which are reopened in the background,
+/// see `tile_status`. An invalid layout results in a ContourWall without tiles.
+///
+/// ## Parameters
+/// - placements_ptr: pointer to an array of `tiles_len` tile placements
+/// - com_ports_ptr: pointer to an array of `tiles_len` device names of the COM ports, in the same order as the placements. If it is
+///   null, the tiles are found automatically and matched with the placements by their identifier, like `new` does.
+/// - tiles_len: the amount of tiles
+/// - baudrate: an unsigned 32bit integer, default value of 2.000.000
+///
+/// ## Returns
+/// The initialized ContourWall is returned.
+#[no_mangle]
+pub extern "C" fn new_with_layout(
+    placements_ptr: *const TilePlacement,
+    com_ports_ptr: *const *const c_char,
+    tiles_len: usize,
+    baud_rate: u32,
+) -> ContourWallCore {
+    let placements = unsafe { std::slice::from_raw_parts(placements_ptr, tiles_len) }.to_vec();
+    let layout = match Layout::new(placements) {
+        Ok(layout) => layout,
+        Err(error) => {
+            error!("The layout of the ContourWall is invalid: {:?}", error);
+            return ContourWallCore::from_tiles(Vec::new(), 0, 0);
+        }
+    };
 
-    ContourWallCore {
-        tiles_ptr,
-        tiles_len,
+    let mut tiles: Vec<Option<Tile>> = (0..tiles_len).map(|_| None).collect();
+    if com_ports_ptr.is_null() {
+        let expected: Vec<u8> = layout
+            .placements
+            .iter()
+            .map(|placement| placement.identifier)
+            .filter(|&identifier| identifier != 0)
+            .collect();
+        for (identifier, tile) in discover_tiles(baud_rate, &expected) {
+            match layout.placements.iter().position(|placement| identifier != 0 && placement.identifier == identifier) {
+                Some(i) => tiles[i] = Some(tile),
+                None => warn!("Tile identifier {} is not part of the layout", identifier),
+            }
+        }
+    } else {
+        let com_ports = unsafe { std::slice::from_raw_parts(com_ports_ptr, tiles_len) };
+        for (i, &com_port) in com_ports.iter().enumerate() {
+            let com_port = util::str_ptr_to_string(com_port);
+            match Tile::init(com_port.clone(), baud_rate) {
+                Ok(tile) => tiles[i] = Some(tile),
+                Err(error) => {
+                    warn!("'{}', is not an ELLIE tile, because: {:?}", com_port, error);
+                    tiles[i] = Some(Tile::disconnected(Some(com_port), layout.placements[i].identifier, baud_rate));
+                }
+            }
+        }
     }
+
+    let tiles: Vec<Tile> = tiles
+        .into_iter()
+        .enumerate()
+        .map(|(i, tile)| {
+            let mut tile = tile.unwrap_or_else(|| {
+                error!("Tile {} of the layout was not found", i);
+                Tile::disconnected(None, layout.placements[i].identifier, baud_rate)
+            });
+            tile.gather_index = layout.gather_index(i);
+            tile
+        })
+        .collect();
+
+    ContourWallCore::from_tiles(tiles, layout.rows, layout.cols)
 }
 
 /// Configures the amount of threads for the Rayon threadpool.
 ///
-/// The default threadcount is the amount of tiles connected to the Contour Wall. If the full wall is
-/// initialised then there are 6 threads. If the wall is in single tile mode, then there is only one thread.
+/// The default threadcount is the amount of tiles connected to the Contour Wall, every tile is driven by its own thread
+/// as the tiles spend most of their time waiting on their serial connection.
+/// The threadpool can only be configured once, later calls return false.
 #[no_mangle]
 pub extern "C" fn configure_threadpool(threads: u8) -> bool {
-    if threads > 6 {
-        warn!(
-            "A higher thread count than {}, is unnecessary as there is a maximum of 6 tiles",
-            threads
-        );
-    }
-
     let res = rayon::ThreadPoolBuilder::new()
         .num_threads(threads as usize)
         .build_global();
@@ -320,56 +366,266 @@ pub extern "C" fn configure_threadpool(threads: u8) -> bool {
 /// - this: a mutable pointer to the ContourWallCore object
 #[no_mangle]
 pub extern "C" fn show(this: &mut ContourWallCore) {
+    show_selected_tiles(this, None);
+}
+
+/// Executes the `command_0_show` only on the tiles which are selected in `tiles_mask_ptr`.
+///
+/// The execution of the command on each tile is done concurrently.
+///
+/// ## Parameter
+/// - this: a mutable pointer to the ContourWallCore object
+/// - tiles_mask_ptr: pointer to an array with a byte for every tile, in the same order as the tiles. Tiles of which the byte is 0 are skipped.
+#[no_mangle]
+pub extern "C" fn show_tiles(this: &mut ContourWallCore, tiles_mask_ptr: *const u8) {
+    let tiles_mask: &[u8] = unsafe { std::slice::from_raw_parts(tiles_mask_ptr, this.tiles_len) };
+    show_selected_tiles(this, Some(tiles_mask));
+}
+
+fn show_selected_tiles(this: &mut ContourWallCore, tiles_mask: Option<&[u8]>) {
+    let start = Instant::now();
     let tiles: &mut [Tile] =
         unsafe { std::slice::from_raw_parts_mut(this.tiles_ptr, this.tiles_len) };
+    let scheduler: &mut FrameScheduler = unsafe { &mut *this.scheduler_ptr };
+
+    // All tiles show at the same deadline, which cannot be earlier than the moment the slowest tile is ready
+    let earliest = tiles
+        .iter()
+        .enumerate()
+        .filter(|(i, _)| is_selected(tiles_mask, *i))
+        .map(|(_, tile)| tile.ready_time())
+        .max();
+    let deadline = scheduler.next_deadline(earliest.unwrap_or_else(Instant::now));
+
+    let show_times: Vec<Instant> = tiles
+        .par_iter_mut()
+        .enumerate()
+        .filter(|(i, _)| is_selected(tiles_mask, *i))
+        .filter_map(|(_, tile)| {
+            let shown = show_at(tile, deadline);
+            if shown.is_none() {
+                tile.statistics.dropped_frames += 1;
+            }
+            shown
+        })
+        .collect();
 
-    tiles.par_iter_mut().for_each(|tile| {
-        let _status_code = tile.command_0_show();
-    });
+    // When no tile is shown, the frame still takes its place in the schedule
+    if earliest.is_none() {
+        util::sleep_until(deadline);
+    }
+    scheduler.record_show(deadline, &show_times);
+    scheduler.statistics.core_us += start.elapsed().as_secs_f64() * 1_000_000.0;
 }
 
 /// Executes the `command_2_update_all` on each tile.
 ///
-/// If the Contour Wall is in 6 tile mode, the framebuffer first gets split into 6 framebuffers,
-/// one framebuffer for each tile.
+/// Every tile gathers its part of the framebuffer straight from the framebuffer, with the gather map that is precomputed
+/// from the layout of the wall.
 ///
 /// The execution of the command on each tile is done concurrently.
 ///
 /// ## Parameter
 /// - this: a mutable pointer to the ContourWallCore object
-/// - frame_buffer_ptr: pointer to framebuffer. If Contour Wall is in 6 tile mode the framebuffer is expected to be 7200 bytes big. In one tile mode, it is expected to be 1200 bytes big.
+/// - frame_buffer_ptr: pointer to framebuffer of `frame_rows` by `frame_cols` pixels. In 6 tile mode this is 7200 bytes, in one tile mode this is 1200 bytes.
 #[no_mangle]
 pub extern "C" fn update_all(
     this: &mut ContourWallCore,
     frame_buffer_ptr: *const u8,
     optimize: bool,
 ) {
-    let buffer_size = 1200 * this.tiles_len;
+    update_selected_tiles(this, frame_buffer_ptr, optimize, None);
+}
 
-    let frame_buffer: &[u8] = unsafe { std::slice::from_raw_parts(frame_buffer_ptr, buffer_size) };
+/// Executes the `command_2_update_all` only on the tiles which are selected in `tiles_mask_ptr`.
+///
+/// This is used when it is known which tiles have changed, the tiles that did not change are skipped entirely.
+///
+/// ## Parameter
+/// - this: a mutable pointer to the ContourWallCore object
+/// - frame_buffer_ptr: pointer to framebuffer, identical to `update_all`
+/// - optimize: identical to `update_all`
+/// - tiles_mask_ptr: pointer to an array with a byte for every tile, in the same order as the tiles. Tiles of which the byte is 0 are skipped.
+#[no_mangle]
+pub extern "C" fn update_tiles(
+    this: &mut ContourWallCore,
+    frame_buffer_ptr: *const u8,
+    optimize: bool,
+    tiles_mask_ptr: *const u8,
+) {
+    let tiles_mask: &[u8] = unsafe { std::slice::from_raw_parts(tiles_mask_ptr, this.tiles_len) };
+    update_selected_tiles(this, frame_buffer_ptr, optimize, Some(tiles_mask));
+}
+
+fn update_selected_tiles(
+    this: &mut ContourWallCore,
+    frame_buffer_ptr: *const u8,
+    optimize: bool,
+    tiles_mask: Option<&[u8]>,
+) {
+    let frame_buffer = wall_framebuffer(this, frame_buffer_ptr);
     let tiles: &mut [Tile] =
         unsafe { std::slice::from_raw_parts_mut(this.tiles_ptr, this.tiles_len) };
 
-    if this.tiles_len == 1 {
-        let tile = tiles
-            .first_mut()
-            .expect("There should at least be one tile");
-        let _status_code = tile.command_2_update_all(frame_buffer, optimize);
-    } else if this.tiles_len == 6 {
-        let frame_buffers = util::split_framebuffer(frame_buffer);
-
-        tiles.par_iter_mut().enumerate().for_each(|(i, tile)| {
-            let _status_code = tile.command_2_update_all(frame_buffers[i].as_slice(), optimize);
+    tiles
+        .par_iter_mut()
+        .enumerate()
+        .filter(|(i, _)| is_selected(tiles_mask, *i))
+        .for_each(|(_, tile)| {
+            tile.command_2_update_gathered(frame_buffer, optimize);
         });
-    } else {
-        error!(
-            "--> UNREACHABLE <-- Amount of tilesxis i  HAS to be either 1 or 6, not '{}'\n EXITING",
-            this.tiles_len
-        );
-        unreachable!();
+}
+
+/// Updates every tile with its part of the framebuffer and shows it, in one concurrent pass over the tiles.
+///
+/// This does the same as `update_all` followed by `show`, but every tile shows its framebuffer as soon as the shared deadline
+/// of the frame is reached, instead of first waiting for the slowest tile to be updated. The deadline is set by the scheduler,
+/// see `set_target_fps`, and is never earlier than the moment the slowest tile is expected to be updated.
+///
+/// ## Parameter
+/// - this: a mutable pointer to the ContourWallCore object
+/// - frame_buffer_ptr: pointer to framebuffer, identical to `update_all`
+/// - optimize: identical to `update_all`
+#[no_mangle]
+pub extern "C" fn update_and_show(
+    this: &mut ContourWallCore,
+    frame_buffer_ptr: *const u8,
+    optimize: bool,
+) {
+    update_and_show_selected_tiles(this, frame_buffer_ptr, optimize, None);
+}
+
+/// Executes `update_and_show` only on the tiles which are selected in `tiles_mask_ptr`.
+///
+/// ## Parameter
+/// - this: a mutable pointer to the ContourWallCore object
+/// - frame_buffer_ptr: pointer to framebuffer, identical to `update_all`
+/// - optimize: identical to `update_all`
+/// - tiles_mask_ptr: pointer to an array with a byte for every tile, in the same order as the tiles. Tiles of which the byte is 0 are skipped.
+#[no_mangle]
+pub extern "C" fn update_and_show_tiles(
+    this: &mut ContourWallCore,
+    frame_buffer_ptr: *const u8,
+    optimize: bool,
+    tiles_mask_ptr: *const u8,
+) {
+    let tiles_mask: &[u8] = unsafe { std::slice::from_raw_parts(tiles_mask_ptr, this.tiles_len) };
+    update_and_show_selected_tiles(this, frame_buffer_ptr, optimize, Some(tiles_mask));
+}
+
+fn update_and_show_selected_tiles(
+    this: &mut ContourWallCore,
+    frame_buffer_ptr: *const u8,
+    optimize: bool,
+    tiles_mask: Option<&[u8]>,
+) {
+    let frame_buffer = wall_framebuffer(this, frame_buffer_ptr);
+
+    update_and_show_with(this, tiles_mask, |_, tile| {
+        tile.command_2_update_gathered(frame_buffer, optimize)
+    });
+}
+
+/// Updates every tile with `update` and signals it to show at the deadline of the frame, in one concurrent pass over the tiles.
+/// A tile is not signalled to show when updating failed.
+fn update_and_show_with<F>(this: &mut ContourWallCore, tiles_mask: Option<&[u8]>, update: F)
+where
+    F: Fn(usize, &mut Tile) -> StatusCode + Sync,
+{
+    let start = Instant::now();
+    let tiles: &mut [Tile] =
+        unsafe { std::slice::from_raw_parts_mut(this.tiles_ptr, this.tiles_len) };
+    let scheduler: &mut FrameScheduler = unsafe { &mut *this.scheduler_ptr };
+
+    let earliest = tiles
+        .iter()
+        .enumerate()
+        .filter(|(i, _)| is_selected(tiles_mask, *i))
+        .map(|(_, tile)| tile.show_ready_time())
+        .max();
+    let deadline = scheduler.next_deadline(earliest.unwrap_or_else(Instant::now));
+
+    let show_times: Vec<Instant> = tiles
+        .par_iter_mut()
+        .enumerate()
+        .filter(|(i, _)| is_selected(tiles_mask, *i))
+        .filter_map(|(i, tile)| {
+            let shown = match update(i, tile) {
+                StatusCode::Ok => show_at(tile, deadline),
+                _ => None,
+            };
+            if shown.is_none() {
+                tile.statistics.dropped_frames += 1;
+            }
+            shown
+        })
+        .collect();
+
+    // When no tile is shown, the frame still takes its place in the schedule
+    if earliest.is_none() {
+        util::sleep_until(deadline);
+    }
+    scheduler.record_show(deadline, &show_times);
+    scheduler.statistics.core_us += start.elapsed().as_secs_f64() * 1_000_000.0;
+}
+
+/// Shows the tile at the deadline, returns the moment the tile was told to show the frame, or None when it did not show it.
+fn show_at(tile: &mut Tile, deadline: Instant) -> Option<Instant> {
+    match tile.command_0_show_at(deadline) {
+        StatusCode::Ok => tile.last_show_time(),
+        _ => None,
     }
 }
 
+/// Updates and shows every tile like `update_and_show`, with a framebuffer that is already in the order the LEDs are wired.
+///
+/// The framebuffer holds the 1200 bytes of every tile in wire order, one tile after the other, and is send as is. It is created
+/// by gathering the framebuffer of the wall with the index that `wire_order_index` returns, or rendered in wire order directly.
+///
+/// ## Parameter
+/// - this: a mutable pointer to the ContourWallCore object
+/// - wire_frame_buffer_ptr: pointer to the framebuffer in wire order, 1200 bytes per tile
+/// - optimize: identical to `update_all`
+#[no_mangle]
+pub extern "C" fn update_and_show_wire(
+    this: &mut ContourWallCore,
+    wire_frame_buffer_ptr: *const u8,
+    optimize: bool,
+) {
+    let wire_frame_buffer: &[u8] =
+        unsafe { std::slice::from_raw_parts(wire_frame_buffer_ptr, 1200 * this.tiles_len) };
+
+    update_and_show_with(this, None, |i, tile| {
+        tile.command_2_update_wire(&wire_frame_buffer[i * 1200..(i + 1) * 1200], optimize)
+    });
+}
+
+/// Writes the wiring of the wall as a gather index into the framebuffer of the wall, which are the gather maps of all tiles
+/// one after the other. See `Layout::gather_index`.
+///
+/// ## Parameter
+/// - this: a pointer to the ContourWallCore object
+/// - index_ptr: pointer to an array of 1200 unsigned 32-bit integers per tile, which is filled with the index
+#[no_mangle]
+pub extern "C" fn wire_order_index(this: &ContourWallCore, index_ptr: *mut u32) {
+    let index: &mut [u32] = unsafe { std::slice::from_raw_parts_mut(index_ptr, 1200 * this.tiles_len) };
+    let tiles: &[Tile] = unsafe { std::slice::from_raw_parts(this.tiles_ptr, this.tiles_len) };
+    let wire_order_index = tiles.iter().flat_map(|tile| tile.gather_index.iter());
+    for (i, &wire_index) in index.iter_mut().zip(wire_order_index) {
+        *i = wire_index as u32;
+    }
+}
+
+/// Returns the framebuffer of the whole wall behind `frame_buffer_ptr`, which is `frame_rows` by `frame_cols` pixels.
+fn wall_framebuffer<'a>(this: &ContourWallCore, frame_buffer_ptr: *const u8) -> &'a [u8] {
+    unsafe { std::slice::from_raw_parts(frame_buffer_ptr, this.frame_rows * this.frame_cols * 3) }
+}
+
+/// Without a mask all tiles are selected, otherwise the tiles of which the byte in the mask is not 0.
+fn is_selected(tiles_mask: Option<&[u8]>, index: usize) -> bool {
+    tiles_mask.map_or(true, |tiles_mask| tiles_mask[index] != 0)
+}
+
 /// Executes the `command_1_solid_color` on each tile.
 ///
 /// The execution of the command on each tile is done concurrently.
@@ -390,10 +646,97 @@ pub extern "C" fn solid_color(this: &mut ContourWallCore, red: u8, green: u8, bl
         unsafe { std::slice::from_raw_parts_mut(this.tiles_ptr, this.tiles_len) };
 
     tiles.par_iter_mut().for_each(|tile| {
-        let _status_code = tile.command_1_solid_color(red, green, blue);
+        tile.with_retries(|tile| tile.command_1_solid_color(red, green, blue));
     });
 }
 
+/// Sets the target frames per second of the ContourWall.
+///
+/// Every call to `show` waits for the next frame deadline, which are spaced `1 / fps` seconds apart on a monotonic clock.
+/// All tiles are told to show at the same deadline, so the tiles do not drift relative to each other. A frame of which the
+/// deadline has already passed is shown immediately and counted as missed. With an fps of 0 frames are shown as soon as
+/// the tiles are ready, which is the default.
+///
+/// ## Parameters
+/// - this: a mutable pointer to the ContourWallCore object
+/// - fps: target frames per second
+#[no_mangle]
+pub extern "C" fn set_target_fps(this: &mut ContourWallCore, fps: f64) {
+    let scheduler: &mut FrameScheduler = unsafe { &mut *this.scheduler_ptr };
+    scheduler.set_target_fps(fps);
+}
+
+/// Returns the pacing statistics of the ContourWall: missed deadlines, jitter of the show moment and skew between the tiles.
+///
+/// ## Parameters
+/// - this: a pointer to the ContourWallCore object
+/// - reset: reset the statistics after returning them
+#[no_mangle]
+pub extern "C" fn scheduler_statistics(this: &mut ContourWallCore, reset: bool) -> SchedulerStatistics {
+    let scheduler: &mut FrameScheduler = unsafe { &mut *this.scheduler_ptr };
+    let statistics = scheduler.statistics;
+    if reset {
+        scheduler.reset_statistics();
+    }
+    statistics
+}
+
+/// Sets the amount of changed pixels below which `command_3_update_specific_led` is used, when `update_all` is optimized.
+///
+/// The default is `tile::DEFAULT_SPARSE_THRESHOLD`, 0 disables sending only the changed pixels. The maximum is 256, as
+/// `command_3_update_specific_led` cannot update more than 255 LEDs.
+///
+/// ## Parameters
+/// - this: a mutable pointer to the ContourWallCore object
+/// - threshold: amount of pixels
+#[no_mangle]
+pub extern "C" fn set_sparse_threshold(this: &mut ContourWallCore, threshold: u16) {
+    let tiles: &mut [Tile] =
+        unsafe { std::slice::from_raw_parts_mut(this.tiles_ptr, this.tiles_len) };
+
+    for tile in tiles {
+        tile.sparse_threshold = (threshold as usize).min(256);
+    }
+}
+
+/// Writes the status code of the last frame of every tile, see `Tile::status`.
+///
+/// `StatusCode::Ok` means the tile accepted and showed the frame. A tile which rejected a frame is resynchronized and the frame
+/// is resend, up to `tile::DEFAULT_RETRIES` times. A tile which asked for a reset reports `StatusCode::Reset` while it is
+/// quiet, and a tile of which the connection is lost reports `StatusCode::Disconnected` while it is reopened in the background.
+/// The other tiles keep showing frames in the meantime.
+///
+/// ## Parameters
+/// - this: a pointer to the ContourWallCore object
+/// - status_ptr: pointer to an array with a byte for every tile, which is filled with the status codes
+#[no_mangle]
+pub extern "C" fn tile_status(this: &ContourWallCore, status_ptr: *mut u8) {
+    let status: &mut [u8] = unsafe { std::slice::from_raw_parts_mut(status_ptr, this.tiles_len) };
+    let tiles: &[Tile] = unsafe { std::slice::from_raw_parts(this.tiles_ptr, this.tiles_len) };
+
+    for (status, tile) in status.iter_mut().zip(tiles) {
+        *status = tile.status().as_u8();
+    }
+}
+
+/// Returns the statistics of a tile: how often each command was used to send a framebuffer, and the amount of bytes sent.
+///
+/// ## Parameters
+/// - this: a pointer to the ContourWallCore object
+/// - index: index of the tile, in the same order as the tiles were initialized
+#[no_mangle]
+pub extern "C" fn tile_statistics(this: &ContourWallCore, index: usize) -> TileStatistics {
+    let tiles: &[Tile] = unsafe { std::slice::from_raw_parts(this.tiles_ptr, this.tiles_len) };
+
+    match tiles.get(index) {
+        Some(tile) => tile.statistics,
+        None => {
+            error!("There is no tile with index {}, there are {} tiles", index, this.tiles_len);
+            TileStatistics::default()
+        }
+    }
+}
+
 #[no_mangle]
 pub extern "C" fn set_tile_identifier(com_port: *const c_char, baud_rate: u32, identifier: u8) -> bool {
     let com_port = util::str_ptr_to_string(com_port);
@@ -414,18 +757,27 @@ pub extern "C" fn set_tile_identifier(com_port: *const c_char, baud_rate: u32, i
     }
 }
 
-/// Transfers ownership of the ContourWallCore object back to Rust and frees the memory.
+/// Transfers ownership of the tiles and the scheduler of the ContourWallCore object back to Rust and frees their memory.
 /// Also closes the serial connections
+///
+/// The ContourWallCore object itself is owned by the caller, its pointers are set to null so it cannot be used anymore.
 #[no_mangle]
 pub extern "C" fn drop(this: *mut ContourWallCore) {
     if !this.is_null() {
         unsafe {
-            let cw = Box::from_raw(this);
-            std::mem::drop(cw);
+            let cw = &mut *this;
+            if !cw.tiles_ptr.is_null() {
+                let tiles: Box<[Tile]> =
+                    Box::from_raw(std::ptr::slice_from_raw_parts_mut(cw.tiles_ptr, cw.tiles_len));
+                std::mem::drop(tiles);
+            }
+            if !cw.scheduler_ptr.is_null() {
+                std::mem::drop(Box::from_raw(cw.scheduler_ptr));
+            }
 
-            let tiles: Vec<Tile> =
-                Vec::from_raw_parts((*this).tiles_ptr, (*this).tiles_len, (*this).tiles_len);
-            std::mem::drop(tiles);
+            cw.tiles_ptr = std::ptr::null_mut();
+            cw.tiles_len = 0;
+            cw.scheduler_ptr = std::ptr::null_mut();
         }
     }
 }
@@ -469,4 +821,21 @@ mod tests {
 
         assert!(false);
     }
+
+    #[test]
+    fn test_single_tile_reads_1200_bytes() {
+        let com_string: *const c_char = CString::new("/dev/does-not-exist")
+            .expect("CString conversion failed")
+            .into_raw();
+
+        // The tile cannot be opened, so it is disconnected, but it still gathers its framebuffer from the buffer
+        let mut cw = single_new_with_port(com_string, 2_000_000);
+        let buffer = vec![255; 1200];
+        assert_eq!(wall_framebuffer(&cw, buffer.as_ptr()).len(), buffer.len());
+
+        let tiles: &[Tile] = unsafe { std::slice::from_raw_parts(cw.tiles_ptr, cw.tiles_len) };
+        assert!(tiles[0].gather_index.iter().all(|&index| index < buffer.len()));
+
+        update_all(&mut cw, buffer.as_ptr(), false);
+    }
 }
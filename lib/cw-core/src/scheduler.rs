@@ -0,0 +1,139 @@
+//! FrameScheduler struct and implementation. The scheduler paces the frames of the whole wall on a monotonic clock.
+use std::time::{Duration, Instant};
+
+/// Statistics of the frame pacing, the times are in microseconds.
+#[repr(C)]
+#[derive(Debug, Default, Clone, Copy)]
+pub struct SchedulerStatistics {
+    /// Amount of frames that were shown
+    pub frames: u64,
+    /// Amount of frames of which the deadline had already passed when the frame was handed to `show`
+    pub missed_deadlines: u64,
+    /// Mean and maximum difference between the deadline and the moment the first tile was told to show the frame
+    pub jitter_mean_us: f64,
+    pub jitter_max_us: f64,
+    /// Difference between the first and the last tile being told to show the frame, for the last frame and the maximum
+    pub skew_last_us: f64,
+    pub skew_max_us: f64,
+    /// Total time spent within `show` and `update_and_show`, including the wait for the deadlines. The time a caller
+    /// spends on a frame outside of it, E.G. crossing the FFI boundary, is the time of its call minus this.
+    pub core_us: f64,
+}
+
+/// Hands out one shared "show" deadline per frame for all tiles, spaced by the frame period.
+///
+/// Without a target FPS the deadline is the moment `show` is called, so frames are shown as fast as the tiles allow, but
+/// still at the same moment on every tile.
+#[derive(Debug, Default)]
+pub struct FrameScheduler {
+    frame_period: Option<Duration>,
+    next_deadline: Option<Instant>,
+    jitter_total_us: f64,
+    pub statistics: SchedulerStatistics,
+}
+
+impl FrameScheduler {
+    pub fn new() -> FrameScheduler {
+        FrameScheduler::default()
+    }
+
+    /// Sets the target frames per second, 0 or less disables pacing.
+    pub fn set_target_fps(&mut self, fps: f64) {
+        self.frame_period = if fps > 0.0 {
+            Some(Duration::from_secs_f64(1.0 / fps))
+        } else {
+            None
+        };
+        self.next_deadline = None;
+    }
+
+    /// Returns the deadline of the next frame, which is never earlier than `earliest`.
+    ///
+    /// When the deadline has already passed, the deadline is missed and the schedule restarts from now, instead of
+    /// rushing the following frames to catch up.
+    pub fn next_deadline(&mut self, earliest: Instant) -> Instant {
+        let now = Instant::now();
+        let deadline = match (self.frame_period, self.next_deadline) {
+            (Some(_), Some(deadline)) if deadline >= now => deadline,
+            (Some(_), Some(_)) => {
+                self.statistics.missed_deadlines += 1;
+                now
+            }
+            _ => now,
+        }
+        .max(earliest);
+
+        self.next_deadline = self.frame_period.map(|frame_period| deadline + frame_period);
+        deadline
+    }
+
+    /// Records the moments the tiles were told to show the frame with the given deadline.
+    pub fn record_show(&mut self, deadline: Instant, show_times: &[Instant]) {
+        let (Some(first), Some(last)) = (show_times.iter().min(), show_times.iter().max()) else {
+            return;
+        };
+
+        let jitter_us = first.saturating_duration_since(deadline).as_secs_f64() * 1_000_000.0;
+        let skew_us = last.duration_since(*first).as_secs_f64() * 1_000_000.0;
+
+        let statistics = &mut self.statistics;
+        statistics.frames += 1;
+        self.jitter_total_us += jitter_us;
+        statistics.jitter_mean_us = self.jitter_total_us / statistics.frames as f64;
+        statistics.jitter_max_us = statistics.jitter_max_us.max(jitter_us);
+        statistics.skew_last_us = skew_us;
+        statistics.skew_max_us = statistics.skew_max_us.max(skew_us);
+    }
+
+    pub fn reset_statistics(&mut self) {
+        self.statistics = SchedulerStatistics::default();
+        self.jitter_total_us = 0.0;
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_deadlines_are_spaced_by_the_frame_period() {
+        let mut scheduler = FrameScheduler::new();
+        scheduler.set_target_fps(100.0);
+
+        let now = Instant::now();
+        let first = scheduler.next_deadline(now);
+        let second = scheduler.next_deadline(now);
+
+        assert_eq!(second - first, Duration::from_millis(10));
+        assert_eq!(scheduler.statistics.missed_deadlines, 0);
+    }
+
+    #[test]
+    fn test_missed_deadline_restarts_the_schedule() {
+        let mut scheduler = FrameScheduler::new();
+        scheduler.set_target_fps(1000.0);
+
+        scheduler.next_deadline(Instant::now());
+        std::thread::sleep(Duration::from_millis(5));
+        let deadline = scheduler.next_deadline(Instant::now());
+
+        assert_eq!(scheduler.statistics.missed_deadlines, 1);
+        assert!(deadline + Duration::from_millis(1) > Instant::now());
+    }
+
+    #[test]
+    fn test_record_show() {
+        let mut scheduler = FrameScheduler::new();
+        let deadline = Instant::now();
+        let show_times = [
+            deadline + Duration::from_micros(100),
+            deadline + Duration::from_micros(300),
+        ];
+
+        scheduler.record_show(deadline, &show_times);
+
+        assert_eq!(scheduler.statistics.frames, 1);
+        assert!((scheduler.statistics.jitter_mean_us - 100.0).abs() < 1.0);
+        assert!((scheduler.statistics.skew_last_us - 200.0).abs() < 1.0);
+    }
+}
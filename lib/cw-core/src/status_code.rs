@@ -1,6 +1,6 @@
 //! StatusCodes abstraction, status codes are used to communicate state between tile and library.
 
-#[derive(PartialEq, Debug)]
+#[derive(PartialEq, Debug, Clone, Copy)]
 pub enum StatusCode {
     Error,
     TooSlow,
@@ -8,6 +8,8 @@ pub enum StatusCode {
     UnknownCommand,
     ErrorInternal,
     NotACWPort,
+    /// The connection with the tile is lost, it is being reopened in the background
+    Disconnected,
     Ok,
     Next,
     Reset,
@@ -22,6 +24,7 @@ impl StatusCode {
             3 => Some(StatusCode::UnknownCommand),
             50 => Some(StatusCode::ErrorInternal),
             51 => Some(StatusCode::NotACWPort),
+            52 => Some(StatusCode::Disconnected),
             100 => Some(StatusCode::Ok),
             101 => Some(StatusCode::Next),
             255 => Some(StatusCode::Reset),
@@ -37,6 +40,7 @@ impl StatusCode {
             StatusCode::UnknownCommand => 3,
             StatusCode::ErrorInternal => 50,
             StatusCode::NotACWPort => 51,
+            StatusCode::Disconnected => 52,
             StatusCode::Ok => 100,
             StatusCode::Next => 101,
             StatusCode::Reset => 255,
@@ -53,6 +57,7 @@ impl std::fmt::Display for StatusCode {
             StatusCode::UnknownCommand => write!(f, "StatusCode::UnknownCommand (3)"),
             StatusCode::ErrorInternal => write!(f, "StatusCode::ErrorInternal (50)"),
             StatusCode::NotACWPort => write!(f, "StatusCode::NotACWPort (51)"),
+            StatusCode::Disconnected => write!(f, "StatusCode::Disconnected (52)"),
             StatusCode::Ok => write!(f, "StatusCode::Ok (100)"),
             StatusCode::Next => write!(f, "StatusCode::Next (101)"),
             StatusCode::Reset => write!(f, "StatusCode::Reset (102)"),
@@ -1,12 +1,26 @@
 //! Tile struct and implementation. This struct implements the protocol to communicate with individual tiles.
-use std::{fs::read, time::Duration};
+use std::{
+    fs::read,
+    io::ErrorKind,
+    sync::{
+        atomic::{AtomicBool, Ordering},
+        Arc, Mutex,
+    },
+    thread,
+    time::{Duration, Instant},
+};
 
 use crate::{
+    discovery::{claim_port, find_tile, ports_in_use, release_port},
     status_code::StatusCode,
-    util::{extract_mutated_pixels, generate_index_conversion_vector, millis_since_epoch},
+    util::{
+        collect_mutated_pixels, count_mutated_pixels, gather_framebuffer,
+        generate_index_conversion_vector, reorder_framebuffer, sleep_until, uniform_color,
+    },
+    layout::legacy_gather_index,
 };
-use log::error;
-use serialport::SerialPort;
+use log::{debug, error, info, warn};
+use serialport::{ClearBuffer, SerialPort};
 
 #[derive(Debug)]
 pub enum InitError {
@@ -14,14 +28,96 @@ pub enum InitError {
     FailedToOpenConnection,
 }
 
+/// Below this amount of changed pixels `command_3_update_specific_led` is used instead of `command_2_update_all`.
+///
+/// Command 3 needs 5 bytes per pixel instead of 3, and an extra round trip for the `StatusCode::Next` response.
+/// Measured with `python3 benchmarks/run.py contourwall.sparse_sweep` on the tile simulator at 2.000.000 baud, command 3 is
+/// cheaper up to around 210 pixels. Not yet measured on the tiles themselves, where the USB latency makes the round trip
+/// more expensive and the break-even point lower.
+pub const DEFAULT_SPARSE_THRESHOLD: usize = 200;
+
+/// Amount of times a frame is resend within the same frame when the tile rejected it, see `Tile::with_retries`.
+pub const DEFAULT_RETRIES: u8 = 2;
+
+/// After sending `StatusCode::Reset` the tile empties its buffers, neither side sends anything for about 100ms.
+const RESET_QUIET_TIME: Duration = Duration::from_millis(100);
+/// When the tile did not answer in time, it finishes the command within the 10ms read timeout of the firmware.
+const TIMEOUT_QUIET_TIME: Duration = Duration::from_millis(20);
+/// Time between two attempts to reopen the connection with a disconnected tile.
+const RECONNECT_INTERVAL: Duration = Duration::from_secs(1);
+
+/// Counters of how the framebuffers were send to a tile, and the amount of bytes that were written to it.
+///
+/// The `_us` fields are the total time in microseconds the tile spent in every step of a frame, so it shows whether the wall
+/// is limited by the baud rate (`write_us`), by the firmware (`ack_us`) or by the frame time of the tile (`pacing_us`).
+#[repr(C)]
+#[derive(Debug, Default, Clone, Copy)]
+pub struct TileStatistics {
+    /// Framebuffers send with `command_2_update_all`
+    pub full_frames: u64,
+    /// Framebuffers send with `command_3_update_specific_led`
+    pub sparse_frames: u64,
+    /// Framebuffers send with `command_1_solid_color`
+    pub solid_frames: u64,
+    /// Framebuffers which were not send, because they were identical to what the tile already has
+    pub skipped_frames: u64,
+    pub bytes_sent: u64,
+    /// Frames which were resend after the tile rejected them
+    pub retries: u64,
+    /// Times the tile asked for a reset of the connection with `StatusCode::Reset`
+    pub resets: u64,
+    /// Times the connection with the tile was lost, and was reopened
+    pub disconnects: u64,
+    pub reconnects: u64,
+    /// Frames which were handed to the tile, but which it did not show
+    pub dropped_frames: u64,
+    /// Responses of the tile with `StatusCode::NonMatchingCRC`
+    pub crc_errors: u64,
+    /// Responses which did not arrive in time, and writes which did not finish in time
+    pub timeouts: u64,
+    /// Gathering the framebuffer of the tile in wire order
+    pub reorder_us: f64,
+    /// Writing commands to the port
+    pub write_us: f64,
+    /// Waiting for the responses of the tile
+    pub ack_us: f64,
+    /// Waiting until the tile is ready for the next command, and until the deadline of the frame in `command_0_show_at`
+    pub pacing_us: f64,
+}
+
 #[derive(Debug)]
 pub struct Tile {
     pub frame_time: u64,
-    last_serial_write_time: u64,
-    port: Box<dyn SerialPort>,
+    pub sparse_threshold: usize,
+    /// Amount of times a frame is resend when the tile rejected it, see `Tile::with_retries`
+    pub retries: u8,
+    pub statistics: TileStatistics,
+    /// Where the bytes that are send to the tile are in the framebuffer of the wall, see `Layout::gather_index`
+    pub gather_index: Vec<usize>,
+    last_show_time: Option<Instant>,
+    // How long the last framebuffer update took, used to estimate when the tile is able to show the next frame
+    update_duration: Duration,
+    // The status code of the last frame, see `Tile::status`
+    status: StatusCode,
+
+    // The port is None while the connection is lost, it is reopened in the background by `reconnect`
+    port: Option<Box<dyn SerialPort>>,
+    port_name: Option<String>,
+    baud_rate: u32,
+    // The identifier of the tile, 0 when it is not known. A tile without port name is found again by its identifier.
+    identifier: u8,
+    reconnect: Option<Reconnect>,
+    // After a reset or a timeout nothing is send to the tile until this moment, so the tile and the library get back in sync
+    quiet_until: Option<Instant>,
 
     index_converter_vector: [usize; 1200],
     previous_framebuffer: [u8; 1200],
+    // The previous framebuffer is only known after the tile accepted a command which set all pixels
+    previous_framebuffer_valid: bool,
+    mutated_framebuffer: Vec<u8>,
+    // The commands are written at once from these buffers, which are reused every frame
+    command_2_buffer: Vec<u8>,
+    command_3_buffer: Vec<u8>,
 }
 
 impl Tile {
@@ -45,7 +141,7 @@ impl Tile {
     /// let tile: Tile = Tile::init(port, baudrate).expect("Tile initialization is unsuccessful.");
     /// ```
     pub fn init(port: String, baudrate: u32) -> Result<Tile, InitError> {
-        let Ok(port) = serialport::new(&port, baudrate)
+        let Ok(serial_port) = serialport::new(&port, baudrate)
             .timeout(Duration::from_millis(25))
             .stop_bits(serialport::StopBits::One)
             .parity(serialport::Parity::None)
@@ -54,13 +150,10 @@ impl Tile {
             return Result::Err(InitError::FailedToOpenConnection);
         };
 
-        let mut tile = Tile {
-            port: port,
-            frame_time: 15,
-            last_serial_write_time: 0,
-            index_converter_vector: generate_index_conversion_vector(),
-            previous_framebuffer: [0u8; 1200],
-        };
+        // The port is released again when the tile is dropped or loses its connection
+        claim_port(&port);
+        let mut tile = Tile::disconnected(Some(port), 0, baudrate);
+        tile.port = Some(serial_port);
 
         let magic_numbers = tile.command_6_magic_numbers()[0..5]
             .into_iter()
@@ -76,12 +169,59 @@ impl Tile {
         // Ok(tile)
     }
 
+    /// Returns a tile of which the connection could not be opened, every command fails with `StatusCode::Disconnected` until
+    /// the connection is reopened in the background.
+    ///
+    /// The tile is reopened on `port_name`, or when that fails or is not known, found again by its `identifier` like
+    /// `discovery::discover_tiles` does. This lets the wall start with the tiles that are there, and pick up the others later.
+    ///
+    /// ## Parameters
+    /// - port_name: device name of the COM port, if known
+    /// - identifier: identifier of the tile, 0 if it is not known
+    /// - baudrate: an unsigned 32bit integer, default value of 2.000.000
+    pub fn disconnected(port_name: Option<String>, identifier: u8, baudrate: u32) -> Tile {
+        Tile {
+            port: None,
+            port_name,
+            baud_rate: baudrate,
+            identifier,
+            reconnect: None,
+            quiet_until: None,
+            frame_time: 15,
+            sparse_threshold: DEFAULT_SPARSE_THRESHOLD,
+            retries: DEFAULT_RETRIES,
+            statistics: TileStatistics::default(),
+            gather_index: legacy_gather_index(0, 1),
+            last_show_time: None,
+            update_duration: Duration::ZERO,
+            status: StatusCode::Ok,
+            index_converter_vector: generate_index_conversion_vector(),
+            previous_framebuffer: [0u8; 1200],
+            previous_framebuffer_valid: false,
+            mutated_framebuffer: Vec::with_capacity(255 * 5),
+            command_2_buffer: vec![0; 1202],
+            command_3_buffer: Vec::with_capacity(255 * 5 + 1),
+        }
+    }
+
+    /// Returns the status code of the last frame of the tile: `StatusCode::Ok` when the tile accepted and showed it, otherwise
+    /// the reason it did not. While the tile resynchronizes after a reset this is `StatusCode::Reset`, and while the connection
+    /// is lost `StatusCode::Disconnected`.
+    pub fn status(&self) -> StatusCode {
+        self.status
+    }
+
+    /// Returns whether the serial connection with the tile is open.
+    pub fn is_connected(&self) -> bool {
+        self.port.is_some()
+    }
+
     /// Executes `command_0_show` of the protocol.
     ///
     /// This command signals to the tile that the its current framebuffer needs to be displayed or shown.
     /// It expects a `100` or StatusCode::Ok, which is being returned by the tile _before_ it update its LED's.
     ///
-    /// The time in between calls needs to be atleast `ContourWallCore::frame_time` (this), which by default is 33ms.
+    /// The time in between calls needs to be atleast `Tile::frame_time`, which by default is 15ms.
     ///
     /// ## Return
     /// - StatusCode
@@ -93,21 +233,48 @@ impl Tile {
     /// let status_code = cw.command_0_show();
     /// ```
     pub fn command_0_show(&mut self) -> StatusCode {
-        // Sleeping if the time between "show" commands to too little. The frametimes cannot be shorter than ContourWallCore::frame_time.
-        // This calculates the left over time for the thread to sleep, if any at all.
-        let timespan = millis_since_epoch() - self.last_serial_write_time;
-        if timespan < self.frame_time.into() {
-            std::thread::sleep(Duration::from_millis((self.frame_time as u64) - timespan));
+        self.command_0_show_at(Instant::now())
+    }
+
+    /// Executes `command_0_show` of the protocol at the `deadline`, or as soon as the tile is ready when that is later.
+    ///
+    /// This is used to let all tiles show their framebuffer at the same moment.
+    pub fn command_0_show_at(&mut self, deadline: Instant) -> StatusCode {
+        // A tile which cannot receive anything does not hold up the others until the deadline
+        if let Err(status_code) = self.poll_link() {
+            return self.record_status(status_code);
         }
+        self.pace_until(deadline.max(self.ready_time()));
 
-        if self.write_over_serial(&[0]).is_err() {
-            StatusCode::ErrorInternal
-        } else {
-            self.last_serial_write_time = millis_since_epoch();
-            StatusCode::Ok
+        let status_code = match self.write_over_serial(&[0]) {
+            Ok(_) => {
+                self.last_show_time = Some(Instant::now());
+                StatusCode::Ok
+            }
+            Err(status_code) => status_code,
+        };
+        self.record_status(status_code)
+    }
+
+    /// Returns the moment at which the tile accepts a new command, which is `frame_time` after the previous "show" command.
+    pub fn ready_time(&self) -> Instant {
+        match self.last_show_time {
+            Some(last_show_time) => last_show_time + Duration::from_millis(self.frame_time),
+            None => Instant::now(),
         }
     }
 
+    /// Returns the moment at which the tile is expected to be able to show a new frame, which is when it is ready plus the
+    /// time the last framebuffer update took.
+    pub fn show_ready_time(&self) -> Instant {
+        self.ready_time() + self.update_duration
+    }
+
+    /// Returns the moment the last "show" command was written to the tile.
+    pub fn last_show_time(&self) -> Option<Instant> {
+        self.last_show_time
+    }
+
     /// Executes `command_1_solid_color` of the protocol, which sets *all* pixels on a tile to one specific color.
     ///
     /// Although possible, the function is not meant for developers to call this function "bare"
@@ -149,28 +316,34 @@ impl Tile {
     /// ```
     pub fn command_1_solid_color(&mut self, red: u8, green: u8, blue: u8) -> StatusCode {
         let crc = red.wrapping_add(green).wrapping_add(blue);
-        if self.write_over_serial(&[1, red, green, blue, crc]).is_err() {
-            return StatusCode::ErrorInternal;
-        }
-
-        for i in (0..self.previous_framebuffer.len()).step_by(3) {
-            self.previous_framebuffer[i] = red;
-            self.previous_framebuffer[i + 1] = green;
-            self.previous_framebuffer[i + 2] = blue;
+        if let Err(status_code) = self.write_over_serial(&[1, red, green, blue, crc]) {
+            self.previous_framebuffer_valid = false;
+            return status_code;
         }
 
         // Read response of tile
-        let read_buf = &mut [0; 1];
-        if self.read_from_serial(read_buf).is_err() || StatusCode::new(read_buf[0]).is_none() {
-            StatusCode::ErrorInternal
-        } else {
-            StatusCode::new(read_buf[0]).unwrap()
+        let status_code = self.read_status_code();
+
+        for pixel in self.previous_framebuffer.chunks_exact_mut(3) {
+            pixel.copy_from_slice(&[red, green, blue]);
         }
+        self.previous_framebuffer_valid = status_code == StatusCode::Ok;
+        status_code
     }
 
     /// Executes `command_2_update_all` of the protocol, sets LED's to individually assigned colors based on index of the RGB values
     ///
-    /// The order of the RGB values is expected to be identical to how they are wired on a tile.
+    /// The framebuffer is reordered to how the LEDs are wired on a tile before it is send.
+    ///
+    /// ## Optimization
+    ///
+    /// If `optimize` is true, the cheapest way to get the framebuffer onto the tile is used, based on what the tile already has:
+    /// - nothing is send if the framebuffer is identical to the previous framebuffer
+    /// - `command_1_solid_color` if all pixels have the same color
+    /// - `command_3_update_specific_led` if less than `sparse_threshold` pixels have changed
+    /// - `command_2_update_all` otherwise
+    ///
+    /// Which of these was used, is counted in the `statistics` of the tile.
     ///
     /// ## Warning
     ///
@@ -178,7 +351,8 @@ impl Tile {
     ///
     /// ## Parameters
     /// - this: mutable pointer to the ContourWallCore struct
-    /// - frame_buffer: the framebuffer array
+    /// - frame_buffer_unordered: the framebuffer array, row by row
+    /// - optimize: allow other commands to be used when they are cheaper
     ///
     /// ## Return
     /// - StatusCode
@@ -192,65 +366,266 @@ impl Tile {
     /// let mut framebuffer = &mut[0; 1200];
     /// framebuffer[0] = 255;
     ///
-    /// let status_code = tile.command_2_update_all(framebuffer);
+    /// let status_code = tile.command_2_update_all(framebuffer, false);
     /// ```
     pub fn command_2_update_all(
         &mut self,
         frame_buffer_unordered: &[u8],
         optimize: bool,
     ) -> StatusCode {
-        let timespan = millis_since_epoch() - self.last_serial_write_time;
-        if timespan < self.frame_time.into() {
-            std::thread::sleep(Duration::from_millis((self.frame_time as u64) - timespan));
+        self.command_2_update_with(optimize, |frame_buffer, index_converter_vector| {
+            reorder_framebuffer(frame_buffer_unordered, index_converter_vector, frame_buffer)
+        })
+    }
+
+    /// Executes `command_2_update_all` with the framebuffer of the tile that is gathered from the framebuffer of the whole wall.
+    ///
+    /// The framebuffer of the tile is gathered with the `gather_index` of the tile, which is precomputed from the layout of the
+    /// wall, straight into the buffer that is send. See `command_2_update_all` for the optimization.
+    ///
+    /// ## Parameters
+    /// - framebuffer: the framebuffer of the whole wall, row by row
+    /// - optimize: allow other commands to be used when they are cheaper
+    ///
+    /// ## Return
+    /// - StatusCode
+    pub fn command_2_update_gathered(&mut self, framebuffer: &[u8], optimize: bool) -> StatusCode {
+        let gather_index = std::mem::take(&mut self.gather_index);
+        let status_code = self.command_2_update_with(optimize, |frame_buffer, _| {
+            gather_framebuffer(framebuffer, &gather_index, frame_buffer)
+        });
+        self.gather_index = gather_index;
+        status_code
+    }
+
+    /// Executes `command_2_update_all` with a framebuffer which is already in the order the LEDs are wired.
+    ///
+    /// The framebuffer is send as is, without being reordered. See `util::wire_order_index` for the order of the bytes.
+    ///
+    /// ## Parameters
+    /// - frame_buffer: the 1200 bytes of the framebuffer in wire order
+    /// - optimize: allow other commands to be used when they are cheaper
+    ///
+    /// ## Return
+    /// - StatusCode
+    pub fn command_2_update_wire(&mut self, frame_buffer_wire: &[u8], optimize: bool) -> StatusCode {
+        self.command_2_update_with(optimize, |frame_buffer, _| {
+            frame_buffer.copy_from_slice(&frame_buffer_wire[0..1200]);
+            (frame_buffer.iter().map(|&byte| byte as usize).sum::<usize>() % 256) as u8
+        })
+    }
+
+    /// Executes `command_2_update_all` with the framebuffer which `fill` writes in wire order, `fill` returns its CRC.
+    fn command_2_update_with<F>(&mut self, optimize: bool, fill: F) -> StatusCode
+    where
+        F: FnOnce(&mut [u8], &[usize; 1200]) -> u8,
+    {
+        if let Err(status_code) = self.poll_link() {
+            return self.record_status(status_code);
         }
 
-        // Indicate to tile that command 2 is about to be executed
-        if self.write_over_serial(&[2]).is_err() {
-            return StatusCode::ErrorInternal;
+        // Sleeping if the time since the last "show" command is too little. The frametimes cannot be shorter than Tile::frame_time.
+        self.pace_until(self.ready_time());
+        let update_start = Instant::now();
+
+        // The command byte, the framebuffer and the CRC are written over serial at once
+        let mut command = std::mem::take(&mut self.command_2_buffer);
+        command[0] = 2;
+        command[1201] = fill(&mut command[1..1201], &self.index_converter_vector);
+        self.statistics.reorder_us += elapsed_us(update_start);
+        let status_code = self.with_retries(|tile| tile.send_framebuffer(&command, optimize));
+        self.command_2_buffer = command;
+
+        self.update_duration = update_start.elapsed();
+        status_code
+    }
+
+    /// Executes `command`, and executes it again when the tile rejected it, at most `retries` times.
+    ///
+    /// Before every retry the tile and the library are brought back in sync, see `resync`. A command is only retried when the
+    /// tile can take it right away, so a tile which needs to be quiet after a reset, or which is disconnected, cannot stall
+    /// the frame of the other tiles. The resulting status code becomes the `status` of the tile.
+    pub fn with_retries<F>(&mut self, mut command: F) -> StatusCode
+    where
+        F: FnMut(&mut Tile) -> StatusCode,
+    {
+        let mut status_code = command(self);
+        for _ in 0..self.retries {
+            if status_code == StatusCode::Ok || !self.resync(status_code) {
+                break;
+            }
+            self.statistics.retries += 1;
+            status_code = command(self);
         }
 
-        // Generate framebuffer from pointer and generating the CRC by taking the sum of all the RGB values of the framebuffer
+        // Commands which failed part way leave the tile and the library out of sync
+        if status_code != StatusCode::Ok {
+            self.resync(status_code);
+        }
+        self.record_status(status_code)
+    }
 
-        // CRC overflowsum mechanism is replicated by using modular, the CRC sum is now type usize allows is being sum to the max of usize.
-        // Note: CRC is not able to implemented as normal in c/c++ or other language, since Rust has memory safety feature,
-        // which does not allow overflow to happend. Hence, modular is implemented to get the same result.
-        let mut frame_buffer = [0; 1201];
-        let mut crc: usize = 0;
-        for (i, byte) in frame_buffer_unordered.into_iter().enumerate() {
-            crc += *byte as usize;
-            frame_buffer[self.index_converter_vector[i]] = *byte;
+    /// Brings the tile and the library back in sync after the tile did not accept a command, following the RESET semantics
+    /// of the firmware. Returns whether the command can be retried right away.
+    fn resync(&mut self, status_code: StatusCode) -> bool {
+        match status_code {
+            // The tile answered, so it is waiting for the next command
+            StatusCode::NonMatchingCRC | StatusCode::TooSlow | StatusCode::Error | StatusCode::UnknownCommand => {
+                self.clear_buffers();
+                true
+            }
+            // The tile empties its buffers and stops sending for a while, the library waits for that instead of retrying
+            StatusCode::Reset if self.quiet_until.is_none() => {
+                self.statistics.resets += 1;
+                self.quiet_until = Some(Instant::now() + RESET_QUIET_TIME);
+                false
+            }
+            // The tile did not answer in time or sent garbage, the answer it is still working on is waited out
+            StatusCode::ErrorInternal if self.quiet_until.is_none() => {
+                self.quiet_until = Some(Instant::now() + TIMEOUT_QUIET_TIME);
+                false
+            }
+            _ => false,
+        }
+    }
+
+    /// Stores the status code of the frame, and warns when the tile stops accepting frames.
+    fn record_status(&mut self, status_code: StatusCode) -> StatusCode {
+        if status_code != StatusCode::Ok && self.status == StatusCode::Ok {
+            warn!("Tile '{}' did not accept the frame: {}", self.name(), status_code);
+        }
+        self.status = status_code;
+        status_code
+    }
+
+    /// Prepares the connection with the tile for the next command.
+    ///
+    /// Picks up the connection once it has been reopened in the background, and clears the buffers once the tile is done
+    /// being quiet. Returns the status code when nothing can be send to the tile yet.
+    fn poll_link(&mut self) -> Result<(), StatusCode> {
+        if self.port.is_none() {
+            let reconnect = self.reconnect.get_or_insert_with(|| {
+                Reconnect::start(self.port_name.clone(), self.identifier, self.baud_rate)
+            });
+            let Some(port) = reconnect.take_port() else {
+                return Err(StatusCode::Disconnected);
+            };
+
+            // The tile can have been found on another port
+            if let Some(port_name) = port.name() {
+                self.port_name = Some(port_name);
+            }
+            info!("Tile '{}' is reconnected", self.name());
+            self.port = Some(port);
+            self.reconnect = None;
+            self.last_show_time = None;
+            self.quiet_until = None;
+            self.previous_framebuffer_valid = false;
+            self.statistics.reconnects += 1;
         }
 
-        frame_buffer[1200] = (crc % 256) as u8;
+        if let Some(quiet_until) = self.quiet_until {
+            if Instant::now() < quiet_until {
+                return Err(StatusCode::Reset);
+            }
+            self.quiet_until = None;
+            self.clear_buffers();
+        }
+        Ok(())
+    }
 
-        // If the user opts in into protocol optimization, then a check will be done how different their current framebuffer is to the previous one.
-        // If the framebuffer is similar enough (defined below) then a different command will be used to transfer the pixel values.
-        // This optimization could allow for a bit faster frametimes.
-        // if optimize {
-        //     let comparison_framebuffer = frame_buffer[0..1200].try_into().unwrap();
-        //     let mutated_frame_buffer =
-        //         extract_mutated_pixels(&mut self.previous_framebuffer, &comparison_framebuffer);
-        //     self.previous_framebuffer = comparison_framebuffer;
-        //     // If there are less then 100 changed pixels then command_3_update_specific_led will be used.
-        //     // The 100 is an arbitrary limit. This could very well be changed in the future to decide what the optimal limit is.
-        //     if mutated_frame_buffer.len() / 5 < 100 {
-        //         let sent_mutated_frame_buffer: &[u8] = &mutated_frame_buffer;
-        //         return self.command_3_update_specific_led(sent_mutated_frame_buffer);
-        //     }
-        // }
+    /// Closes the connection after it was lost, E.G. when the USB cable was pulled. It is reopened in the background.
+    fn disconnect(&mut self, error: std::io::Error) {
+        error!("The connection with tile '{}' is lost: {}", self.name(), error);
+        self.release_claim();
+        self.port = None;
+        self.previous_framebuffer_valid = false;
+        self.statistics.disconnects += 1;
+    }
 
-        // Write framebuffer over serial to tile
-        if self.write_over_serial(&frame_buffer).is_err() {
-            return StatusCode::ErrorInternal;
+    fn release_claim(&self) {
+        if let (Some(_), Some(port_name)) = (&self.port, &self.port_name) {
+            release_port(port_name);
+        }
+    }
+
+    fn clear_buffers(&mut self) {
+        if let Some(port) = self.port.as_mut() {
+            let _ = port.clear(ClearBuffer::All);
+        }
+    }
+
+    /// Name of the tile in log messages
+    fn name(&self) -> String {
+        match &self.port_name {
+            Some(port_name) => port_name.clone(),
+            None => format!("identifier {}", self.identifier),
+        }
+    }
+
+    /// Sends `command`, which is command 2 with the framebuffer in wire order and the CRC, or a cheaper command if `optimize` allows it.
+    fn send_framebuffer(&mut self, command: &[u8], optimize: bool) -> StatusCode {
+        let frame_buffer = &command[1..1201];
+
+        // If the user opts in into protocol optimization, a cheaper command is used when the framebuffer allows for it
+        if optimize {
+            if let Some(status_code) = self.update_optimized(frame_buffer) {
+                return status_code;
+            }
+        }
+
+        // Write the command and framebuffer over serial to tile
+        if let Err(status_code) = self.write_over_serial(command) {
+            self.previous_framebuffer_valid = false;
+            return status_code;
         }
 
         // Read response of tile
-        let read_buf = &mut [0; 1];
-        if self.read_from_serial(read_buf).is_err() || StatusCode::new(read_buf[0]).is_none() {
-            StatusCode::ErrorInternal
+        let status_code = self.read_status_code();
+
+        self.statistics.full_frames += 1;
+        self.remember_framebuffer(status_code, frame_buffer)
+    }
+
+    /// Sends the framebuffer, which is in wire order, with a cheaper command than `command_2_update_all` if possible.
+    ///
+    /// Returns `None` if the full framebuffer has to be send.
+    fn update_optimized(&mut self, frame_buffer: &[u8]) -> Option<StatusCode> {
+        let mutated_pixels = if self.previous_framebuffer_valid {
+            count_mutated_pixels(&self.previous_framebuffer, frame_buffer)
         } else {
-            StatusCode::new(read_buf[0]).unwrap()
+            usize::MAX
+        };
+
+        if mutated_pixels == 0 {
+            self.statistics.skipped_frames += 1;
+            return Some(StatusCode::Ok);
+        }
+
+        if let Some([red, green, blue]) = uniform_color(frame_buffer) {
+            self.statistics.solid_frames += 1;
+            return Some(self.command_1_solid_color(red, green, blue));
         }
+
+        if mutated_pixels >= self.sparse_threshold.min(256) {
+            return None;
+        }
+
+        // The buffer is taken out of the tile for the duration of the command, so it is reused every frame
+        let mut mutated_framebuffer = std::mem::take(&mut self.mutated_framebuffer);
+        collect_mutated_pixels(&self.previous_framebuffer, frame_buffer, &mut mutated_framebuffer);
+        let status_code = self.command_3_update_specific_led(&mutated_framebuffer);
+        self.mutated_framebuffer = mutated_framebuffer;
+
+        self.statistics.sparse_frames += 1;
+        Some(self.remember_framebuffer(status_code, frame_buffer))
+    }
+
+    /// Stores the framebuffer the tile has after a command which updated its LEDs, which is only known if the tile accepted it.
+    fn remember_framebuffer(&mut self, status_code: StatusCode, frame_buffer: &[u8]) -> StatusCode {
+        self.previous_framebuffer.copy_from_slice(frame_buffer);
+        self.previous_framebuffer_valid = status_code == StatusCode::Ok;
+        status_code
     }
 
     /// Executes `command_3_update_specific_led` of the protocol, sets some LED's to individually assigned colors based given index with RGB code.
@@ -281,34 +656,25 @@ impl Tile {
     /// ```
 
     pub fn command_3_update_specific_led(&mut self, frame_buffer: &[u8]) -> StatusCode {
-        let timespan = millis_since_epoch() - self.last_serial_write_time;
-        if timespan < self.frame_time.into() {
-            std::thread::sleep(Duration::from_millis((self.frame_time as u64) - timespan));
-        }
+        // Sleeping if the time since the last "show" command is too little. The frametimes cannot be shorter than Tile::frame_time.
+        self.pace_until(self.ready_time());
 
-        // Indicate to tile that command 3 is about to be executed
-        if self.write_over_serial(&[3]).is_err() {
-            return StatusCode::ErrorInternal;
-        }
+        // The framebuffer of the tile is changed outside of `command_2_update_all`, so it is no longer known
+        self.previous_framebuffer_valid = false;
 
         assert!(
             frame_buffer.len() <= (255 * 5),
             "When using command_3_update_specific_led you cannot transfer more then 255 LED"
         );
 
-        //send the number of leds
+        // Indicate to tile that command 3 is about to be executed, together with the number of leds
         let led_count = (frame_buffer.len() / 5) as u8;
-        if self.write_over_serial(&[led_count, led_count]).is_err() {
-            return StatusCode::ErrorInternal;
+        if let Err(status_code) = self.write_over_serial(&[3, led_count, led_count]) {
+            return status_code;
         }
 
         //Reading the next response from eps32
-        let read_buf = &mut [0; 1];
-        if self.read_from_serial(read_buf).is_err() || StatusCode::new(read_buf[0]).is_none() {
-            return StatusCode::ErrorInternal;
-        }
-
-        let status_code = StatusCode::new(read_buf[0]).unwrap();
+        let status_code = self.read_status_code();
 
         if status_code != StatusCode::Next {
             return status_code;
@@ -319,20 +685,19 @@ impl Tile {
         for byte in frame_buffer {
             crc += *byte as usize;
         }
-        let binding = [frame_buffer, &[(crc % 256) as u8]].concat();
-        let frame_buffer = binding.as_slice();
 
-        // Write framebuffer over serial to tile
-        if self.write_over_serial(frame_buffer).is_err() {
-            return StatusCode::ErrorInternal;
+        // Write framebuffer and CRC over serial to tile at once, from a buffer which is reused every frame
+        let mut command = std::mem::take(&mut self.command_3_buffer);
+        command.clear();
+        command.extend_from_slice(frame_buffer);
+        command.push((crc % 256) as u8);
+        let written = self.write_over_serial(&command);
+        self.command_3_buffer = command;
+        if let Err(status_code) = written {
+            return status_code;
         }
 
-        let read_buf = &mut [0; 1];
-        if self.read_from_serial(read_buf).is_err() || StatusCode::new(read_buf[0]).is_none() {
-            StatusCode::ErrorInternal
-        } else {
-            StatusCode::new(read_buf[0]).unwrap()
-        }
+        self.read_status_code()
     }
 
     /// Executes `command_4_get_tile_identifier` of the protocol. Returns the tile identifier which is set in the EEPROM of the ESP32
@@ -346,21 +711,23 @@ impl Tile {
     /// let (status_code, identifier) = tile.command_4_get_tile_identifier();
     /// ```
     pub fn command_4_get_tile_identifier(&mut self) -> (StatusCode, u8) {
-        if self.write_over_serial(&[4]).is_err() {
-            return (StatusCode::ErrorInternal, 0);
+        if let Err(status_code) = self.write_over_serial(&[4]) {
+            return (status_code, 0);
         }
 
         let read_buf = &mut [0; 3];
-        if self.read_from_serial(read_buf).is_err() {
-            return (StatusCode::ErrorInternal, 0);
+        if let Err(status_code) = self.read_from_serial(read_buf) {
+            return (status_code, 0);
         }
-        println!("{:?}", read_buf);
         if StatusCode::new(read_buf[2]).is_none() {
             (StatusCode::ErrorInternal, 0)
         } else {
             if read_buf[0] != read_buf[1] {
+                self.statistics.crc_errors += 1;
                 (StatusCode::NonMatchingCRC, 0)
             } else {
+                // The identifier is remembered, so the tile can be found again when its connection is lost
+                self.identifier = read_buf[0];
                 (StatusCode::new(read_buf[2]).unwrap(), read_buf[0])
             }
         }
@@ -381,19 +748,11 @@ impl Tile {
             return StatusCode::Error;
         }
 
-        if self
-            .write_over_serial(&[5, identifier, identifier])
-            .is_err()
-        {
-            return StatusCode::ErrorInternal;
+        if let Err(status_code) = self.write_over_serial(&[5, identifier, identifier]) {
+            return status_code;
         }
 
-        let read_buf = &mut [0; 1];
-        if self.read_from_serial(read_buf).is_err() || StatusCode::new(read_buf[0]).is_none() {
-            StatusCode::ErrorInternal
-        } else {
-            StatusCode::new(read_buf[0]).unwrap()
-        }
+        self.read_status_code()
     }
 
     /// Executes `command_6_magic_numbers` of the protocol. Returns the 5 magic_numbers of the tile
@@ -429,34 +788,196 @@ impl Tile {
         }
     }
 
-    fn read_from_serial(&mut self, buffer: &mut [u8]) -> Result<(), ()> {
-        let port = self.port.as_mut();
+    /// Reads the response of the tile to a command, which is a single status code.
+    fn read_status_code(&mut self) -> StatusCode {
+        let read_buf = &mut [0; 1];
+        if let Err(status_code) = self.read_from_serial(read_buf) {
+            return status_code;
+        }
+
+        let status_code = StatusCode::new(read_buf[0]).unwrap_or(StatusCode::ErrorInternal);
+        if status_code == StatusCode::NonMatchingCRC {
+            self.statistics.crc_errors += 1;
+        }
+        status_code
+    }
 
+    /// Sleeps until `deadline`, the time is counted as pacing.
+    fn pace_until(&mut self, deadline: Instant) {
+        let start = Instant::now();
+        sleep_until(deadline);
+        self.statistics.pacing_us += elapsed_us(start);
+    }
+
+    /// Fills `buffer` from serial, fails with `StatusCode::ErrorInternal` when the tile did not answer in time and with
+    /// `StatusCode::Disconnected` when the connection is lost.
+    fn read_from_serial(&mut self, buffer: &mut [u8]) -> Result<(), StatusCode> {
+        let Some(port) = self.port.as_mut() else {
+            return Err(StatusCode::Disconnected);
+        };
+
+        let start = Instant::now();
         let size = match port.read(buffer) {
             Ok(size) => size,
+            Err(e) if e.kind() == ErrorKind::TimedOut => 0,
             Err(e) => {
-                error!("Error occurred during reading of Serial buffer: {}", e);
-                let _ = port.clear(serialport::ClearBuffer::All);
-                return Err(());
+                self.disconnect(e);
+                return Err(StatusCode::Disconnected);
             }
         };
+        self.statistics.ack_us += elapsed_us(start);
 
         if size == buffer.len() {
             Ok(())
         } else {
+            self.statistics.timeouts += 1;
             error!(
                 "Only {}/{} bytes were received within the {}ms allocated time",
-                port.bytes_to_read().unwrap_or(666),
+                size,
                 buffer.len(),
                 port.timeout().as_millis()
             );
-            let _ = port.clear(serialport::ClearBuffer::All);
-            Err(())
+            let _ = port.clear(ClearBuffer::All);
+            Err(StatusCode::ErrorInternal)
+        }
+    }
+
+    /// Writes `bytes` over serial, fails with `StatusCode::Disconnected` when the connection is lost.
+    fn write_over_serial(&mut self, bytes: &[u8]) -> Result<usize, StatusCode> {
+        let Some(port) = self.port.as_mut() else {
+            return Err(StatusCode::Disconnected);
+        };
+
+        let start = Instant::now();
+        let result = port.write(bytes);
+        self.statistics.write_us += elapsed_us(start);
+
+        match result {
+            Ok(size) => {
+                self.statistics.bytes_sent += size as u64;
+                Ok(size)
+            }
+            Err(e) if e.kind() == ErrorKind::TimedOut => {
+                self.statistics.timeouts += 1;
+                Err(StatusCode::ErrorInternal)
+            }
+            Err(e) => {
+                self.disconnect(e);
+                Err(StatusCode::Disconnected)
+            }
+        }
+    }
+}
+
+/// Microseconds since `start`, for the timings in `TileStatistics`.
+fn elapsed_us(start: Instant) -> f64 {
+    start.elapsed().as_secs_f64() * 1_000_000.0
+}
+
+/// Reopens the connection with a disconnected tile on a background thread, so the other tiles keep running in the meantime.
+///
+/// The thread tries the port name of the tile first, and otherwise looks for the tile by its identifier. It stops once the
+/// connection is reopened, or when the tile is dropped. When the identifier is known, the tile on the port name has to answer
+/// with it, as the operating system can have given the port name to another tile after the connection was lost.
+#[derive(Debug)]
+struct Reconnect {
+    port: Arc<Mutex<Option<Box<dyn SerialPort>>>>,
+    stop: Arc<AtomicBool>,
+}
+
+impl Reconnect {
+    fn start(port_name: Option<String>, identifier: u8, baud_rate: u32) -> Reconnect {
+        let port = Arc::new(Mutex::new(None));
+        let stop = Arc::new(AtomicBool::new(false));
+
+        let (reopened_port, stopped) = (Arc::clone(&port), Arc::clone(&stop));
+        thread::spawn(move || {
+            while !stopped.load(Ordering::Relaxed) {
+                let tile = port_name
+                    .as_ref()
+                    .and_then(|port_name| Reconnect::reopen(port_name, identifier, baud_rate))
+                    .or_else(|| (identifier != 0).then(|| find_tile(identifier, baud_rate, &ports_in_use())).flatten());
+
+                if let Some(mut tile) = tile {
+                    if let Ok(mut reopened_port) = reopened_port.lock() {
+                        *reopened_port = tile.port.take();
+                    }
+                    return;
+                }
+                thread::sleep(RECONNECT_INTERVAL);
+            }
+        });
+
+        Reconnect { port, stop }
+    }
+
+    /// Opens the tile on `port_name`, None is returned when it is not a tile or not the tile with `identifier`.
+    fn reopen(port_name: &str, identifier: u8, baud_rate: u32) -> Option<Tile> {
+        let mut tile = Tile::init(port_name.to_string(), baud_rate).ok()?;
+        if identifier != 0 {
+            let (status_code, found) = tile.command_4_get_tile_identifier();
+            if status_code != StatusCode::Ok || found != identifier {
+                debug!("'{}' is not the tile with identifier {}: {:?} {}", port_name, identifier, status_code, found);
+                return None;
+            }
+        }
+        Some(tile)
+    }
+
+    fn take_port(&self) -> Option<Box<dyn SerialPort>> {
+        self.port.lock().ok()?.take()
+    }
+}
+
+impl Drop for Tile {
+    fn drop(&mut self) {
+        self.release_claim();
+    }
+}
+
+impl Drop for Reconnect {
+    fn drop(&mut self) {
+        self.stop.store(true, Ordering::Relaxed);
+        // A port which was reopened but never picked up is closed here
+        if let Some(port_name) = self.take_port().and_then(|port| port.name()) {
+            release_port(&port_name);
         }
     }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_disconnected_tile_does_not_stall() {
+        let mut tile = Tile::disconnected(None, 0, 2_000_000);
+        let start = Instant::now();
+
+        assert_eq!(tile.command_0_show_at(start + Duration::from_millis(500)), StatusCode::Disconnected);
+        assert_eq!(tile.command_2_update_all(&[0u8; 1200], true), StatusCode::Disconnected);
+        assert_eq!(tile.with_retries(|tile| tile.command_1_solid_color(255, 0, 0)), StatusCode::Disconnected);
+        assert!(start.elapsed() < Duration::from_millis(100));
+        assert_eq!(tile.status(), StatusCode::Disconnected);
+        assert!(!tile.is_connected());
+        assert_eq!(tile.statistics.retries, 0);
+    }
+
+    #[test]
+    fn test_reset_makes_the_tile_quiet() {
+        let mut tile = Tile::disconnected(None, 0, 2_000_000);
+
+        assert!(!tile.resync(StatusCode::Reset));
+        assert!(!tile.resync(StatusCode::Reset));
+        assert_eq!(tile.statistics.resets, 1);
+        assert!(tile.quiet_until.is_some());
+    }
+
+    #[test]
+    fn test_pacing_is_counted() {
+        let mut tile = Tile::disconnected(None, 0, 2_000_000);
+        tile.pace_until(Instant::now() + Duration::from_millis(5));
 
-    fn write_over_serial(&mut self, bytes: &[u8]) -> Result<usize, std::io::Error> {
-        let port = self.port.as_mut();
-        port.write(bytes)
+        assert!(tile.statistics.pacing_us >= 5_000.0);
     }
 }
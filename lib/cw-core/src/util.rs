@@ -2,7 +2,7 @@
 
 use std::{
     ffi::{c_char, CStr},
-    time::SystemTime,
+    time::{Duration, Instant, SystemTime},
 };
 
 pub fn millis_since_epoch() -> u64 {
@@ -11,6 +11,22 @@ pub fn millis_since_epoch() -> u64 {
     duration_since_epoch.as_nanos() as u64 / 1_000_000
 }
 
+/// Sleeps until the deadline on the monotonic clock, returns immediately if the deadline has passed.
+///
+/// `std::thread::sleep` can oversleep by a fraction of a millisecond, so the last part before the deadline is spent yielding.
+/// This keeps the tiles, which all wait for the same deadline on their own thread, within microseconds of each other.
+pub fn sleep_until(deadline: Instant) {
+    const SPIN_TIME: Duration = Duration::from_micros(500);
+
+    let now = Instant::now();
+    if deadline > now + SPIN_TIME {
+        std::thread::sleep(deadline - now - SPIN_TIME);
+    }
+    while Instant::now() < deadline {
+        std::thread::yield_now();
+    }
+}
+
 pub fn str_ptr_to_string(ptr: *const c_char) -> String {
     let c_str = unsafe { CStr::from_ptr(ptr) };
     c_str.to_string_lossy().into_owned()
@@ -47,6 +63,110 @@ pub fn generate_index_conversion_vector() -> [usize; 1200] {
     result
 }
 
+/// Location of the framebuffer of a tile within the framebuffer of the whole wall.
+///
+/// The framebuffer of a tile consists of 20 rows of 60 bytes, the first row starts at `offset` and the rows are `stride` bytes apart.
+/// This allows reading the framebuffer of a tile straight from the framebuffer of the wall, without splitting it first.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct TileRegion {
+    pub offset: usize,
+    pub stride: usize,
+}
+
+impl TileRegion {
+    /// The region of the tile at `index`, of a wall with `tiles_len` tiles. The tiles are ordered like `split_framebuffer` does.
+    pub fn new(index: usize, tiles_len: usize) -> TileRegion {
+        if tiles_len == 1 {
+            TileRegion { offset: 0, stride: 60 }
+        } else {
+            TileRegion {
+                offset: (index % 2) * 20 * 180 + (index / 2) * 60,
+                stride: 180,
+            }
+        }
+    }
+
+    /// Returns the 20 rows of 60 bytes of the tile within the framebuffer.
+    pub fn rows<'a>(&self, framebuffer: &'a [u8]) -> impl Iterator<Item = &'a [u8]> {
+        let TileRegion { offset, stride } = *self;
+        (0..20).map(move |row| &framebuffer[offset + row * stride..offset + row * stride + 60])
+    }
+}
+
+/// Reorders the framebuffer of a tile into the order the LEDs are wired, using the index conversion vector.
+///
+/// Returns the CRC of the framebuffer, which is the sum of all bytes modulo 256.
+pub fn reorder_framebuffer(
+    frame_buffer_unordered: &[u8],
+    index_converter_vector: &[usize; 1200],
+    frame_buffer: &mut [u8],
+) -> u8 {
+    reorder_tile_framebuffer(
+        frame_buffer_unordered,
+        TileRegion { offset: 0, stride: 60 },
+        index_converter_vector,
+        frame_buffer,
+    )
+}
+
+/// Reorders the framebuffer of the tile in `region` of the framebuffer of the wall into the order the LEDs are wired.
+///
+/// Returns the CRC of the framebuffer, which is the sum of all bytes modulo 256.
+pub fn reorder_tile_framebuffer(
+    framebuffer: &[u8],
+    region: TileRegion,
+    index_converter_vector: &[usize; 1200],
+    frame_buffer: &mut [u8],
+) -> u8 {
+    // CRC overflowsum mechanism is replicated by using modular, the CRC sum is now type usize allows is being sum to the max of usize.
+    // Note: CRC is not able to implemented as normal in c/c++ or other language, since Rust has memory safety feature,
+    // which does not allow overflow to happend. Hence, modular is implemented to get the same result.
+    let mut crc: usize = 0;
+    for (row, bytes) in region.rows(framebuffer).enumerate() {
+        let indices = &index_converter_vector[row * 60..row * 60 + 60];
+        for (byte, &index) in bytes.iter().zip(indices) {
+            crc += *byte as usize;
+            frame_buffer[index] = *byte;
+        }
+    }
+
+    (crc % 256) as u8
+}
+
+/// Gathers the framebuffer of a tile in wire order from the framebuffer of the wall, `frame_buffer[i] = framebuffer[gather_index[i]]`.
+///
+/// Returns the CRC of the framebuffer, which is the sum of all bytes modulo 256.
+pub fn gather_framebuffer(framebuffer: &[u8], gather_index: &[usize], frame_buffer: &mut [u8]) -> u8 {
+    let mut crc: usize = 0;
+    for (byte, &index) in frame_buffer.iter_mut().zip(gather_index) {
+        *byte = framebuffer[index];
+        crc += *byte as usize;
+    }
+
+    (crc % 256) as u8
+}
+
+/// Returns the wiring of the whole wall as a gather index into the framebuffer of the wall.
+///
+/// Element `i` is the index of the byte in the framebuffer of the wall which is the `i`th byte on the wire, when the framebuffers
+/// of all tiles are send in wire order one after the other. So gathering the framebuffer of the wall with this index gives the
+/// same bytes as `reorder_tile_framebuffer` gives for every tile.
+pub fn wire_order_index(tiles_len: usize) -> Vec<usize> {
+    let index_converter_vector = generate_index_conversion_vector();
+    let mut index = vec![0; 1200 * tiles_len];
+
+    for (tile, tile_index) in index.chunks_exact_mut(1200).enumerate() {
+        let region = TileRegion::new(tile, tiles_len);
+        for row in 0..20 {
+            for byte in 0..60 {
+                tile_index[index_converter_vector[row * 60 + byte]] = region.offset + row * region.stride + byte;
+            }
+        }
+    }
+
+    index
+}
+
 pub fn split_framebuffer(framebuffer: &[u8]) -> Vec<Vec<u8>> {
     let mut framebuffers: Vec<Vec<u8>> = vec![Vec::with_capacity(1200); 6];
 
@@ -88,6 +208,48 @@ pub fn extract_mutated_pixels(
     return different_framebuffer_vector;
 }
 
+/// Returns the color of the framebuffer if every pixel has the same color, otherwise `None` is returned.
+pub fn uniform_color(frame_buffer: &[u8]) -> Option<[u8; 3]> {
+    let color = [frame_buffer[0], frame_buffer[1], frame_buffer[2]];
+    if frame_buffer.chunks_exact(3).all(|pixel| pixel == color) {
+        Some(color)
+    } else {
+        None
+    }
+}
+
+/// Counts the pixels which are different between the previous and the current framebuffer.
+pub fn count_mutated_pixels(previous_framebuffer: &[u8; 1200], framebuffer: &[u8]) -> usize {
+    previous_framebuffer
+        .chunks_exact(3)
+        .zip(framebuffer.chunks_exact(3))
+        .filter(|(previous_rgb, rgb)| previous_rgb != rgb)
+        .count()
+}
+
+/// Writes the index and updated rgb code of every pixel that has changed into `mutated_framebuffer`, in the format of
+/// `command_3_update_specific_led`.
+///
+/// Unlike `extract_mutated_pixels` the previous framebuffer is not updated, as the changes are only applied once the tile
+/// accepted them. The buffer is cleared first, so it can be reused for every frame.
+pub fn collect_mutated_pixels(
+    previous_framebuffer: &[u8; 1200],
+    framebuffer: &[u8],
+    mutated_framebuffer: &mut Vec<u8>,
+) {
+    mutated_framebuffer.clear();
+    for (i, (previous_rgb, rgb)) in previous_framebuffer
+        .chunks_exact(3)
+        .zip(framebuffer.chunks_exact(3))
+        .enumerate()
+    {
+        if previous_rgb != rgb {
+            mutated_framebuffer.extend(get_pixel_index(i * 3));
+            mutated_framebuffer.extend(rgb);
+        }
+    }
+}
+
 pub fn get_pixel_index(index: usize) -> [u8; 2] {
     assert_eq!(index % 3, 0, "index must be divisible by 3");
    
@@ -290,6 +452,33 @@ mod tests {
         );
     }
 
+    #[test]
+    fn test_uniform_color() {
+        let mut framebuffer = [0u8; 1200];
+        for pixel in framebuffer.chunks_exact_mut(3) {
+            pixel.copy_from_slice(&[10, 20, 30]);
+        }
+        assert_eq!(uniform_color(&framebuffer), Some([10, 20, 30]));
+
+        framebuffer[1199] = 31;
+        assert_eq!(uniform_color(&framebuffer), None);
+    }
+
+    #[test]
+    fn test_count_and_collect_mutated_pixels() {
+        let previous_framebuffer = [0u8; 1200];
+        let mut framebuffer = [0u8; 1200];
+        framebuffer[2] = 255;
+        framebuffer[1197] = 7;
+        framebuffer[1199] = 8;
+
+        assert_eq!(count_mutated_pixels(&previous_framebuffer, &framebuffer), 2);
+
+        let mut mutated_framebuffer = vec![1, 2, 3];
+        collect_mutated_pixels(&previous_framebuffer, &framebuffer, &mut mutated_framebuffer);
+        assert_eq!(mutated_framebuffer, vec![0, 0, 0, 0, 255, 0x1, 0x8F, 7, 0, 8]);
+    }
+
     #[test]
     fn test_str_ptr_to_string() {
         let win_com: *const c_char = CString::new("COM5")
@@ -342,6 +531,55 @@ mod tests {
         assert_eq!(framebuffers[5][0], 6, "Bottom right framebuffer");
     }
 
+    #[test]
+    fn test_reorder_framebuffer() {
+        let conversion_vector = generate_index_conversion_vector();
+        let unordered: Vec<u8> = (0..1200).map(|i| (i % 256) as u8).collect();
+        let mut ordered = [0u8; 1200];
+
+        let crc = reorder_framebuffer(&unordered, &conversion_vector, &mut ordered);
+
+        assert_eq!(ordered[3], unordered[60]);
+        assert_eq!(ordered[887], unordered[659]);
+        assert_eq!(crc as usize, unordered.iter().map(|&b| b as usize).sum::<usize>() % 256);
+    }
+
+    #[test]
+    fn test_reorder_tile_framebuffer_matches_split_framebuffer() {
+        let conversion_vector = generate_index_conversion_vector();
+        let framebuffer: Vec<u8> = (0..7200).map(|i| (i * 7 % 251) as u8).collect();
+        let framebuffers = split_framebuffer(&framebuffer);
+
+        for i in 0..6 {
+            let mut expected = [0u8; 1200];
+            let mut ordered = [0u8; 1200];
+            let expected_crc = reorder_framebuffer(&framebuffers[i], &conversion_vector, &mut expected);
+            let crc = reorder_tile_framebuffer(&framebuffer, TileRegion::new(i, 6), &conversion_vector, &mut ordered);
+
+            assert_eq!(ordered, expected, "Tile {}", i);
+            assert_eq!(crc, expected_crc, "Tile {}", i);
+        }
+    }
+
+    #[test]
+    fn test_wire_order_index_matches_reorder_tile_framebuffer() {
+        let conversion_vector = generate_index_conversion_vector();
+        let framebuffer: Vec<u8> = (0..7200).map(|i| (i * 13 % 253) as u8).collect();
+
+        for tiles_len in [1, 6] {
+            let wire: Vec<u8> = wire_order_index(tiles_len).iter().map(|&i| framebuffer[i]).collect();
+            assert_eq!(wire.len(), 1200 * tiles_len);
+
+            for (i, tile_wire) in wire.chunks_exact(1200).enumerate() {
+                let mut ordered = [0u8; 1200];
+                let crc = reorder_tile_framebuffer(&framebuffer, TileRegion::new(i, tiles_len), &conversion_vector, &mut ordered);
+
+                assert_eq!(tile_wire, ordered, "Tile {} of {}", i, tiles_len);
+                assert_eq!(crc as usize, tile_wire.iter().map(|&b| b as usize).sum::<usize>() % 256);
+            }
+        }
+    }
+
     #[test]
     fn test_index_conversion_vector() {
         let conversion_vector = generate_index_conversion_vector();
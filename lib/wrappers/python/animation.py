@@ -0,0 +1,321 @@
+"""
+Compact animation files, recorded from what `ContourWall.show` sends and played back at a fixed rate.
+
+The file starts with a header of 16 unsigned 64-bit integers and the region of every tile, followed by a record per frame and
+the offset of every record. A record only holds the tiles that changed since the previous frame, every tile in the encoding
+that is the smallest for it:
+
+- raw: the pixels of the tile.
+- run-length: runs of identical pixels, a solid tile is a single run.
+- sparse: the pixels that changed, applied on top of the previous frame of the tile.
+- reference: the offset of an earlier raw or run-length tile with the same pixels, so a show that repeats costs a few bytes
+  per tile for every repetition.
+
+Every `keyframe_interval` frames a record holds all tiles without sparse tiles, so playback can start at any keyframe. A
+recording is either in the order of the pixel array, where a tile is its region of the pixel array, or in the order the
+LEDs are wired (see `ContourWall.show_wire`), where a tile is its 1200 bytes of the wire frame.
+
+Inspecting a recording is done like this:
+```bash
+python3 animation.py show.cwanim
+```
+"""
+
+import argparse
+import hashlib
+import time
+from typing import Any, BinaryIO, Optional
+
+import numpy as np
+
+MAGIC = int.from_bytes(b"CWANIMAT", "little")
+VERSION = 1
+HEADER_SIZE = 16 * 8
+
+# Positions in the header
+_MAGIC, _VERSION, _ROWS, _COLS, _TILES, _WIRE_ORDER, _FPS_MILLI, _FRAMES, _KEYFRAME_INTERVAL, _INDEX_OFFSET = range(10)
+
+# Encodings of a tile in a record
+RAW, RUN_LENGTH, SPARSE, REFERENCE = range(4)
+
+# A run of identical pixels, or a changed pixel with its index in the tile
+RUN = np.dtype([("length", "<u2"), ("color", "u1", (3,))])
+CHANGE = np.dtype([("index", "<u2"), ("color", "u1", (3,))])
+
+# Amount of distinct tiles that are remembered for references
+REFERENCE_CACHE_SIZE = 65536
+
+class AnimationRecorder:
+    def __init__(self, path: str, regions: np.ndarray, shape: tuple[int, int], fps: float = 30, wire_order: bool = False, keyframe_interval: int = 300) -> None:
+        """
+        Create an animation file at `path`, an existing file is overwritten. Recording from a ContourWall is done with
+        `ContourWall.record`, which creates the recorder.
+
+        - regions: The region of the pixel array of every tile, as rows of [top, left, bottom, right], like `tile_regions`.
+        - shape: The rows and columns of the pixel array.
+        - fps: The frames per second at which the animation is played back.
+        - wire_order: Whether the frames are wire frames of 1200 bytes per tile, instead of pixel arrays.
+        - keyframe_interval: The amount of frames between the records which hold all tiles.
+
+        Example code:
+        ```
+            recorder = AnimationRecorder("show.cwanim", tile_regions(6, (40, 60, 3)), (40, 60))
+            recorder.append(pixels)
+            recorder.close()
+        ```
+        """
+
+        if keyframe_interval < 1:
+            raise Exception(f"The keyframe interval has to be at least 1, not '{keyframe_interval}'")
+
+        self.path = path
+        self.fps = fps
+        self.wire_order = wire_order
+        self.keyframe_interval = keyframe_interval
+        self.regions = _frame_regions(len(regions)) if wire_order else np.asarray(regions, dtype=np.int64)
+        self.shape = (len(regions), 400) if wire_order else (int(shape[0]), int(shape[1]))
+
+        self._header = np.zeros(16, dtype=np.uint64)
+        self._header[[_MAGIC, _VERSION, _ROWS, _COLS, _TILES, _WIRE_ORDER, _FPS_MILLI, _KEYFRAME_INTERVAL]] = [
+            MAGIC, VERSION, shape[0], shape[1], len(regions), wire_order, round(fps * 1000), keyframe_interval,
+        ]
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._file.write(self._header.tobytes())
+        self._file.write(np.asarray(regions, dtype="<u4").tobytes())
+        self._offset = HEADER_SIZE + len(regions) * 16
+
+        self._record_offsets: list[int] = []
+        self._previous = np.zeros((*self.shape, 3), dtype=np.uint8)
+        self._references: dict[bytes, int] = {}
+
+    @property
+    def frames(self) -> int:
+        return len(self._record_offsets)
+
+    def append(self, frame: Optional[np.ndarray]) -> None:
+        """
+        Append a frame, a pixel array or a wire frame depending on `wire_order`. None appends the previous frame again, which
+        costs a single byte per 8 tiles.
+        """
+
+        if self._file is None:
+            raise Exception("The animation recorder is closed")
+
+        is_keyframe = self.frames % self.keyframe_interval == 0
+        if frame is not None:
+            frame = frame.reshape(*self.shape, 3)
+        else:
+            frame = self._previous
+
+        present = np.zeros(len(self.regions), dtype=bool)
+        tiles = []
+        for tile, (top, left, bottom, right) in enumerate(self.regions):
+            pixels = frame[top:bottom, left:right].reshape(-1, 3)
+            changed = (pixels != self._previous[top:bottom, left:right].reshape(-1, 3)).any(axis=1)
+            if is_keyframe or changed.any():
+                present[tile] = True
+                tiles.append((pixels, None if is_keyframe else changed))
+        if frame is not self._previous:
+            np.copyto(self._previous, frame, casting="unsafe")
+
+        self._record_offsets.append(self._offset)
+        self._write(np.packbits(present).tobytes())
+        for pixels, changed in tiles:
+            self._write(self._encode(pixels, changed))
+
+    def close(self) -> None:
+        """Write the offsets of the records, after which the file can be played. A recording which is not closed cannot be played."""
+
+        if self._file is None:
+            return
+        index_offset = self._offset
+        self._write(np.array(self._record_offsets + [self._offset], dtype="<u8").tobytes())
+        self._header[_FRAMES] = self.frames
+        self._header[_INDEX_OFFSET] = index_offset
+        self._file.seek(0)
+        self._file.write(self._header.tobytes())
+        self._file.close()
+        self._file = None
+
+    def _write(self, data: bytes) -> None:
+        assert self._file is not None
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _encode(self, pixels: np.ndarray, changed: Optional[np.ndarray]) -> bytes:
+        """Encode a tile in the smallest encoding, a sparse encoding is only possible when the changed pixels are given."""
+
+        key = hashlib.blake2b(pixels.tobytes(), digest_size=16).digest()
+        if key in self._references:
+            return bytes([REFERENCE]) + self._references[key].to_bytes(8, "little")
+
+        packed = pixels.astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32)
+        starts = np.flatnonzero(np.concatenate(([True], packed[1:] != packed[:-1])))
+        raw_size, run_length_size = pixels.nbytes, len(starts) * RUN.itemsize + 2
+        sparse_size = int(changed.sum()) * CHANGE.itemsize + 2 if changed is not None else raw_size + 1
+
+        if sparse_size < min(raw_size, run_length_size):
+            assert changed is not None
+            changes = np.zeros(int(changed.sum()), dtype=CHANGE)
+            changes["index"] = np.flatnonzero(changed)
+            changes["color"] = pixels[changed]
+            return bytes([SPARSE]) + len(changes).to_bytes(2, "little") + changes.tobytes()
+
+        # Only tiles which decode on their own can be referenced, the tile is written at the current offset
+        if len(self._references) < REFERENCE_CACHE_SIZE:
+            self._references[key] = self._offset
+        if run_length_size < raw_size:
+            runs = np.zeros(len(starts), dtype=RUN)
+            runs["length"] = np.diff(np.append(starts, len(pixels)))
+            runs["color"] = pixels[starts]
+            return bytes([RUN_LENGTH]) + len(runs).to_bytes(2, "little") + runs.tobytes()
+        return bytes([RAW]) + pixels.tobytes()
+
+class AnimationPlayer:
+    def __init__(self, path: str) -> None:
+        """
+        Open an animation file, which is memory mapped so only the header and the offsets of the records are read when it is
+        opened. Frames are decoded one after the other into `frame`, only the tiles that changed are touched.
+
+        Example code:
+        ```
+            player = AnimationPlayer("show.cwanim")
+            player.play(cw, loop=True)
+        ```
+        """
+
+        header = np.memmap(path, dtype=np.uint64, mode="r", shape=(16,))
+        if int(header[_MAGIC]) != MAGIC or int(header[_VERSION]) != VERSION:
+            raise Exception(f"'{path}' is not an animation of the Contour Wall")
+        if int(header[_INDEX_OFFSET]) == 0:
+            raise Exception(f"The recording of '{path}' was not closed")
+
+        self.path = path
+        self.frames = int(header[_FRAMES])
+        self.fps = int(header[_FPS_MILLI]) / 1000
+        self.wire_order = bool(header[_WIRE_ORDER])
+        self.keyframe_interval = int(header[_KEYFRAME_INTERVAL])
+        tiles = int(header[_TILES])
+
+        self._file: np.memmap = np.memmap(path, dtype=np.uint8, mode="r")
+        self.regions = np.frombuffer(self._file, dtype="<u4", count=tiles * 4, offset=HEADER_SIZE).reshape(tiles, 4).astype(np.int64)
+        self._offsets = np.frombuffer(self._file, dtype="<u8", count=self.frames + 1, offset=int(header[_INDEX_OFFSET]))
+
+        # A wire frame is decoded as one row of 400 pixels per tile
+        self.shape = (tiles, 400) if self.wire_order else (int(header[_ROWS]), int(header[_COLS]))
+        if self.wire_order:
+            self.regions = _frame_regions(tiles)
+        self.frame = np.zeros((*self.shape, 3), dtype=np.uint8)
+        self.position = 0
+
+    def seek(self, position: int) -> None:
+        """Continue at frame `position`, which is decoded from the keyframe before it."""
+
+        if not 0 <= position <= self.frames:
+            raise Exception(f"The animation has {self.frames} frames, there is no frame {position}")
+        self.position = position - position % self.keyframe_interval
+        while self.position < position:
+            self.next_frame()
+
+    def next_frame(self) -> Optional[np.ndarray]:
+        """
+        Decode the next frame into `frame`, and return which tiles changed. None is returned at the end of the animation.
+        """
+
+        if self.position >= self.frames:
+            return None
+
+        offset = int(self._offsets[self.position])
+        tiles_len = len(self.regions)
+        mask_size = (tiles_len + 7) // 8
+        changed = np.unpackbits(self._file[offset:offset + mask_size], count=tiles_len).astype(bool)
+        offset += mask_size
+        for tile in np.flatnonzero(changed):
+            offset = self._decode(int(tile), offset)
+
+        self.position += 1
+        return changed
+
+    def play(self, cw: Any, loop: bool = False, fps: Optional[float] = None, frames: Optional[int] = None) -> int:
+        """
+        Show the animation on `cw` at the frames per second it was recorded at, or at `fps`, and return the amount of frames shown.
+
+        A recording in the order of the pixel array is shown on a `ContourWall` or `ContourWallEmulator`, through its tracked
+        canvas: only the tiles that changed are copied into the pixel array and marked dirty, so `show` only sends those tiles.
+        A recording in wire order is shown with `show_wire` of a `ContourWall`, without reordering the frames.
+        """
+
+        frame_period = 1 / (fps or self.fps)
+        canvas = None if self.wire_order else cw.tracked_canvas()
+        if canvas is not None:
+            canvas.mark_all_dirty()
+
+        shown = 0
+        deadline = time.monotonic()
+        while frames is None or shown < frames:
+            changed = self.next_frame()
+            if changed is None:
+                if not loop or self.frames == 0:
+                    break
+                self.seek(0)
+                continue
+
+            if canvas is not None:
+                for top, left, bottom, right in self.regions[changed]:
+                    cw.pixels[top:bottom, left:right] = self.frame[top:bottom, left:right]
+                    canvas.mark_dirty(top, left, bottom - top, right - left)
+
+            # A late frame restarts the schedule, instead of rushing the following frames
+            deadline = max(deadline, time.monotonic())
+            time.sleep(max(deadline - time.monotonic(), 0))
+            if canvas is None:
+                cw.show_wire(self.frame.reshape(-1))
+            else:
+                cw.show()
+            deadline += frame_period
+            shown += 1
+
+        return shown
+
+    def _decode(self, tile: int, offset: int) -> int:
+        """Decode the tile at `offset` into `frame`, and return the offset after it."""
+
+        top, left, bottom, right = self.regions[tile]
+        region = self.frame[top:bottom, left:right]
+        encoding = int(self._file[offset])
+
+        if encoding == REFERENCE:
+            self._decode(tile, int.from_bytes(self._file[offset + 1:offset + 9].tobytes(), "little"))
+            return offset + 9
+        if encoding == RAW:
+            size = region.size
+            region[:] = self._file[offset + 1:offset + 1 + size].reshape(region.shape)
+            return offset + 1 + size
+
+        count = int.from_bytes(self._file[offset + 1:offset + 3].tobytes(), "little")
+        if encoding == RUN_LENGTH:
+            runs = np.frombuffer(self._file, dtype=RUN, count=count, offset=offset + 3)
+            region[:] = np.repeat(runs["color"], runs["length"], axis=0).reshape(region.shape)
+        elif encoding == SPARSE:
+            changes = np.frombuffer(self._file, dtype=CHANGE, count=count, offset=offset + 3)
+            region[changes["index"] // region.shape[1], changes["index"] % region.shape[1]] = changes["color"]
+        else:
+            raise Exception(f"'{self.path}' has an unknown tile encoding {encoding} at offset {offset}")
+        return offset + 3 + count * 5
+
+def _frame_regions(tiles: int) -> np.ndarray:
+    """The regions of the tiles in a wire frame, which is decoded as one row of 400 pixels per tile."""
+
+    return np.array([[tile, 0, tile + 1, 400] for tile in range(tiles)], dtype=np.int64)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a summary of an animation of the Contour Wall")
+    parser.add_argument("path", help="animation to inspect")
+    args = parser.parse_args()
+
+    player = AnimationPlayer(args.path)
+    size = player._file.size
+    duration = player.frames / player.fps
+    order = "wire order" if player.wire_order else f"{player.shape[0]}x{player.shape[1]} pixels"
+    print(f"{player.path}: {player.frames} frames of {len(player.regions)} tiles in {order}, {duration:.1f}s at {player.fps:g} fps")
+    print(f"{size / 1024:.1f} KiB, {size / max(player.frames, 1):.1f} bytes per frame")
@@ -0,0 +1,62 @@
+"""
+Compare two runs of the benchmark suite and flag regressions.
+
+A case is a regression when its median or 99th percentile latency got slower than the threshold, by default 10%.
+The exit code is 1 when there is at least one regression, so it can be used in scripts.
+
+Running is done like this:
+```bash
+python3 benchmarks/compare.py before.json after.json --threshold 0.1
+```
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = ["p50_us", "p99_us"]
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    """Returns a row for every case that is in both runs, with the relative change of every metric."""
+
+    baseline_results = {result["name"]: result for result in baseline["results"] if "skipped" not in result}
+    rows = []
+    for result in current["results"]:
+        before = baseline_results.get(result["name"])
+        if before is None or "skipped" in result:
+            continue
+
+        changes = {metric: (result[metric] - before[metric]) / before[metric] for metric in METRICS if before[metric] > 0}
+        rows.append({
+            "name": result["name"],
+            "before": before,
+            "after": result,
+            "changes": changes,
+            "regression": any(change > threshold for change in changes.values()),
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs of the Contour Wall")
+    parser.add_argument("baseline", help="JSON results of the baseline run")
+    parser.add_argument("current", help="JSON results of the run to compare")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown that is flagged as regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'case':<55} {'p50 before':>11} {'p50 after':>11} {'change':>8} {'p99 change':>11}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        p50_change = row["changes"].get("p50_us", 0)
+        p99_change = row["changes"].get("p99_us", 0)
+        print(f"{row['name']:<55} {row['before']['p50_us']:>9.1f}us {row['after']['p50_us']:>9.1f}us {p50_change:>+7.1%} {p99_change:>+10.1%}{flag}")
+
+    regressions = [row["name"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
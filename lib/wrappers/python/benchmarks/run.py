@@ -0,0 +1,354 @@
+"""
+Throughput and latency benchmark suite for the full frame path.
+
+Every benchmark case is run for a number of iterations, the latency percentiles and frames per second are reported as JSON.
+The ContourWall cases run against simulated tiles (see tile_simulator.py), so no physical wall is needed. Cases for which
+a dependency is missing (E.G. the compiled core library or a display for the emulator) are reported as skipped.
+
+Running is done like this:
+```bash
+python3 benchmarks/run.py --output before.json
+# ... change something ...
+python3 benchmarks/run.py --output after.json
+python3 benchmarks/compare.py before.json after.json
+```
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import sys
+import time
+from ctypes import c_uint8
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+WRAPPER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+REPOSITORY_DIR = os.path.join(WRAPPER_DIR, "..", "..", "..")
+sys.path.insert(0, WRAPPER_DIR)
+sys.path.insert(0, os.path.join(REPOSITORY_DIR, "font"))
+
+from colour import apply_palette, hsv_to_rgb, hsv_to_rgb_array, hue_wheel
+from contourwall import ContourWall, _FrameStaging
+from contourwall_serial import TILE_FRAME_SIZE, Tile
+from tile_simulator import SimulatedWall
+
+# A case is a generator: everything before the first `yield` is the setup, the yielded function is measured and
+# everything after it is the teardown.
+Case = Callable[[], Iterator[Callable[[], None]]]
+CASES: dict[str, Case] = {}
+
+class Skip(Exception):
+    pass
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        return function
+    return register
+
+def sparse_frames(shape: tuple[int, ...]) -> np.ndarray:
+    """Frames of a small square moving over a black background, the kind of content for which `optimize` sends only changed pixels."""
+
+    frames = np.zeros((shape[1], *shape), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        frame[2:8, i:i + 6] = 255, 0, 0
+    return frames
+
+def contourwall_case(tiles: int, backend: str, command: str, transfer_delay: bool, scene: str = "random") -> Case:
+    def run() -> Iterator[Callable[[], None]]:
+        wall = SimulatedWall(tiles, baudrate=2_000_000 if transfer_delay else None)
+        try:
+            cw = ContourWall(backend=backend)
+        except OSError as e:
+            wall.stop()
+            raise Skip(f"core library could not be loaded: {e}")
+
+        if tiles == 1:
+            cw.single_new_with_port(wall.ports[0])
+        else:
+            cw.new_with_ports(*wall.ports)
+
+        if scene == "sparse":
+            frames = sparse_frames(cw.pixels.shape)
+        else:
+            frames = np.random.default_rng(0).integers(0, 256, (8, *cw.pixels.shape), dtype=np.uint8)
+        i = 0
+
+        def show() -> None:
+            nonlocal i
+            cw.pixels[:] = frames[i % len(frames)]
+            cw.show()
+            i += 1
+
+        canvas = cw.tracked_canvas() if scene == "canvas" else None
+
+        def show_canvas() -> None:
+            # A square moving within the top-left tile, drawn on the tracked canvas
+            nonlocal i
+            assert canvas is not None
+            canvas.rect(2, i % 14, 6, 6, (0, 0, 0))
+            canvas.rect(2, (i + 1) % 14, 6, 6, (255, 0, 0))
+            cw.show()
+            i += 1
+
+        # The same frames, prepared in wire order once
+        wire_index = cw.wire_order_index()
+        wire_frames = [frame.reshape(-1)[wire_index] for frame in frames]
+
+        def show_wire() -> None:
+            nonlocal i
+            cw.show_wire(wire_frames[i % len(wire_frames)])
+            i += 1
+
+        def fill_solid() -> None:
+            nonlocal i
+            cw.fill_solid(i % 256, 0, 0)
+            i += 1
+
+        if canvas is not None:
+            yield show_canvas
+        else:
+            yield {"show": show, "show_wire": show_wire, "fill_solid": fill_solid}[command]
+        cw.drop()
+        wall.stop()
+    return run
+
+for tiles in [1, 6]:
+    for backend in ["core", "python"]:
+        for command in ["show", "show_wire", "fill_solid"]:
+            CASES[f"contourwall.{command}.{tiles}tile.{backend}"] = contourwall_case(tiles, backend, command, True)
+            CASES[f"contourwall.{command}.{tiles}tile.{backend}.no_transfer_delay"] = contourwall_case(tiles, backend, command, False)
+        CASES[f"contourwall.show.{tiles}tile.{backend}.sparse"] = contourwall_case(tiles, backend, "show", True, "sparse")
+        CASES[f"contourwall.show.{tiles}tile.{backend}.canvas"] = contourwall_case(tiles, backend, "show", True, "canvas")
+
+def sparse_sweep_case(changed: int, command: str) -> Case:
+    """
+    Updates one tile with two framebuffers in turn which differ in `changed` pixels, with either command 2 or command 3.
+
+    Only the update is measured, without the show and the frame time, which are the same for both commands. The protocol of
+    contourwall_serial.py puts the same bytes on the wire as the core library, so the amount of changed pixels at which command 3
+    becomes slower than command 2 is the `DEFAULT_SPARSE_THRESHOLD` of both.
+    """
+
+    def run() -> Iterator[Callable[[], None]]:
+        wall = SimulatedWall(1, baudrate=2_000_000)
+        tile = Tile(wall.ports[0], 2_000_000)
+        tile.frame_time = 0
+        tile.sparse_threshold = 256 if command == "command3" else 0
+
+        frames = np.random.default_rng(0).integers(0, 256, (2, TILE_FRAME_SIZE), dtype=np.uint8)
+        frames[1, changed * 3:] = frames[0, changed * 3:]
+        frames[1, :changed * 3] = 255 - frames[0, :changed * 3]
+        # The first update sends all pixels, after that the tile has a framebuffer to compare with
+        tile.command_2_update_wire(frames[1])
+        i = 0
+
+        def update() -> None:
+            nonlocal i
+            tile.command_2_update_wire(frames[i % 2], optimize=True)
+            i += 1
+
+        yield update
+        tile.close()
+        wall.stop()
+    return run
+
+for changed in range(25, 256, 25):
+    for command in ["command2", "command3"]:
+        CASES[f"contourwall.sparse_sweep.{changed}px.{command}"] = sparse_sweep_case(changed, command)
+
+@case("handoff.legacy")
+def handoff_legacy() -> Iterator[Callable[[], None]]:
+    pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    def handoff() -> None:
+        pixels[:] = pixels[:] // (1 / 0.5)
+        ctypes.cast(ctypes.c_char_p(pixels.tobytes()), ctypes.POINTER(ctypes.c_uint8))
+    yield handoff
+
+@case("handoff.staging")
+def handoff_staging() -> Iterator[Callable[[], None]]:
+    pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    staging = _FrameStaging(pixels.shape)
+    def handoff() -> None:
+        staging.stage(pixels, 0.5).ctypes.data_as(ctypes.POINTER(c_uint8))
+    yield handoff
+
+@case("handoff.color_correction")
+def handoff_color_correction() -> Iterator[Callable[[], None]]:
+    pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    staging = _FrameStaging(pixels.shape)
+    tile_of_pixel = np.arange(6).reshape(3, 2).T.repeat(20, axis=0).repeat(20, axis=1)
+    staging.set_correction(np.full(6, 2.2), np.ones((6, 3)), tile_of_pixel[:, :, np.newaxis] * 3 + np.arange(3))
+    def handoff() -> None:
+        staging.stage(pixels, 0.5).ctypes.data_as(ctypes.POINTER(c_uint8))
+    yield handoff
+
+@case("emulator.show")
+def emulator_show() -> Iterator[Callable[[], None]]:
+    try:
+        from contourwall_emulator import ContourWallEmulator
+        cw = ContourWallEmulator()
+        cw.show()
+    except Exception as e:
+        raise Skip(f"emulator could not show a frame: {e}")
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (8, *cw.pixels.shape), dtype=np.uint8)
+    i = 0
+    def show() -> None:
+        nonlocal i
+        cw.pixels[:] = frames[i % len(frames)]
+        cw.show()
+        i += 1
+    yield show
+
+@case("emulator.show.headless")
+def emulator_show_headless() -> Iterator[Callable[[], None]]:
+    import tempfile
+    from contourwall_emulator import ContourWallEmulator
+
+    directory = tempfile.TemporaryDirectory()
+    cw = ContourWallEmulator(headless=True, frame_log=os.path.join(directory.name, "frames.cwlog"))
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (8, *cw.pixels.shape), dtype=np.uint8)
+    i = 0
+    def show() -> None:
+        nonlocal i
+        cw.pixels[:] = frames[i % len(frames)]
+        cw.show()
+        i += 1
+    yield show
+    cw.drop()
+    directory.cleanup()
+
+@case("font.put_text")
+def font_put_text() -> Iterator[Callable[[], None]]:
+    import font
+
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    yield lambda: font.put_text(frame, "12:34", [1, 0])
+
+@case("font.ticker")
+def font_ticker() -> Iterator[Callable[[], None]]:
+    from ticker import Ticker
+
+    pixels = np.zeros((40, 60, 3), dtype=np.uint8)
+    ticker = Ticker("The ELLIE Contour Wall shows this announcement at 60 fps " * 4, scale=3, speed=0.5)
+    yield lambda: np.copyto(pixels, next(ticker))
+
+@case("colour.hsv_to_rgb")
+def colour_hsv_to_rgb() -> Iterator[Callable[[], None]]:
+    pixels = np.zeros((40, 60, 3), dtype=np.uint8)
+    i = 0
+    def fade() -> None:
+        nonlocal i
+        pixels[:] = hsv_to_rgb(i % 360, 100, 100)
+        i += 1
+    yield fade
+
+@case("colour.hsv_to_rgb_array")
+def colour_hsv_to_rgb_array() -> Iterator[Callable[[], None]]:
+    pixels = np.zeros((40, 60, 3), dtype=np.uint8)
+    hues = np.add.outer(np.arange(40), np.arange(60)) * 3
+    i = 0
+    def rainbow() -> None:
+        nonlocal i
+        pixels[:] = hsv_to_rgb_array(hues + i)
+        i += 1
+    yield rainbow
+
+@case("colour.palette")
+def colour_palette() -> Iterator[Callable[[], None]]:
+    pixels = np.zeros((40, 60, 3), dtype=np.uint8)
+    wheel = hue_wheel()
+    hues = np.add.outer(np.arange(40), np.arange(60)) * 3
+    i = 0
+    def rainbow() -> None:
+        nonlocal i
+        apply_palette(hues + i, wheel, out=pixels)
+        i += 1
+    yield rainbow
+
+def measure(name: str, iterations: int, warmup: int) -> dict:
+    """Run a case and returns its result, the latencies are in microseconds."""
+
+    generator = CASES[name]()
+    try:
+        function = next(generator)
+    except Skip as e:
+        return {"name": name, "skipped": str(e)}
+
+    try:
+        for _ in range(warmup):
+            function()
+
+        samples = np.zeros(iterations, dtype=np.int64)
+        for i in range(iterations):
+            t1 = time.perf_counter_ns()
+            function()
+            samples[i] = time.perf_counter_ns() - t1
+    finally:
+        next(generator, None)
+
+    return result(name, samples)
+
+def result(name: str, samples_ns: np.ndarray) -> dict:
+    samples_us = samples_ns / 1000
+    mean_us = float(samples_us.mean())
+    return {
+        "name": name,
+        "iterations": len(samples_us),
+        "mean_us": mean_us,
+        "p50_us": float(np.percentile(samples_us, 50)),
+        "p90_us": float(np.percentile(samples_us, 90)),
+        "p99_us": float(np.percentile(samples_us, 99)),
+        "max_us": float(samples_us.max()),
+        "fps": 1_000_000 / mean_us if mean_us > 0 else None,
+    }
+
+def run(names: list[str], iterations: int, warmup: int) -> dict:
+    results = []
+    for name in names:
+        print(f"[benchmark] {name}", file=sys.stderr)
+        results.append(measure(name, iterations, warmup))
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the frame path of the Contour Wall")
+    parser.add_argument("cases", nargs="*", help="only run the cases which names start with one of these prefixes")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="file to write the JSON results to, by default they are printed")
+    parser.add_argument("--list", action="store_true", help="list the benchmark cases")
+    args = parser.parse_args()
+
+    # The core library is loaded relative to the working directory
+    os.chdir(WRAPPER_DIR)
+
+    if args.list:
+        print("\n".join(CASES))
+        sys.exit()
+
+    names = [name for name in CASES if not args.cases or any(name.startswith(prefix) for prefix in args.cases)]
+    report = json.dumps(run(names, args.iterations, args.warmup), indent=2)
+
+    output: Optional[str] = args.output
+    if output:
+        with open(output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
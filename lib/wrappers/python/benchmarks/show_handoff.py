@@ -0,0 +1,55 @@
+"""
+Benchmark of the framebuffer handoff in `ContourWall.show`, before and after the zero-copy staging buffer.
+
+Only the Python side of the handoff is measured (applying brightness and creating the pointer that is passed to
+`update_all`), so no Contour Wall or compiled core library is needed.
+
+Running is done like this:
+```bash
+python3 benchmarks/show_handoff.py
+```
+"""
+
+import ctypes
+import os
+import sys
+import time
+from ctypes import c_uint8
+from typing import Callable
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from contourwall import _FrameStaging
+
+ITERATIONS = 20_000
+
+def legacy_handoff(pixels: np.ndarray, brightness: float) -> None:
+    """The handoff as it was done before, including the destructive brightness and the copy by `tobytes()`"""
+
+    pixels[:] = pixels[:] // (1 / brightness)
+    ctypes.cast(ctypes.c_char_p(pixels.tobytes()), ctypes.POINTER(ctypes.c_uint8))
+
+def staged_handoff(staging: _FrameStaging) -> Callable[[np.ndarray, float], None]:
+    def handoff(pixels: np.ndarray, brightness: float) -> None:
+        staging.stage(pixels, brightness).ctypes.data_as(ctypes.POINTER(c_uint8))
+
+    return handoff
+
+def measure(handoff: Callable[[np.ndarray, float], None], brightness: float) -> float:
+    """Returns the average time of one handoff in microseconds"""
+
+    pixels = np.random.randint(0, 256, (40, 60, 3), dtype=np.uint8)
+    t1 = time.perf_counter_ns()
+    for _ in range(ITERATIONS):
+        handoff(pixels, brightness)
+    return (time.perf_counter_ns() - t1) / ITERATIONS / 1000
+
+if __name__ == "__main__":
+    staging = _FrameStaging((40, 60, 3))
+
+    print(f"{'brightness':>10} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for brightness in [1, 0.5]:
+        before = measure(legacy_handoff, brightness)
+        after = measure(staged_handoff(staging), brightness)
+        print(f"{brightness:>10} {before:>12.2f} {after:>12.2f} {before / after:>7.1f}x")
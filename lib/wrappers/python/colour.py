@@ -0,0 +1,143 @@
+import colorsys
+from functools import lru_cache
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+def hsv_to_rgb(hue: float, saturation: float, value: float) -> tuple[int, int, int]:
+    """
+    Convert HSV to RGB
+
+    This function is used to convert HSV to RGB.
+
+    H, also known as Hue: The hue of the color, ranging from 0 to 360. Hue is a degree on the color wheel from 0 to 360. 0 is red, 120 is green, 240 is blue.
+    S, also known as Saturation: The saturation of the color, ranging from 0 to 100. Saturation is a percentage of the maximum saturation.
+    V, also known as Value: The value of the color, ranging from 0 to 100. Value is a percentage of the maximum brightness.
+
+    Example code:
+    ```
+        r, g, b = hsv_to_rgb(0, 100, 100)
+    ```
+    This example code will convert the color with a hue of 0, a saturation of 100 and a value of 100 to RGB. The result will be a tuple with the RGB values, resulting in (255, 0, 0).
+
+    To convert many colors at once, use `hsv_to_rgb_array`.
+    """
+
+    r, g, b = colorsys.hsv_to_rgb(hue % 360 / 360, saturation / 100, value / 100)
+    return round(r * 255), round(g * 255), round(b * 255)
+
+def hsl_to_rgb(hue: float, saturation: float, lightness: float) -> tuple[int, int, int]:
+    """
+    Convert HSL to RGB, the hue in degrees and the saturation and lightness as percentages (see `hsv_to_rgb`).
+
+    Example code:
+    ```
+        r, g, b = hsl_to_rgb(120, 100, 50)   # (0, 255, 0)
+    ```
+    """
+
+    r, g, b = colorsys.hls_to_rgb(hue % 360 / 360, lightness / 100, saturation / 100)
+    return round(r * 255), round(g * 255), round(b * 255)
+
+def hsv_to_rgb_array(hue: ArrayLike, saturation: ArrayLike = 100, value: ArrayLike = 100) -> np.ndarray:
+    """
+    Convert arrays of HSV colors to RGB, in the same units as `hsv_to_rgb`. The arrays are broadcast against each other, and
+    an uint8 array with their shape and an extra axis of 3 channels is returned.
+
+    Example code, a rainbow over the columns of the wall:
+    ```
+        cw.pixels[:] = hsv_to_rgb_array(np.arange(60) * 6)
+    ```
+    """
+
+    hue, saturation, value = np.broadcast_arrays(*(np.asarray(a, dtype=np.float32) for a in (hue, saturation, value)))
+    # Every channel is the value minus the part of the chroma for which the hue is away from the channel, the channels are
+    # offset by 5, 3 and 1 sixths of the color wheel
+    k = (np.array([5, 3, 1], dtype=np.float32) + hue[..., np.newaxis] / 60) % 6
+    amount = np.clip(np.minimum(k, 4 - k), 0, 1)
+    rgb = (value[..., np.newaxis] / 100) * (1 - (saturation[..., np.newaxis] / 100) * amount)
+    return np.rint(rgb * 255).astype(np.uint8)
+
+def hsl_to_rgb_array(hue: ArrayLike, saturation: ArrayLike = 100, lightness: ArrayLike = 50) -> np.ndarray:
+    """Convert arrays of HSL colors to RGB, like `hsv_to_rgb_array`."""
+
+    hue, saturation, lightness = np.broadcast_arrays(*(np.asarray(a, dtype=np.float32) for a in (hue, saturation, lightness)))
+    lightness = lightness[..., np.newaxis] / 100
+    chroma = (saturation[..., np.newaxis] / 100) * np.minimum(lightness, 1 - lightness)
+    k = (np.array([0, 8, 4], dtype=np.float32) + hue[..., np.newaxis] / 30) % 12
+    rgb = lightness - chroma * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+    return np.rint(rgb * 255).astype(np.uint8)
+
+@lru_cache(maxsize=None)
+def hue_wheel(entries: int = 360, saturation: float = 100, value: float = 100) -> np.ndarray:
+    """
+    Returns a read-only palette of `entries` colors around the color wheel, starting at red. The palettes are cached, so a
+    palette is only computed once.
+
+    Example code, a rainbow which moves over the wall:
+    ```
+        wheel = hue_wheel()
+        columns = np.arange(60) * 6
+        for frame in range(360):
+            apply_palette(columns + frame, wheel, out=cw.pixels)
+            cw.show()
+    ```
+    """
+
+    palette = hsv_to_rgb_array(np.arange(entries) * 360 / entries, saturation, value)
+    palette.flags.writeable = False
+    return palette
+
+def gradient(colors: Sequence[Sequence[int]], entries: int = 256) -> np.ndarray:
+    """
+    Returns a read-only palette of `entries` colors which fades from one color to the next, the colors are spread evenly over
+    the palette. The palettes are cached, so a palette is only computed once.
+
+    Example code:
+    ```
+        fire = gradient([(0, 0, 0), (255, 0, 0), (255, 200, 0), (255, 255, 255)])
+        apply_palette(heat, fire, out=cw.pixels)    # heat: an uint8 array of 40 by 60
+    ```
+    """
+
+    return _gradient(tuple(tuple(int(c) for c in color) for color in colors), entries)
+
+@lru_cache(maxsize=None)
+def _gradient(colors: tuple[tuple[int, ...], ...], entries: int) -> np.ndarray:
+    if len(colors) == 0:
+        raise Exception("A gradient needs at least one color")
+
+    stops = np.linspace(0, entries - 1, len(colors))
+    positions = np.arange(entries)
+    palette = np.stack([np.interp(positions, stops, [color[channel] for color in colors]) for channel in range(3)], axis=-1)
+    palette = np.rint(palette).astype(np.uint8)
+    palette.flags.writeable = False
+    return palette
+
+def apply_palette(indices: np.ndarray, palette: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Map a frame of palette indices to colors, indices outside of the palette wrap around, so a palette can be cycled by adding
+    to the indices. When `out` is given, E.G. `cw.pixels`, the colors are written into it instead of into a new array.
+    """
+
+    return np.take(palette, indices, axis=0, mode="wrap", out=out)
+
+def correction_lut(gamma: float = 1, white_balance: Sequence[float] = (1, 1, 1), brightness: float = 1) -> np.ndarray:
+    """
+    Returns a lookup table of 3 channels by 256 levels, which corrects the colors of a tile in one step: the gamma curve, then
+    the white balance (the scale of the red, green and blue channel, between 0 and 1) and then the brightness.
+
+    A gamma above 1 makes the dark colors darker, LEDs are linear, so a gamma of around 2.2 makes a fade look even to the eye.
+
+    Example code:
+    ```
+        lut = correction_lut(gamma=2.2, white_balance=(1, 0.9, 0.8))
+        corrected = lut[np.arange(3), pixels]
+    ```
+    """
+
+    levels = (np.arange(256, dtype=np.float64) / 255) ** gamma
+    scale = np.clip(np.asarray(white_balance, dtype=np.float64), 0, 1)[:, np.newaxis] * brightness
+    return np.rint(levels * scale * 255).astype(np.uint8)
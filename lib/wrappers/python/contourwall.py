@@ -1,30 +1,230 @@
 import numpy as np
 import serial.tools.list_ports
 import ctypes
-from ctypes import c_void_p, c_char_p, c_uint32, c_uint8, c_bool
+from ctypes import c_void_p, c_char_p, c_double, c_size_t, c_uint16, c_uint32, c_uint64, c_uint8, c_bool
 from sys import platform
+from enum import IntEnum
+from typing import Callable, Optional, Protocol
 import time
 import os
+import re
+import stat
+
+from animation import AnimationRecorder
+from colour import correction_lut, hsv_to_rgb
+from layout import Layout, TilePlacement
+from metrics import Metrics, write_metrics_file_in_background
+from tracked_canvas import TrackedCanvas, tile_regions
 
 class ContourWallCore(ctypes.Structure):
     """
     ContourWallCore is a ctypes structure that is used to communicate with the Rust shared object. It contains the following fields:
     - tiles_ptr: A pointer to an array of tiles in the Rust shared object, based on the physical tiles which together are called the 'Contour Wall'.
     - tiles_len: The length of the tiles array in the Rust shared object, also known as the total count of objects in the array.
+    - scheduler_ptr: A pointer to the frame scheduler in the Rust shared object, which paces the frames of all tiles.
+    - frame_rows: The amount of rows of the framebuffer of the wall, in pixels.
+    - frame_cols: The amount of collumns of the framebuffer of the wall, in pixels.
     """
     _fields_ = [
         ("tiles_ptr", c_void_p),
-        ("tiles_len", c_uint32),
+        ("tiles_len", c_size_t),
+        ("scheduler_ptr", c_void_p),
+        ("frame_rows", c_size_t),
+        ("frame_cols", c_size_t),
     ]
 
-class ContourWall:
-    def __init__(self) -> None:
+class TileStatistics(ctypes.Structure):
+    """
+    TileStatistics is a ctypes structure with the counters of a tile, identical to `TileStatistics` of the Rust shared object. It contains the following fields:
+    - full_frames: The amount of frames that were send with all pixels (command 2 of the protocol).
+    - sparse_frames: The amount of frames of which only the changed pixels were send (command 3 of the protocol).
+    - solid_frames: The amount of frames that were send as a single color, because all pixels of the tile had the same color (command 1 of the protocol).
+    - skipped_frames: The amount of frames that were not send at all, because nothing changed on the tile.
+    - bytes_sent: The total amount of bytes that were written to the tile.
+    - retries: The amount of commands that were send again, after the tile rejected them.
+    - resets: The amount of times the tile asked for a reset of the connection, because its buffers ran out of sync.
+    - disconnects: The amount of times the connection with the tile was lost.
+    - reconnects: The amount of times the connection with the tile was reopened in the background.
+    - dropped_frames: The amount of frames that were handed to the tile, but which it did not show.
+    - crc_errors: The amount of responses of the tile with `StatusCode.NON_MATCHING_CRC`.
+    - timeouts: The amount of responses that did not arrive in time, and writes that did not finish in time.
+    - reorder_us, write_us, ack_us, pacing_us: The total time in microseconds the tile spent on gathering its framebuffer in wire order, writing to
+      the port, waiting for its responses and waiting until it was ready or until the deadline of the frame.
+    """
+    _fields_ = [
+        ("full_frames", c_uint64),
+        ("sparse_frames", c_uint64),
+        ("solid_frames", c_uint64),
+        ("skipped_frames", c_uint64),
+        ("bytes_sent", c_uint64),
+        ("retries", c_uint64),
+        ("resets", c_uint64),
+        ("disconnects", c_uint64),
+        ("reconnects", c_uint64),
+        ("dropped_frames", c_uint64),
+        ("crc_errors", c_uint64),
+        ("timeouts", c_uint64),
+        ("reorder_us", c_double),
+        ("write_us", c_double),
+        ("ack_us", c_double),
+        ("pacing_us", c_double),
+    ]
+
+    def __repr__(self) -> str:
+        counters = ", ".join(f"{field[0]}={getattr(self, field[0])}" for field in self._fields_)
+        return f"TileStatistics({counters})"
+
+class SchedulerStatistics(ctypes.Structure):
+    """
+    SchedulerStatistics is a ctypes structure with the frame pacing statistics of the ContourWall, identical to `SchedulerStatistics` of the Rust shared object. All times are in microseconds. It contains the following fields:
+    - frames: The amount of frames that were shown.
+    - missed_deadlines: The amount of frames of which the deadline had already passed when `show` was called.
+    - jitter_mean_us, jitter_max_us: The mean and maximum time between the deadline and the moment the first tile was told to show the frame.
+    - skew_last_us, skew_max_us: The time between the first and the last tile being told to show the frame, of the last frame and the maximum.
+    - core_us: The total time spent within `show` and `update_and_show` of the backend, including the wait for the deadlines.
+    """
+    _fields_ = [
+        ("frames", c_uint64),
+        ("missed_deadlines", c_uint64),
+        ("jitter_mean_us", c_double),
+        ("jitter_max_us", c_double),
+        ("skew_last_us", c_double),
+        ("skew_max_us", c_double),
+        ("core_us", c_double),
+    ]
+
+    def __repr__(self) -> str:
+        counters = ", ".join(f"{field[0]}={getattr(self, field[0])}" for field in self._fields_)
+        return f"SchedulerStatistics({counters})"
+
+class Backend(Protocol):
+    """
+    Interface of the transports which the ContourWall uses to communicate with the tiles.
+    The frames passed to `update_all` and `update_and_show` are C-contiguous uint8 arrays with the shape of `ContourWall.pixels`.
+    When `tiles` is given, it is a uint8 array with a byte per tile: only the tiles that are not 0 are updated.
+    `update_and_show` updates every tile and shows it at the deadline of the frame in one pass, instead of waiting for all tiles
+    in between. It and `show` wait for the next frame deadline of the scheduler (see `set_target_fps`), also when no tile is selected.
+    A tile which cannot be found or whose connection is lost is kept as a disconnected tile, which is reopened in the background
+    while the other tiles keep running, `tile_status` reports the status code of the last frame of every tile.
+    """
+
+    def new(self, baudrate: int) -> None: ...
+    def new_with_ports(self, ports: list[str], baudrate: int) -> None: ...
+    def single_new_with_port(self, port: str, baudrate: int) -> None: ...
+    def new_with_layout(self, layout: Layout, ports: Optional[list[str]], baudrate: int) -> None: ...
+    def tiles_len(self) -> int: ...
+    def update_all(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None: ...
+    def show(self, tiles: Optional[np.ndarray] = None) -> None: ...
+    def update_and_show(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None: ...
+    def update_and_show_wire(self, frame: np.ndarray, optimize: bool) -> None: ...
+    def wire_order_index(self) -> np.ndarray: ...
+    def solid_color(self, r: int, g: int, b: int) -> None: ...
+    def set_sparse_threshold(self, threshold: int) -> None: ...
+    def tile_statistics(self) -> list[TileStatistics]: ...
+    def tile_status(self) -> list["StatusCode"]: ...
+    def set_target_fps(self, fps: float) -> None: ...
+    def scheduler_statistics(self, reset: bool) -> SchedulerStatistics: ...
+    def drop(self) -> None: ...
+
+class _FrameStaging:
+    """
+    Preallocated, C-contiguous uint8 buffer that is used to hand frames over to the Rust shared object.
+
+    When the pixel array can be passed to the Rust shared object as is (a C-contiguous uint8 array at full brightness), a pointer
+    straight into the pixel array is used. Otherwise the frame is written into the staging buffer, brightness is applied through a
+    precomputed lookup table. The pixel array of the user is never modified.
+
+    With color correction (see `set_correction`) every byte goes through the lookup table of its tile and channel, which has the
+    brightness folded in, so the correction costs a single pass over the frame.
+    """
+
+    def __init__(self, shape: tuple[int, ...]) -> None:
+        self.buffer: np.ndarray = np.zeros(shape, dtype=np.uint8)
+        self._lut: np.ndarray = brightness_lut(1)
+        self._lut_brightness: float = 1
+
+        # Only set when the colors are corrected
+        self._correction: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self._lut_offsets: np.ndarray = np.zeros(shape, dtype=np.intp)
+        self._lut_indices: np.ndarray = np.zeros(shape, dtype=np.intp)
+        self._correction_lut: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self._correction_brightness: Optional[float] = None
+
+    def set_correction(self, gamma: Optional[np.ndarray], white_balance: Optional[np.ndarray] = None, lut_of_byte: Optional[np.ndarray] = None) -> None:
         """
-        Constructor for the ContourWall class.
+        Correct the colors of every tile, with the gamma of every tile and the white balance of every tile and channel, see
+        `correction_lut`. `lut_of_byte` holds for every byte of the buffer its tile times 3 plus its channel. The lookup tables
+        are only computed again when the settings or the brightness change. A `gamma` of None disables the correction.
+        """
+
+        if gamma is None or white_balance is None or lut_of_byte is None:
+            self._correction = None
+            return
+        self._correction = (gamma.copy(), white_balance.copy())
+        self._lut_offsets[:] = lut_of_byte * 256
+        self._correction_brightness = None
+
+    def stage(self, pixels: np.ndarray, brightness: float = 1) -> np.ndarray:
+        """
+        Returns a C-contiguous uint8 array containing the frame that needs to be send to the ContourWall.
 
-        The constructor loads the Rust shared object (called ContourWallCore) and initializes the functions that are used to communicate with the Rust shared object.
+        The returned array is either `pixels` itself or the staging buffer, so it is only valid until the next call.
         """
 
+        if self._correction is not None:
+            return self._stage_corrected(pixels, brightness)
+
+        is_passthrough = pixels.dtype == np.uint8 and pixels.flags.c_contiguous and pixels.shape == self.buffer.shape
+        if brightness >= 1:
+            if is_passthrough:
+                return pixels
+            np.copyto(self.buffer, pixels, casting="unsafe")
+            return self.buffer
+
+        if brightness != self._lut_brightness:
+            self._lut = brightness_lut(brightness)
+            self._lut_brightness = brightness
+
+        if pixels.dtype != np.uint8:
+            np.copyto(self.buffer, pixels, casting="unsafe")
+            pixels = self.buffer
+        np.take(self._lut, pixels, out=self.buffer, mode="clip")
+        return self.buffer
+
+    def _stage_corrected(self, pixels: np.ndarray, brightness: float) -> np.ndarray:
+        assert self._correction is not None
+        if brightness != self._correction_brightness:
+            gamma, white_balance = self._correction
+            self._correction_lut = np.concatenate([correction_lut(g, wb, brightness) for g, wb in zip(gamma, white_balance)]).reshape(-1)
+            self._correction_brightness = brightness
+
+        if pixels.dtype != np.uint8:
+            np.copyto(self.buffer, pixels, casting="unsafe")
+            pixels = self.buffer
+        np.add(self._lut_offsets, pixels, out=self._lut_indices)
+        np.take(self._correction_lut, self._lut_indices, out=self.buffer, mode="clip")
+        return self.buffer
+
+class StatusCode(IntEnum):
+    """Status codes which are used to communicate state between a tile and the library, identical to `status_code.rs` of the core library."""
+
+    ERROR = 0
+    TOO_SLOW = 1
+    NON_MATCHING_CRC = 2
+    UNKNOWN_COMMAND = 3
+    ERROR_INTERNAL = 50
+    NOT_A_CW_PORT = 51
+    DISCONNECTED = 52
+    OK = 100
+    NEXT = 101
+    RESET = 255
+
+class _CoreBackend:
+    """
+    Backend of the ContourWall which communicates with the tiles through the Rust shared object (called ContourWallCore).
+    """
+
+    def __init__(self) -> None:
         # Load the Rust library based on the operating system
         if platform == "win32":
             self.__lib = ctypes.CDLL("./contourwall_core.dll")
@@ -48,6 +248,10 @@ class ContourWall:
         self._single_new_with_port.argtypes = [c_char_p, c_uint32]
         self._single_new_with_port.restype = ContourWallCore
 
+        self._new_with_layout = self.__lib.new_with_layout
+        self._new_with_layout.argtypes = [ctypes.POINTER(TilePlacement), ctypes.POINTER(c_char_p), c_size_t, c_uint32]
+        self._new_with_layout.restype = ContourWallCore
+
         self._configure_threadpool = self.__lib.configure_threadpool
         self._configure_threadpool.argtypes = [c_uint8]
         self._configure_threadpool.restype = c_bool
@@ -55,28 +259,183 @@ class ContourWall:
         self._show = self.__lib.show
         self._show.argtypes = [ctypes.POINTER(ContourWallCore)]
 
+        self._show_tiles = self.__lib.show_tiles
+        self._show_tiles.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8)]
+
         self._update_all = self.__lib.update_all
         self._update_all.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8), c_bool]
 
+        self._update_tiles = self.__lib.update_tiles
+        self._update_tiles.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8), c_bool, ctypes.POINTER(c_uint8)]
+
+        self._update_and_show = self.__lib.update_and_show
+        self._update_and_show.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8), c_bool]
+
+        self._update_and_show_tiles = self.__lib.update_and_show_tiles
+        self._update_and_show_tiles.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8), c_bool, ctypes.POINTER(c_uint8)]
+
+        self._update_and_show_wire = self.__lib.update_and_show_wire
+        self._update_and_show_wire.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8), c_bool]
+
+        self._wire_order_index = self.__lib.wire_order_index
+        self._wire_order_index.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint32)]
+
         self._solid_color = self.__lib.solid_color
         self._solid_color.argtypes = [ctypes.POINTER(ContourWallCore), c_uint8, c_uint8, c_uint8]
 
+        self._set_sparse_threshold = self.__lib.set_sparse_threshold
+        self._set_sparse_threshold.argtypes = [ctypes.POINTER(ContourWallCore), c_uint16]
+
+        self._tile_statistics = self.__lib.tile_statistics
+        self._tile_statistics.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.c_size_t]
+        self._tile_statistics.restype = TileStatistics
+
+        self._tile_status = self.__lib.tile_status
+        self._tile_status.argtypes = [ctypes.POINTER(ContourWallCore), ctypes.POINTER(c_uint8)]
+
+        self._set_target_fps = self.__lib.set_target_fps
+        self._set_target_fps.argtypes = [ctypes.POINTER(ContourWallCore), c_double]
+
+        self._scheduler_statistics = self.__lib.scheduler_statistics
+        self._scheduler_statistics.argtypes = [ctypes.POINTER(ContourWallCore), c_bool]
+        self._scheduler_statistics.restype = SchedulerStatistics
+
         # Drop the ContourWallCore instance
         self._drop = self.__lib.drop
         self._drop.argtypes = [ctypes.POINTER(ContourWallCore)]
 
+    def new(self, baudrate: int) -> None:
+        self._cw_core = self._new(baudrate)
+
+    def new_with_ports(self, ports: list[str], baudrate: int) -> None:
+        self._cw_core = self._new_with_ports(*[port.encode() for port in ports], baudrate)
+
+    def single_new_with_port(self, port: str, baudrate: int) -> None:
+        self._cw_core = self._single_new_with_port(port.encode(), baudrate)
+
+    def new_with_layout(self, layout: Layout, ports: Optional[list[str]], baudrate: int) -> None:
+        placements = (TilePlacement * len(layout))(*layout.placements)
+        com_ports = None if ports is None else (c_char_p * len(ports))(*[port.encode() for port in ports])
+        self._cw_core = self._new_with_layout(placements, com_ports, len(layout), baudrate)
+
+    def tiles_len(self) -> int:
+        return self._cw_core.tiles_len
+
+    def update_all(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None:
+        ptr: ctypes._Pointer[c_uint8] = frame.ctypes.data_as(ctypes.POINTER(c_uint8))
+        if tiles is None:
+            self._update_all(ctypes.byref(self._cw_core), ptr, optimize)
+        else:
+            self._update_tiles(ctypes.byref(self._cw_core), ptr, optimize, tiles.ctypes.data_as(ctypes.POINTER(c_uint8)))
+
+    def show(self, tiles: Optional[np.ndarray] = None) -> None:
+        if tiles is None:
+            self._show(ctypes.byref(self._cw_core))
+        else:
+            self._show_tiles(ctypes.byref(self._cw_core), tiles.ctypes.data_as(ctypes.POINTER(c_uint8)))
+
+    def update_and_show(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None:
+        ptr: ctypes._Pointer[c_uint8] = frame.ctypes.data_as(ctypes.POINTER(c_uint8))
+        if tiles is None:
+            self._update_and_show(ctypes.byref(self._cw_core), ptr, optimize)
+        else:
+            self._update_and_show_tiles(ctypes.byref(self._cw_core), ptr, optimize, tiles.ctypes.data_as(ctypes.POINTER(c_uint8)))
+
+    def update_and_show_wire(self, frame: np.ndarray, optimize: bool) -> None:
+        self._update_and_show_wire(ctypes.byref(self._cw_core), frame.ctypes.data_as(ctypes.POINTER(c_uint8)), optimize)
+
+    def wire_order_index(self) -> np.ndarray:
+        index = np.zeros(self._cw_core.tiles_len * 1200, dtype=np.uint32)
+        self._wire_order_index(ctypes.byref(self._cw_core), index.ctypes.data_as(ctypes.POINTER(c_uint32)))
+        return index.astype(np.intp)
+
+    def solid_color(self, r: int, g: int, b: int) -> None:
+        self._solid_color(ctypes.byref(self._cw_core), r, g, b)
+
+    def set_sparse_threshold(self, threshold: int) -> None:
+        self._set_sparse_threshold(ctypes.byref(self._cw_core), threshold)
+
+    def tile_statistics(self) -> list[TileStatistics]:
+        return [self._tile_statistics(ctypes.byref(self._cw_core), i) for i in range(self._cw_core.tiles_len)]
+
+    def tile_status(self) -> list[StatusCode]:
+        status = np.zeros(self._cw_core.tiles_len, dtype=np.uint8)
+        self._tile_status(ctypes.byref(self._cw_core), status.ctypes.data_as(ctypes.POINTER(c_uint8)))
+        return [StatusCode(code) for code in status]
+
+    def set_target_fps(self, fps: float) -> None:
+        self._set_target_fps(ctypes.byref(self._cw_core), fps)
+
+    def scheduler_statistics(self, reset: bool) -> SchedulerStatistics:
+        return self._scheduler_statistics(ctypes.byref(self._cw_core), reset)
+
+    def drop(self) -> None:
+        self._drop(ctypes.byref(self._cw_core))
+
+class ContourWall:
+    def __init__(self, backend: str = "core") -> None:
+        """
+        Constructor for the ContourWall class.
+
+        The backend decides how the wrapper communicates with the tiles:
+        - "core": loads the Rust shared object (called ContourWallCore) and initializes the functions that are used to communicate with the Rust shared object.
+        - "python": implements the tile protocol in Python on top of pyserial, with one worker process per tile. No Rust toolchain is needed.
+
+        Example code:
+        ```
+            cw = ContourWall(backend="python")
+            cw.new()
+        ```
+        """
+
+        if backend == "core":
+            self._backend: Backend = _CoreBackend()
+        elif backend == "python":
+            from contourwall_serial import SerialBackend
+            self._backend = SerialBackend()
+        else:
+            raise Exception(f"'{backend}' is not a ContourWall backend, use either 'core' or 'python'")
+
         # Initialize the pixel array
         self.pixels: np.ndarray = np.zeros((40, 60, 3), dtype=np.uint8)
+        self._staging = _FrameStaging(self.pixels.shape)
 
         # Initialize the pushed frames counter
         self.pushed_frames: int = 0
 
+        # Only set when the tracked canvas is used
+        self._canvas: Optional[TrackedCanvas] = None
+        self._canvas_brightness: float = 1
+
+        # Only set when frames are shown in wire order
+        self._wire_staging: Optional[_FrameStaging] = None
+
+        # Only set when the ContourWall is initialized with a layout
+        self._layout: Optional[Layout] = None
+
+        # Only set when the colors are corrected, the gamma of every tile and the white balance of every tile and channel
+        self._gamma: Optional[np.ndarray] = None
+        self._white_balance: np.ndarray = np.ones((0, 3))
+
+        # Where the time of the frames went, see `metrics`
+        self._metrics_frames: int = 0
+        self._prep_us: float = 0
+        self._call_us: float = 0
+        # Only set when the metrics are exported, see `export_metrics`
+        self._metrics_export: Optional[tuple[str, float]] = None
+        self._next_metrics_export: float = 0
+
+        # Only set while the frames are recorded, see `record`
+        self._recorder: Optional[AnimationRecorder] = None
+        self._record_index: np.ndarray = np.zeros(0, dtype=np.intp)
+
     def new(self, baudrate: int=2_000_000) -> None:
         """
         Create a new instance of ContourWallCore, using the default baudrate of 2_000_000.
 
         This function is used to create a new instance of ContourWallCore when the COM ports are unknown. 
-        The function will automaticaly search for available comports, if no COM ports are found a error will be returned.
+        The function will automaticaly search for available comports. Tiles which are not found are looked for in the background,
+        the other tiles can be used in the meantime, see `tile_status`.
 
         Example code:
         ```
@@ -85,7 +444,7 @@ class ContourWall:
         ```
         This example code will create a new instance of ContourWallCore with the default baudrate of 2_000_000 and will try to find available COM ports.
         """
-        self._cw_core = self._new(baudrate)
+        self._backend.new(baudrate)
 
     def new_with_ports(self, port1: str, port2: str, port3: str, port4: str, port5: str, port6: str, baudrate: int =2_000_000) -> None:
         """
@@ -101,8 +460,9 @@ class ContourWall:
         This example code will create a new instance of ContourWallCore with the default baudrate of 2_000_000 and will use the COM ports "COM3", "COM4", "COM5", "COM6", "COM7" and "COM8".
         """
     
-        if check_comport_existence([port1, port2, port3, port4, port5, port6]):
-            self._cw_core = self._new_with_ports(port1.encode(), port2.encode(), port3.encode(), port4.encode(), port5.encode(), port6.encode(), baudrate)
+        ports = [port1, port2, port3, port4, port5, port6]
+        if check_comport_existence(ports):
+            self._backend.new_with_ports(ports, baudrate)
         else:   
             raise Exception(f"one of the COM ports does not exist")
 
@@ -121,10 +481,45 @@ class ContourWall:
         """
 
         if check_comport_existence([port]):
-            self._cw_core = self._single_new_with_port(port.encode(), baudrate)
+            self._backend.single_new_with_port(port, baudrate)
         else:
             raise Exception(f"COM port '{port}' does not exist")
 
+    def new_with_layout(self, layout: Layout, ports: Optional[list[str]]=None, baudrate: int=2_000_000) -> None:
+        """
+        Create a new instance of ContourWallCore of any size and shape, of which the tiles are placed according to the layout.
+
+        The pixel array gets the shape of the layout, see `Layout`. When `ports` is given, it holds the COM port of every tile in
+        the same order as the placements of the layout. Otherwise the tiles are found automatically, like `new` does, and matched
+        with the placements by their identifier.
+
+        Example code:
+        ```
+            cw = ContourWall()
+            cw.new_with_layout(Layout.grid(3, 4))
+            cw.pixels.shape     # (60, 80, 3)
+        ```
+        This example code will create a new instance of ContourWallCore of 3 rows of 4 tiles, with the tiles identified 1 to 12 from left to right and top to bottom.
+        """
+
+        if ports is not None:
+            if len(ports) != len(layout):
+                raise Exception(f"The layout has {len(layout)} tiles, but {len(ports)} COM ports were given")
+            if not check_comport_existence(ports):
+                raise Exception(f"one of the COM ports does not exist")
+
+        self._backend.new_with_layout(layout, ports, baudrate)
+        if self._backend.tiles_len() != len(layout):
+            self._backend.drop()
+            raise Exception("The layout is not valid for the core library")
+
+        self._layout = layout
+        self.pixels = np.zeros(layout.shape, dtype=np.uint8)
+        self._staging = _FrameStaging(self.pixels.shape)
+        self._canvas = None
+        self._wire_staging = None
+        self._gamma = None
+
     def show(self, sleep_ms:int=0, optimize:bool=True, brightness:float=1) -> None:
         """
         Show the current state of the pixel array on the ContourWall.
@@ -137,19 +532,343 @@ class ContourWall:
             cw.show()
         ```
         This example code will show the current state of the pixel array on the ContourWall.
+
+        The brightness is applied to the frame that is send to the ContourWall, the pixel array itself is left untouched.
+        No memory is allocated for the frame, a pointer into the pixel array (or into a preallocated staging buffer when the
+        brightness is below 1) is handed over to the Rust shared object.
+
+        Every tile is updated and shown in one pass, a tile shows the frame as soon as the deadline of the frame is reached
+        instead of waiting until all other tiles are updated.
+        """
+
+        brightness = clamp_brightness(brightness)
+        self._show_frame(self.pixels, optimize, brightness, self._take_dirty_tiles(brightness))
+
+        self.pushed_frames += 1
+        time.sleep(sleep_ms/1000)
+
+    def _take_dirty_tiles(self, brightness: float) -> Optional[np.ndarray]:
+        """
+        The tiles of the next frame that have to be updated, which are the tiles that were drawn on on the tracked canvas, or all
+        tiles when the brightness changed. None is returned without a tracked canvas, then all tiles are updated.
+        """
+
+        if self._canvas is None:
+            return None
+        tiles = self._canvas.take_dirty_tiles()
+        if brightness != self._canvas_brightness:
+            tiles[:] = 1
+            self._canvas_brightness = brightness
+        return tiles
+
+    def _show_frame(self, pixels: np.ndarray, optimize: bool, brightness: float, tiles: Optional[np.ndarray]) -> None:
+        """Show the frame in `pixels`, only the `tiles` of `_take_dirty_tiles` are updated."""
+
+        if tiles is None or tiles.any():
+            self._push_frame(pixels, optimize, brightness, tiles)
+        else:
+            # Nothing to update, but the frame still takes its place in the schedule of `set_target_fps`
+            start = time.perf_counter()
+            self._backend.show(tiles)
+            self._record_frame(start, start)
+            if self._recorder is not None:
+                self._recorder.append(None)
+
+    def _push_frame(self, pixels: np.ndarray, optimize: bool, brightness: float, tiles: Optional[np.ndarray] = None) -> None:
+        """Update the tiles with the frame in `pixels` and show it, this blocks until all tiles are done."""
+
+        start = time.perf_counter()
+        frame = self._staging.stage(pixels, brightness)
+        staged = time.perf_counter()
+        self._backend.update_and_show(frame, optimize, tiles)
+        self._record_frame(start, staged)
+        if self._recorder is not None:
+            self._recorder.append(frame.reshape(-1)[self._record_index] if self._recorder.wire_order else frame)
+
+    def _record_frame(self, start: float, staged: float) -> None:
+        """Record the time of a frame which was prepared from `start` until `staged` and then handed to the backend, see `metrics`."""
+
+        self._metrics_frames += 1
+        self._prep_us += (staged - start) * 1_000_000
+        self._call_us += (time.perf_counter() - staged) * 1_000_000
+
+        if self._metrics_export is not None and time.monotonic() >= self._next_metrics_export:
+            path, interval = self._metrics_export
+            self._next_metrics_export = time.monotonic() + interval
+            write_metrics_file_in_background(path, self.metrics())
+
+    def set_target_fps(self, fps: float) -> None:
+        """
+        Set the target frames per second, after which `show` paces the frames on a monotonic clock.
+
+        Every `show` waits for the deadline of the next frame, the deadlines are `1 / fps` seconds apart. All tiles are told to
+        show the frame at the same deadline, so they stay in sync with each other. When a frame is late, it is shown immediately and
+        counted as a missed deadline in `scheduler_statistics`, the following frames are paced from that moment on.
+        An fps of 0, which is the default, shows every frame as soon as the tiles are ready.
+
+        Example code:
+        ```
+            cw.set_target_fps(30)
+            for i in range(0, 360):
+                cw.pixels[:] = hsv_to_rgb(i, 100, 100)
+                cw.show()   # Shows a frame every 33.3 ms
+        ```
+        """
+
+        self._backend.set_target_fps(max(0, fps))
+
+    def scheduler_statistics(self, reset: bool = False) -> SchedulerStatistics:
+        """
+        Returns the frame pacing statistics: the amount of missed deadlines, the jitter of the moment the frames were shown and the
+        skew between the tiles. When `reset` is True, the statistics are reset after returning them.
+
+        Example code:
+        ```
+            statistics = cw.scheduler_statistics()
+            print(f"Missed {statistics.missed_deadlines} of {statistics.frames} frames, jitter {statistics.jitter_mean_us:.0f} us")
+        ```
         """
 
-        if not (0 <= brightness <= 1):
-            print(f"[Contour Wall Warning] Brightness needs to be a float between 0 and 1, not {brightness}.")
-            brightness = max(0, min(brightness, 1))
+        statistics = self._backend.scheduler_statistics(reset)
+        if reset:
+            # The timings of `metrics` cover the same frames as the scheduler statistics
+            self._metrics_frames = 0
+            self._prep_us = 0
+            self._call_us = 0
+        return statistics
+
+    def metrics(self) -> Metrics:
+        """
+        Returns where the time of the frames went: preparing them in Python, crossing into the backend, and per tile reordering,
+        writing over serial, waiting for the responses and pacing. Together with the CRC errors, timeouts, dropped frames and
+        bytes sent of every tile, see `Metrics`. The times cover the frames since the scheduler statistics were reset.
+
+        Example code:
+        ```
+            cw.run(draw, fps=30, frames=300)
+            for step, us in cw.metrics().breakdown().items():
+                print(f"{step}: {us:.0f} us per frame")
+        ```
+        """
+
+        scheduler = self._backend.scheduler_statistics(False)
+        return Metrics(self._metrics_frames, self._prep_us, self._call_us, scheduler, self._backend.tile_statistics())
+
+    def export_metrics(self, path: Optional[str], interval: float = 5) -> None:
+        """
+        Write the `metrics` to the file at `path` every `interval` seconds, in the text format of Prometheus, so a local scraper
+        can read them (E.G. the textfile collector of the Prometheus node exporter). The metrics are collected after a frame,
+        and written to the file on a separate thread. A `path` of None stops the export.
+
+        Example code:
+        ```
+            cw.export_metrics("/var/lib/node_exporter/contourwall.prom")
+        ```
+        """
+
+        self._metrics_export = None if path is None else (path, max(interval, 0))
+        self._next_metrics_export = 0
+
+    def record(self, path: Optional[str], fps: float = 30, wire_order: bool = False, keyframe_interval: int = 300) -> None:
+        """
+        Record every frame that is shown into an animation file at `path`, which `animation.AnimationPlayer` plays back at `fps`.
+        A `path` of None stops the recording and closes the file. This needs to be called after the ContourWall has been initialized.
+
+        The frames are recorded as they are send, so with the brightness and color correction applied. Only the tiles that
+        changed are stored, in the smallest of a few encodings, and tiles which were shown before are stored as a reference to
+        the earlier tile, so a show which repeats takes a few bytes per frame. With `wire_order` the frames are recorded in the
+        order the LEDs are wired, and played back with `show_wire` without reordering them.
+
+        Example code:
+        ```
+            cw.record("show.cwanim", fps=30)
+            cw.run(draw, fps=30, frames=1800)
+            cw.record(None)
+        ```
+        """
+
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+        if path is None:
+            return
+
+        # Frames are converted between the order of the pixel array and wire order with the wire order index
+        self._record_index = self.wire_order_index()
+        self._recorder = AnimationRecorder(path, self._tile_regions(), self.pixels.shape[:2], fps, wire_order, keyframe_interval)
+
+    def _record_wire_frame(self, frame: np.ndarray) -> None:
+        """Record a frame that was shown with `show_wire`, recordings in the order of the pixel array get it scattered back."""
+
+        assert self._recorder is not None
+        if self._recorder.wire_order:
+            self._recorder.append(frame)
+            return
+        pixels = np.zeros_like(self.pixels)
+        pixels.reshape(-1)[self._record_index] = frame
+        self._recorder.append(pixels)
+
+    def run(self, callback: Callable[[int], Optional[bool]], fps: float = 30, frames: Optional[int] = None, optimize: bool = True, brightness: float = 1) -> SchedulerStatistics:
+        """
+        Render loop which calls `callback` with the index of the frame to draw on the pixel array, and shows every frame at `fps`.
+
+        The loop stops after `frames` frames, or when the callback returns False. The frame pacing statistics of the run are returned.
+
+        Example code:
+        ```
+            def draw(frame: int) -> None:
+                cw.pixels[:] = hsv_to_rgb(frame % 360, 100, 100)
+
+            statistics = cw.run(draw, fps=30, frames=360)
+        ```
+        """
+
+        self.set_target_fps(fps)
+        self.scheduler_statistics(reset=True)
+
+        frame = 0
+        while frames is None or frame < frames:
+            if callback(frame) is False:
+                break
+            self.show(optimize=optimize, brightness=brightness)
+            frame += 1
+
+        return self.scheduler_statistics()
+
+    def wire_order_index(self) -> np.ndarray:
+        """
+        Returns the wiring of the whole ContourWall as a gather index into the flattened pixel array, for `show_wire`.
+
+        Gathering the flattened pixel array with the index gives the framebuffers of all tiles in the order their LEDs are wired,
+        one tile after the other, which are the exact bytes `show` sends. This needs to be called after the ContourWall has been initialized.
+
+        Example code:
+        ```
+            index = cw.wire_order_index()
+            wire_frame = cw.pixels.reshape(-1)[index]
+            cw.show_wire(wire_frame)   # Shows the same as cw.show()
+        ```
+        """
+
+        return self._backend.wire_order_index()
+
+    def show_wire(self, wire_frame: np.ndarray, sleep_ms: int = 0, optimize: bool = True, brightness: float = 1) -> None:
+        """
+        Show a frame which is already in the order the LEDs are wired, see `wire_order_index`.
+
+        The frame is send as is, it is neither split over the tiles nor reordered. This is meant for producers which render straight
+        into wire order, or which replay prepared frames. The frame is a uint8 array of 1200 bytes per tile, the pixel array is not used.
+
+        Example code:
+        ```
+            index = cw.wire_order_index()
+            prepared = [frame.reshape(-1)[index] for frame in frames]
+            for wire_frame in prepared:
+                cw.show_wire(wire_frame)
+        ```
+        """
+
+        brightness = clamp_brightness(brightness)
+        if self._wire_staging is None:
+            self._wire_staging = _FrameStaging((self._backend.tiles_len() * 1200,))
+            self._apply_color_correction()
+        start = time.perf_counter()
+        frame = self._wire_staging.stage(wire_frame.reshape(-1), brightness)
+        staged = time.perf_counter()
+        self._backend.update_and_show_wire(frame, optimize)
+        self._record_frame(start, staged)
+        if self._recorder is not None:
+            self._record_wire_frame(frame)
+
+        # The tiles no longer show the pixel array, so the next `show` needs to update all of them
+        if self._canvas is not None:
+            self._canvas.mark_all_dirty()
 
-        self.pixels[:] = self.pixels[:] // (1 / brightness)
-        ptr: ctypes._Pointer[c_uint8] = ctypes.cast(ctypes.c_char_p(self.pixels.tobytes()), ctypes.POINTER(ctypes.c_uint8))
-        self._update_all(ctypes.byref(self._cw_core), ptr, optimize)
-        self._show(ctypes.byref(self._cw_core))
         self.pushed_frames += 1
         time.sleep(sleep_ms/1000)
 
+    def tracked_canvas(self) -> TrackedCanvas:
+        """
+        Returns a canvas to draw on the pixel array, which keeps track of which tiles have been drawn on.
+
+        Once the tracked canvas is used, `show` only updates and shows the tiles that were drawn on since the previous frame,
+        the other tiles are skipped entirely. Changes made directly to the pixel array have to be marked with
+        `canvas.mark_dirty` to be shown. This needs to be called after the ContourWall has been initialized.
+
+        Example code:
+        ```
+            canvas = cw.tracked_canvas()
+            canvas.fill((0, 0, 0))
+            cw.show()                               # All tiles are updated
+            canvas.rect(2, 2, 5, 5, (255, 0, 0))
+            cw.show()                               # Only the top-left tile is updated
+        ```
+        """
+
+        self._canvas = TrackedCanvas(self.pixels, self._tile_regions())
+        return self._canvas
+
+    def _tile_regions(self) -> np.ndarray:
+        return self._layout.regions() if self._layout is not None else tile_regions(self._backend.tiles_len(), self.pixels.shape)
+
+    def set_color_correction(self, gamma: float = 1, white_balance: tuple[float, float, float] = (1, 1, 1), tiles: Optional[list[int]] = None) -> None:
+        """
+        Correct the colors of the tiles, E.G. to match the white of tiles from different batches, or to make fades look even.
+
+        - gamma: The gamma curve that is applied to every channel, LEDs are linear so a gamma of around 2.2 looks even to the eye.
+        - white_balance: The scale of the red, green and blue channel, between 0 and 1.
+        - tiles: The indices of the tiles to correct, by default all tiles.
+
+        The gamma, white balance and brightness of `show` are combined into one lookup table per channel per tile, which is only
+        computed again when the settings or the brightness change. The frame goes through the lookup tables while it is handed
+        over to the backend, the pixel array itself is left untouched. A gamma of 1 and a white balance of (1, 1, 1) for all tiles
+        disables the correction. This needs to be called after the ContourWall has been initialized.
+
+        Example code:
+        ```
+            cw.set_color_correction(gamma=2.2)
+            cw.set_color_correction(gamma=2.2, white_balance=(1, 0.92, 0.85), tiles=[2, 3])   # Tiles with a bluer white
+        ```
+        """
+
+        tiles_len = self._backend.tiles_len()
+        if self._gamma is None or len(self._gamma) != tiles_len:
+            self._gamma = np.ones(tiles_len)
+            self._white_balance = np.ones((tiles_len, 3))
+
+        selected = list(range(tiles_len)) if tiles is None else tiles
+        for tile in selected:
+            if not (0 <= tile < tiles_len):
+                raise Exception(f"There is no tile {tile}, the ContourWall has {tiles_len} tiles")
+        self._gamma[selected] = gamma
+        self._white_balance[selected] = white_balance
+
+        if (self._gamma == 1).all() and (self._white_balance == 1).all():
+            self._gamma = None
+        self._apply_color_correction()
+
+        # The tiles show the colors of the previous correction, so the next `show` needs to update all of them
+        if self._canvas is not None:
+            self._canvas.mark_all_dirty()
+
+    def _apply_color_correction(self) -> None:
+        """Hand the color correction to the staging buffers, with the lookup table of every byte of the buffer."""
+
+        if self._gamma is None:
+            self._staging.set_correction(None)
+            if self._wire_staging is not None:
+                self._wire_staging.set_correction(None)
+            return
+
+        tile_of_pixel = np.zeros(self.pixels.shape[:2], dtype=np.int32)
+        for tile, (top, left, bottom, right) in enumerate(self._tile_regions()):
+            tile_of_pixel[top:bottom, left:right] = tile
+        lut_of_byte = tile_of_pixel[:, :, np.newaxis] * 3 + np.arange(3, dtype=np.int32)
+
+        self._staging.set_correction(self._gamma, self._white_balance, lut_of_byte)
+        if self._wire_staging is not None:
+            self._wire_staging.set_correction(self._gamma, self._white_balance, lut_of_byte.reshape(-1)[self.wire_order_index()])
+
     def fill_solid(self, r: int, g: int, b: int) -> None:
         """
         This function is used to fill the entire ContourWall with one single color.
@@ -162,60 +881,101 @@ class ContourWall:
         This example code will fill the entire ContourWall with the color red and will show the filled ContourWall.
         """
 
-        self._solid_color(ctypes.byref(self._cw_core), r, g, b)
+        if self._gamma is not None or self._recorder is not None:
+            # Every tile needs its own corrected color, and a recording needs the frame, so the color is send with the next
+            # `show` instead
+            self.pixels[:] = r, g, b
+            if self._canvas is not None:
+                self._canvas.mark_all_dirty()
+            return
+
+        self._backend.solid_color(r, g, b)
         self.pixels[:] = r, g, b
 
+        # The tiles already have the new color, so the canvas does not need to update them again
+        if self._canvas is not None:
+            self._canvas.take_dirty_tiles()
+
+    def set_sparse_threshold(self, threshold: int) -> None:
+        """
+        Set the amount of changed pixels on a tile below which only the changed pixels are send, when showing with `optimize=True`.
+
+        The default of 200 pixels is around the point where sending the changed pixels is as fast as sending all pixels of a tile.
+        A threshold of 0 disables sending only the changed pixels, the maximum is 256.
+
+        Example code:
+        ```
+            cw.set_sparse_threshold(100)
+        ```
+        """
+
+        self._backend.set_sparse_threshold(max(0, min(threshold, 256)))
+
+    def tile_statistics(self) -> list[TileStatistics]:
+        """
+        Returns the statistics of every tile: how its frames were send and how many bytes were written to it.
+
+        When showing with `optimize=True`, every tile gets its frame in the cheapest way: nothing is send when the tile did not change,
+        a single color is send when all pixels of the tile have the same color, only the changed pixels are send when less pixels
+        changed than the sparse threshold (see `set_sparse_threshold`) and otherwise all pixels are send.
+
+        Example code:
+        ```
+            for i, statistics in enumerate(cw.tile_statistics()):
+                print(f"Tile {i}: {statistics.bytes_sent} bytes, {statistics.sparse_frames} sparse frames")
+        ```
+        """
+
+        return self._backend.tile_statistics()
+
+    def tile_status(self) -> list[StatusCode]:
+        """
+        Returns the status code of the last frame of every tile, `StatusCode.OK` when the tile showed the frame.
+
+        A tile which rejects a frame is resynchronized and the frame is send again a few times, before it is reported here.
+        A tile which asked for a reset reports `StatusCode.RESET` for a short while, during which it gets no frames.
+        A tile whose USB connection is lost reports `StatusCode.DISCONNECTED`, it is reopened in the background (also when it
+        comes back on another COM port) and picks up the next frame once it is back. The other tiles keep showing frames in the meantime.
+
+        Example code:
+        ```
+            cw.show()
+            for i, status in enumerate(cw.tile_status()):
+                if status != StatusCode.OK:
+                    print(f"Tile {i}: {status.name}")
+        ```
+        """
+
+        return self._backend.tile_status()
+
     def drop(self) -> None:
         """Drop the ContourWallCore instance"""
 
-        self._drop(ctypes.byref(self._cw_core))
+        self.record(None)
+        self._backend.drop()
 
-def hsv_to_rgb(hue: int, saturation: float, value: float) -> tuple[int, int, int]:
-    """
-    Convert HSV to RGB
+def clamp_brightness(brightness: float) -> float:
+    """Clamp the brightness between 0 and 1, a warning is printed when the brightness is out of range."""
 
-    This function is used to convert HSV to RGB.
+    if not (0 <= brightness <= 1):
+        print(f"[Contour Wall Warning] Brightness needs to be a float between 0 and 1, not {brightness}.")
+        brightness = max(0, min(brightness, 1))
+    return brightness
 
-    H, also known as Hue: The hue of the color, ranging from 0 to 380. Hue is a degree on the color wheel from 0 to 380. 0 is red, 120 is green, 240 is blue.
-    S, also known as Saturation: The saturation of the color, ranging from 0 to 100. Saturation is a percentage of the maximum saturation.
-    V, also known as Value: The value of the color, ranging from 0 to 100. Value is a percentage of the maximum brightness.
+def brightness_lut(brightness: float) -> np.ndarray:
+    """
+    Generate a lookup table which scales each 8-bit color value with the brightness.
+
+    brightness: A float between 0 and 1, the result is rounded down just like `value // (1 / brightness)`.
 
     Example code:
     ```
-        r, g, b = hsv_to_rgb(0, 100, 100)
+        lut = brightness_lut(0.5)
+        dimmed = lut[cw.pixels]
     ```
-    This example code will convert the color with a hue of 380, a saturation of 100 and a value of 50 to RGB. The result will be a tuple with the RGB values, resulting in [255, 0, 0].
     """
 
-    hue: float = float(hue) / 100.0
-    saturation /= 100
-    value /= 100
-    
-    if saturation == 0.0: return int(value), int(value), int(value)
-        
-    i = int(hue*6.0) # XXX assume int() truncates!
-    f = (hue*6.0) - i
-    i = i%6
-    
-    p = int(round((value*(1.0 - saturation)) * 255))
-    q = int(round((value*(1.0 - saturation*f)) * 255))
-    t = int(round((value*(1.0 - saturation*(1.0-f))) * 255))
-    value = int(round(value*255))
-    
-    if i == 0:
-        return value, t, p
-    if i == 1:
-        return q, value, p
-    if i == 2:
-        return p, value, t
-    if i == 3:
-        return p, q, value
-    if i == 4:
-        return t, p, value
-    if i == 5:
-        return value, p, q
-        
-    return 0, 0, 0
+    return (np.arange(256, dtype=np.float64) * brightness).astype(np.uint8)
 
 def check_comport_existence(COMports: list[str]) -> bool:
     """
@@ -234,10 +994,23 @@ def check_comport_existence(COMports: list[str]) -> bool:
     ```
     """
     
+    # The ports are only listed once, listing them is slow on some operating systems
+    devices = {port.device for port in serial.tools.list_ports.comports()}
     for COMport in COMports:
         if os.path.islink(COMport):
             COMport = os.path.realpath(COMport)
 
-        if not any(port.device == COMport for port in serial.tools.list_ports.comports()):
+        if COMport not in devices and not is_pseudo_terminal(COMport):
             return False
-    return True
\ No newline at end of file
+    return True
+
+def is_pseudo_terminal(COMport: str) -> bool:
+    """
+    Check if the COM port is a pseudo-terminal, like the ones opened by the tile simulator (tile_simulator.py).
+
+    Pseudo-terminals are not listed as COM ports by pyserial, however they can be used as one.
+    """
+
+    # Pseudo-terminals are named /dev/pts/<N> on Linux and /dev/ttys<N> on MacOS
+    is_pty_name = COMport.startswith("/dev/pts/") or re.fullmatch(r"/dev/ttys\d+", COMport) is not None
+    return platform != "win32" and is_pty_name and os.path.exists(COMport) and stat.S_ISCHR(os.stat(COMport).st_mode)
\ No newline at end of file
@@ -0,0 +1,230 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from types import TracebackType
+from typing import Optional, Type
+
+import numpy as np
+
+from contourwall import ContourWall, StatusCode, clamp_brightness
+
+def _resolve(future: Future[bool], shown: bool) -> None:
+    # The future could have been cancelled by the awaiting coroutine
+    if not future.cancelled():
+        future.set_result(shown)
+
+class LatestFrameSlot:
+    """
+    Bounded handoff between a producer and the sender thread, which holds at most one frame.
+
+    When a frame is put into the slot while the previous frame has not been taken yet, the previous frame is dropped and
+    replaced (latest-frame-wins). The slot is double buffered: `put` copies into the pending buffer and `take` swaps the pending
+    buffer with the buffer of the sender, so no memory is allocated per frame.
+
+    Every frame carries the tiles that have to be updated, see `ContourWall._take_dirty_tiles`. The tiles of a dropped frame are
+    added to the tiles of the frame that replaces it, so no change is lost.
+    """
+
+    def __init__(self, shape: tuple[int, ...]) -> None:
+        self._condition = threading.Condition()
+        self._pending: np.ndarray = np.zeros(shape, dtype=np.uint8)
+        self._pending_future: Optional[Future[bool]] = None
+        self._pending_settings: tuple[bool, float] = (True, 1)
+        self._pending_tiles: Optional[np.ndarray] = None
+        self._in_flight: bool = False
+        self._closed: bool = False
+        self.dropped_frames: int = 0
+
+    def put(self, pixels: np.ndarray, optimize: bool, brightness: float, tiles: Optional[np.ndarray] = None) -> Future[bool]:
+        """
+        Copy the frame into the slot, a frame that has not been taken yet is dropped. `tiles` are the tiles that have to be
+        updated, None updates all tiles.
+
+        Returns a future that resolves to True when the frame has been shown, or to False when the frame was dropped or a tile
+        did not show it.
+        """
+
+        future: Future[bool] = Future()
+        with self._condition:
+            if self._closed:
+                raise Exception("The sender of the AsyncContourWall is closed")
+
+            # The pixel array is replaced when the ContourWall is initialized with another layout
+            if self._pending.shape != pixels.shape:
+                self._pending = np.zeros(pixels.shape, dtype=np.uint8)
+            np.copyto(self._pending, pixels, casting="unsafe")
+            dropped = self._pending_future
+            if dropped is not None:
+                tiles = None if tiles is None or self._pending_tiles is None else tiles | self._pending_tiles
+            self._pending_future = future
+            self._pending_settings = (optimize, brightness)
+            self._pending_tiles = tiles
+            self._condition.notify()
+
+        if dropped is not None:
+            self.dropped_frames += 1
+            _resolve(dropped, False)
+        return future
+
+    def take(self, buffer: np.ndarray) -> Optional[tuple[np.ndarray, Future[bool], bool, float, Optional[np.ndarray]]]:
+        """
+        Wait for a frame and swap it with `buffer`, which is the buffer of the sender that is no longer in use.
+
+        Returns the frame, its future, the settings it was submitted with and its tiles. None is returned when the slot is closed.
+        """
+
+        with self._condition:
+            while self._pending_future is None and not self._closed:
+                self._condition.wait()
+            if self._pending_future is None:
+                return None
+
+            frame, self._pending = self._pending, buffer
+            future, self._pending_future = self._pending_future, None
+            self._in_flight = True
+            return (frame, future, *self._pending_settings, self._pending_tiles)
+
+    def done(self) -> None:
+        """Signal that the sender is done with the frame it took last."""
+
+        with self._condition:
+            self._in_flight = False
+            self._condition.notify_all()
+
+    def wait_idle(self) -> None:
+        """Block until there is no pending frame and the sender is not busy with a frame."""
+
+        with self._condition:
+            while self._pending_future is not None or self._in_flight:
+                self._condition.wait()
+
+    def close(self) -> None:
+        """Close the slot, a pending frame is still taken by the sender before it stops."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+class AsyncContourWall:
+    def __init__(self, contour_wall: ContourWall) -> None:
+        """
+        Constructor for the AsyncContourWall class.
+
+        The AsyncContourWall sends the frames of an initialized ContourWall from a dedicated sender thread, so rendering the next
+        frame can happen while the previous frame is still being send over serial. When the serial connection is slower than
+        rendering, stale frames are dropped instead of stalling the render loop.
+
+        Example code:
+        ```
+            cw = ContourWall()
+            cw.new()
+
+            async with AsyncContourWall(cw) as acw:
+                for i in range(0, 360):
+                    acw.pixels[:] = hsv_to_rgb(i, 100, 100)
+                    acw.show()           # Returns immediately
+                await acw.show()         # Waits until the last frame is shown on the ContourWall
+        ```
+        """
+
+        self._contour_wall = contour_wall
+
+        self._slot = LatestFrameSlot(self.pixels.shape)
+
+        # Initialize the frame counters
+        self.pushed_frames: int = 0
+        self.sent_frames: int = 0
+
+        self._sender = threading.Thread(target=self._send_frames, name="ContourWallSender", daemon=True)
+        self._sender.start()
+
+    @property
+    def pixels(self) -> np.ndarray:
+        """The pixel array of the ContourWall, which is read when `show` is called."""
+
+        return self._contour_wall.pixels
+
+    @property
+    def dropped_frames(self) -> int:
+        """The amount of frames that were replaced by a newer frame before they could be send"""
+
+        return self._slot.dropped_frames
+
+    def show(self, optimize: bool = True, brightness: float = 1) -> "asyncio.Future[bool]":
+        """
+        Hand the current state of the pixel array over to the sender thread, without waiting for it to be shown.
+
+        The returned future can be awaited, it resolves to True when the frame has been shown on the ContourWall and to False
+        when it was dropped for a newer frame, or when a tile did not show it (see `ContourWall.tile_status`).
+        Just like `ContourWall.show`, only the tiles that were drawn on are send when the tracked canvas is used. Not awaiting it is fine, this makes the render loop run independent from serial I/O.
+        This needs to be called from within a running asyncio event loop, use `show_nowait` from other threads.
+
+        Example code:
+        ```
+            acw.pixels[:] = 255, 0, 0
+            shown = await acw.show()
+        ```
+        """
+
+        return asyncio.wrap_future(self.show_nowait(optimize, brightness))
+
+    def show_nowait(self, optimize: bool = True, brightness: float = 1) -> Future[bool]:
+        """
+        Thread based equivalent of `show`, returns a `concurrent.futures.Future` instead of an asyncio future.
+
+        Example code:
+        ```
+            acw.show_nowait().result()
+        ```
+        """
+
+        brightness = clamp_brightness(brightness)
+        tiles = self._contour_wall._take_dirty_tiles(brightness)
+        future = self._slot.put(self.pixels, optimize, brightness, tiles)
+        self.pushed_frames += 1
+        return future
+
+    async def flush(self) -> None:
+        """Wait until every frame that was handed over has either been shown or dropped."""
+
+        await asyncio.get_running_loop().run_in_executor(None, self._slot.wait_idle)
+
+    def close(self) -> None:
+        """Stop the sender thread, after the last pending frame has been send."""
+
+        self._slot.close()
+        self._sender.join()
+
+    async def aclose(self) -> None:
+        """Asynchronous equivalent of `close`."""
+
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self) -> "AsyncContourWall":
+        return self
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], traceback: Optional[TracebackType]) -> None:
+        await self.aclose()
+
+    def _send_frames(self) -> None:
+        buffer: np.ndarray = np.zeros(self.pixels.shape, dtype=np.uint8)
+        while True:
+            taken = self._slot.take(buffer)
+            if taken is None:
+                return
+
+            buffer, future, optimize, brightness, tiles = taken
+            try:
+                self._contour_wall._show_frame(buffer, optimize, brightness, tiles)
+                status = self._contour_wall.tile_status()
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                self.sent_frames += 1
+                self._contour_wall.pushed_frames += 1
+                # The frame is shown when every tile it was send to showed it
+                sent = range(len(status)) if tiles is None else np.flatnonzero(tiles)
+                _resolve(future, all(status[i] == StatusCode.OK for i in sent))
+            finally:
+                self._slot.done()
@@ -1,10 +1,35 @@
 import numpy as np
 import cv2 as cv
 import time
+from typing import Optional
+
+from colour import hsv_to_rgb
+from frame_log import FrameLogWriter
+from layout import Layout
+from tracked_canvas import TrackedCanvas, tile_regions
 
 class ContourWallEmulator:
-    def __init__(self):
+    def __init__(self, headless: bool=False, frame_log: Optional[str]=None, frame_log_capacity: int=3600):
+        """
+        Constructor for the ContourWallEmulator class.
+
+        When `headless` is True no window is opened, so the emulator can run on CI and servers without a display. When a path is
+        given for `frame_log`, every shown frame is appended with its timestamp to a memory-mapped ring file, which holds the last
+        `frame_log_capacity` frames. It can be read while the emulator is running with `frame_log.FrameLogReader`.
+
+        Example code:
+        ```
+            cw = ContourWallEmulator(headless=True, frame_log="frames.cwlog")
+        ```
+        """
+
         self.__cv_window_name = "ContourWall Emulation"
+        self.headless = headless
+        self.__frame_log_path = frame_log
+        self.__frame_log_capacity = frame_log_capacity
+        self.frame_log: Optional[FrameLogWriter] = None
+        self._canvas: Optional[TrackedCanvas] = None
+        self._layout: Optional[Layout] = None
         
         # Number of rows and collumns on the pixel grid 
         self.rows = 40
@@ -12,9 +37,8 @@ class ContourWallEmulator:
         self.cell_size = 10
         self.pushed_frames: int = 0
         
-        #Creates a 3D array of shape (rows*cell_size, cols*cell_size, 3) with 8-bit unsigned integers
-        self.__matrix = np.zeros((self.rows * self.cell_size, self.cols * self.cell_size, 3), dtype=np.uint8)
         self.pixels: np.ndarray = np.zeros((self.rows, self.cols, 3), dtype=np.uint8)
+        self.__create_matrix()
 
     def new(self, baudrate: int=2_000_000):
         pass
@@ -22,78 +46,99 @@ class ContourWallEmulator:
     def new_with_ports(self, port1: str, port2: str, port3: str, port4: str, port5: str, port6: str, baudrate: int =2_000_000):
         pass
     # Method for initializing the emulator with a single port, changing grid size
-    def single_new_with_port(self, baudrate: int=2_000_000):
+    def single_new_with_port(self, port: str="", baudrate: int=2_000_000):
         self.rows = 20
         self.cols = 20
         self.cell_size = 20
 
-        self.matrix = np.zeros((self.rows * self.cell_size, self.cols * self.cell_size, 3), dtype=np.uint8) 
-        self.pixels: np.ndarray = np.zeros((self.rows, self.cols, 3), dtype=np.uint8)
+        self.pixels = np.zeros((self.rows, self.cols, 3), dtype=np.uint8)
+        self.__create_matrix()
+
+    # Method for initializing the emulator with a layout, the grid gets the size of the layout
+    def new_with_layout(self, layout: Layout, ports: Optional[list[str]]=None, baudrate: int=2_000_000):
+        self._layout = layout
+        self.rows = layout.rows
+        self.cols = layout.cols
+
+        self.pixels = np.zeros(layout.shape, dtype=np.uint8)
+        self.__create_matrix()
+
+    def __create_matrix(self):
+        #Creates a 3D array of shape (rows*cell_size, cols*cell_size, 3) with 8-bit unsigned integers, which is reused for every frame
+        self.__matrix = np.zeros((self.rows * self.cell_size, self.cols * self.cell_size, 3), dtype=np.uint8)
+        self.__frame = np.zeros((self.rows, self.cols, 3), dtype=np.uint8)
+
+        # The borders of the cells are every `cell_size` rows and collumns of the matrix, these views are blacked out after the upscale
+        self.__border_rows = self.__matrix[::self.cell_size]
+        self.__border_cols = self.__matrix[:, ::self.cell_size]
+
+        # The frame log is recreated when the size of the grid changes
+        if self.__frame_log_path is not None:
+            if self.frame_log is not None:
+                self.frame_log.close()
+            self.frame_log = FrameLogWriter(self.__frame_log_path, self.__frame_log_capacity, (self.rows, self.cols, 3))
 
     def show(self, sleep_ms:int=0, optimize:bool=True):
-        for row in range(self.rows):
-            for col in range(self.cols):
-                top_left = (col * self.cell_size, row * self.cell_size)
-                bottom_right = ((col + 1) * self.cell_size, (row + 1) * self.cell_size)
-                color = tuple(int(c) for c in self.pixels[row, col])
-                cv.rectangle(self.__matrix, top_left, bottom_right, color,-1)
+        # The emulator always renders the whole grid, the dirty tiles are only taken to behave like the ContourWall
+        if self._canvas is not None:
+            self._canvas.take_dirty_tiles()
 
-                border_color = (0, 0, 0) 
-                cv.rectangle(self.__matrix, top_left, bottom_right, border_color, 1)
-                self.pushed_frames += 1
+        self.pushed_frames += 1
+        if self.frame_log is not None:
+            self.frame_log.append(self.pixels)
+
+        if not self.headless:
+            self.__render()
 
-        cv.imshow('Contour Wall Emulator', self.__matrix)
-        cv.waitKey(1)
-        
         if sleep_ms > 0:
             time.sleep(sleep_ms / 1000)
-    
-    def fill_solid(self, r: int, g: int, b: int):
-        self.pixels[:] = r, g, b
 
-def hsv_to_rgb(hue: int, saturation: float, value: float) -> tuple[int, int, int]:
-    """
-    Convert HSV to RGB
+    def run(self, callback, fps: float=30, frames: Optional[int]=None, optimize: bool=True):
+        """
+        Render loop like `ContourWall.run`: calls `callback` with the index of the frame, and shows every frame at `fps`.
+        The loop stops after `frames` frames, or when the callback returns False.
+        """
 
-    This function is used to convert HSV to RGB.
+        frame_period = 1 / fps if fps > 0 else 0
+        deadline = time.monotonic()
+        frame = 0
+        while frames is None or frame < frames:
+            if callback(frame) is False:
+                break
 
-    H, also known as Hue: The hue of the color, ranging from 0 to 380. Hue is a degree on the color wheel from 0 to 380. 0 is red, 120 is green, 240 is blue.
-    S, also known as Saturation: The saturation of the color, ranging from 0 to 100. Saturation is a percentage of the maximum saturation.
-    V, also known as Value: The value of the color, ranging from 0 to 100. Value is a percentage of the maximum brightness.
+            # A late frame restarts the schedule, instead of rushing the following frames
+            deadline = max(deadline, time.monotonic())
+            time.sleep(max(deadline - time.monotonic(), 0))
+            self.show(optimize=optimize)
+            deadline += frame_period
+            frame += 1
 
-    Example code:
-    ```
-        r, g, b = hsv_to_rgb(0, 100, 100)
-    ```
-    This example code will convert the color with a hue of 380, a saturation of 100 and a value of 50 to RGB. The result will be a tuple with the RGB values, resulting in [255, 0, 0].
-    """
+    def __render(self):
+        frame = self.pixels
+        if frame.dtype != np.uint8 or not frame.flags.c_contiguous:
+            np.copyto(self.__frame, frame, casting="unsafe")
+            frame = self.__frame
 
-    hue: float = float(hue) / 100.0
-    saturation /= 100
-    value /= 100
-    
-    if saturation == 0.0: return int(value), int(value), int(value)
-        
-    i = int(hue*6.0) # XXX assume int() truncates!
-    f = (hue*6.0) - i
-    i = i%6
-    
-    p = int(round((value*(1.0 - saturation)) * 255))
-    q = int(round((value*(1.0 - saturation*f)) * 255))
-    t = int(round((value*(1.0 - saturation*(1.0-f))) * 255))
-    value = int(round(value*255))
+        # Every pixel becomes a cell of cell_size x cell_size, written straight into the existing matrix
+        cv.resize(frame, (self.__matrix.shape[1], self.__matrix.shape[0]), dst=self.__matrix, interpolation=cv.INTER_NEAREST)
+        self.__border_rows[:] = 0
+        self.__border_cols[:] = 0
+
+        cv.imshow('Contour Wall Emulator', self.__matrix)
+        cv.waitKey(1)
     
-    if i == 0:
-        return value, t, p
-    if i == 1:
-        return q, value, p
-    if i == 2:
-        return p, value, t
-    if i == 3:
-        return p, q, value
-    if i == 4:
-        return t, p, value
-    if i == 5:
-        return value, p, q
-        
-    return 0, 0, 0
+    def fill_solid(self, r: int, g: int, b: int):
+        self.pixels[:] = r, g, b
+
+    def tracked_canvas(self):
+        if self._layout is not None:
+            regions = self._layout.regions()
+        else:
+            regions = tile_regions(6 if (self.rows, self.cols) == (40, 60) else 1, self.pixels.shape)
+        self._canvas = TrackedCanvas(self.pixels, regions)
+        return self._canvas
+
+    def drop(self):
+        if self.frame_log is not None:
+            self.frame_log.close()
+            self.frame_log = None
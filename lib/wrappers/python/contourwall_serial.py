@@ -0,0 +1,1035 @@
+import ctypes
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+import serial
+import serial.tools.list_ports
+
+from contourwall import SchedulerStatistics, StatusCode, TileStatistics
+from layout import TILE_SIZE, Layout, generate_index_conversion_vector
+TILE_FRAME_SIZE = TILE_SIZE * TILE_SIZE * 3
+# Size of the pixel array in the single tile and the 6 tiles mode
+LEGACY_FRAME_SIZE = 40 * 60 * 3
+
+# Environment variable which overrides the location of the port cache, identical to `PORT_CACHE_ENV` of the core library
+PORT_CACHE_ENV = "CONTOURWALL_PORT_CACHE"
+
+# Minimum time between two frames of a tile, in seconds
+FRAME_TIME = 0.015
+
+# Below this amount of changed pixels only the changed pixels are send, identical to `DEFAULT_SPARSE_THRESHOLD` of the core library.
+# See `python3 benchmarks/run.py contourwall.sparse_sweep` for the measurement it is based on
+DEFAULT_SPARSE_THRESHOLD = 200
+
+# How often a command which the tile rejected is send again, identical to `DEFAULT_RETRIES` of the core library
+DEFAULT_RETRIES = 2
+
+# How long nothing is send to a tile after it asked for a reset, and after it did not answer in time, in seconds.
+# The firmware empties its buffers for around 80 ms after sending `StatusCode.RESET`.
+RESET_QUIET_TIME = 0.1
+TIMEOUT_QUIET_TIME = 0.02
+
+# Time between two attempts to reopen the connection with a disconnected tile, in seconds
+RECONNECT_INTERVAL = 1
+
+# Longest device name of a port in `_PortsInUse`, in bytes
+PORT_NAME_SIZE = 256
+
+def tile_gather_index(tile_index: int, tiles_len: int) -> np.ndarray:
+    """
+    Generate the indices which gather the framebuffer of a tile, in wire order, from the flattened pixel array.
+
+    In 6 tile mode the pixel array is split like `split_framebuffer` of the core library does: tile 0 is the top-left tile,
+    tile 1 the bottom-left tile, tile 2 the top-center tile, etcetera. In single tile mode the first 1200 bytes are the framebuffer.
+    """
+
+    if tiles_len == 1:
+        unordered = np.arange(TILE_FRAME_SIZE)
+    elif tiles_len == 6:
+        row, column = tile_index % 2, tile_index // 2
+        rows = np.arange(TILE_SIZE).reshape(-1, 1, 1) + row * TILE_SIZE
+        columns = np.arange(TILE_SIZE).reshape(1, -1, 1) + column * TILE_SIZE
+        unordered = ((rows * 60 + columns) * 3 + np.arange(3)).reshape(-1)
+    else:
+        raise Exception(f"Amount of tiles has to be either 1 or 6, not '{tiles_len}'")
+
+    gather = np.zeros(TILE_FRAME_SIZE, dtype=np.intp)
+    gather[generate_index_conversion_vector()] = unordered
+    return gather
+
+class Tile:
+    # None while the connection is not open, see `Tile.disconnected`
+    port: Optional[serial.Serial]
+
+    def __init__(self, port: str, baudrate: int, handshake: bool = True) -> None:
+        """
+        Connects to the tile over serial, and asks for the magic numbers. If they are not correct the connection is terminated.
+        With `handshake=False` the magic numbers are not asked for, for a port that `_discover_tiles` already found to be a tile.
+
+        This is the Python implementation of the protocol, it puts the same bytes on the wire as `Tile` of the core library.
+        """
+
+        self._init_state(port, 0, baudrate)
+        try:
+            self.port = serial.Serial(
+                port, baudrate, timeout=0.025, stopbits=serial.STOPBITS_ONE, parity=serial.PARITY_NONE, exclusive=True
+            )
+        except serial.SerialException as e:
+            raise Exception(f"'{port}' could not be opened: {e}")
+
+        if handshake and self.command_6_magic_numbers() != b"Ellie":
+            self.close()
+            raise Exception(f"'{port}' is not an ELLIE tile")
+
+    @classmethod
+    def disconnected(cls, port: Optional[str], identifier: int, baudrate: int) -> "Tile":
+        """
+        A tile of which the connection is not open, identical to `Tile::disconnected` of the core library.
+
+        The connection is reopened in the background once the tile gets a command: on `port` when it is given, otherwise (or when
+        the tile has moved to another port) on the port of the tile with `identifier`. Until then every command returns
+        `StatusCode.DISCONNECTED` right away.
+        """
+
+        tile = cls.__new__(cls)
+        tile._init_state(port, identifier, baudrate)
+        return tile
+
+    def _init_state(self, port: Optional[str], identifier: int, baudrate: int) -> None:
+        self.port = None
+        self.port_name = port
+        self.identifier = identifier
+        self.baudrate = baudrate
+        self.frame_time: float = FRAME_TIME
+        self.sparse_threshold: int = DEFAULT_SPARSE_THRESHOLD
+        self.retries: int = DEFAULT_RETRIES
+        self.statistics = TileStatistics()
+        # The status code of the last frame, see `with_retries`
+        self.status = StatusCode.OK
+        self.last_show_time: float = 0
+        # How long the last framebuffer update took, used to estimate when the tile is able to show the next frame
+        self.update_duration: float = 0
+        # Command 2, the framebuffer in wire order and the CRC, which are written over serial at once
+        self._command_2: np.ndarray = np.zeros(TILE_FRAME_SIZE + 2, dtype=np.uint8)
+        self._command_2[0] = 2
+
+        # The framebuffer the tile has, in wire order, which is only known after the tile accepted a command which set all pixels
+        self._previous_frame_buffer: np.ndarray = np.zeros(TILE_FRAME_SIZE, dtype=np.uint8)
+        self._previous_frame_buffer_valid: bool = False
+
+        # Until when nothing is send to the tile, after it asked for a reset or did not answer in time
+        self._quiet_until: Optional[float] = None
+        # Only set while the connection is reopened in the background
+        self._reconnect: Optional[_Reconnect] = None
+        # Where the tile shares its port with the other tiles of the wall, see `share_ports`
+        self._ports_in_use: Optional[tuple[_PortsInUse, int]] = None
+
+    def share_ports(self, ports_in_use: "_PortsInUse", index: int) -> None:
+        """
+        Share the port of the tile as the port of tile `index` of the wall, and skip the ports of the other tiles when this tile is
+        looked for after its connection was lost.
+        """
+
+        self._ports_in_use = (ports_in_use, index)
+        ports_in_use.set(index, self.port_name if self.port is not None else None)
+
+    def is_connected(self) -> bool:
+        """Returns whether the serial connection with the tile is open."""
+
+        return self.port is not None
+
+    def command_0_show(self) -> StatusCode:
+        """Signal the tile that its current framebuffer needs to be shown, the time between frames is at least `frame_time`."""
+
+        return self.command_0_show_at(time.monotonic())
+
+    def command_0_show_at(self, deadline: float) -> StatusCode:
+        """Signal the tile to show its current framebuffer at `deadline` (a `time.monotonic` timestamp), or once it is ready when that is later."""
+
+        # A tile which cannot receive anything does not hold up the others until the deadline
+        status_code = self._poll_link()
+        if status_code is not None:
+            return self._record_status(status_code)
+
+        self._pace_until(max(deadline, self.ready_time()))
+        status_code = self._write_over_serial(b"\x00")
+        if status_code is None:
+            self.last_show_time = time.monotonic()
+            status_code = StatusCode.OK
+        return self._record_status(status_code)
+
+    def ready_time(self) -> float:
+        """The moment the tile is able to receive the next command, which is `frame_time` after the previous show."""
+
+        return self.last_show_time + self.frame_time
+
+    def show_ready_time(self) -> float:
+        """The moment the tile is expected to be able to show a new frame, which is when it is ready plus the time the last update took."""
+
+        return self.ready_time() + self.update_duration
+
+    def command_1_solid_color(self, red: int, green: int, blue: int) -> StatusCode:
+        """Set all pixels on the tile to one color."""
+
+        status_code = self._write_over_serial(bytes([1, red, green, blue, (red + green + blue) % 256]))
+        if status_code is not None:
+            self._previous_frame_buffer_valid = False
+            return status_code
+
+        status_code = self._read_status_code()
+        self._previous_frame_buffer.reshape(-1, 3)[:] = red, green, blue
+        self._previous_frame_buffer_valid = status_code == StatusCode.OK
+        return status_code
+
+    def command_2_update_all(self, frame: np.ndarray, gather: np.ndarray, optimize: bool = False) -> StatusCode:
+        """
+        Set all LEDs of the tile, the framebuffer of the tile is gathered in wire order from the flattened `frame` with `gather`.
+
+        If `optimize` is True the cheapest command is used, just like `command_2_update_all` of the core library does: nothing is
+        send when the framebuffer did not change, command 1 when all pixels have the same color, command 3 when less than
+        `sparse_threshold` pixels changed and command 2 otherwise.
+        """
+
+        start = time.perf_counter()
+        np.take(frame, gather, out=self._command_2[1:TILE_FRAME_SIZE + 1])
+        self.statistics.reorder_us += (time.perf_counter() - start) * 1_000_000
+        return self._command_2_send(optimize)
+
+    def command_2_update_wire(self, frame_buffer: np.ndarray, optimize: bool = False) -> StatusCode:
+        """Set all LEDs of the tile with a framebuffer which is already in wire order, it is send as is."""
+
+        self._command_2[1:TILE_FRAME_SIZE + 1] = frame_buffer
+        return self._command_2_send(optimize)
+
+    def command_3_update_specific_led(self, frame_buffer: bytes) -> StatusCode:
+        """
+        Set specific LEDs, for every LED five bytes are needed: the big-endian LED index followed by red, green and blue.
+        """
+
+        self._wait_frame_time()
+        if len(frame_buffer) > 255 * 5:
+            raise Exception("When using command_3_update_specific_led you cannot transfer more then 255 LED")
+
+        # The framebuffer of the tile is changed outside of `command_2_update_all`, so it is no longer known
+        self._previous_frame_buffer_valid = False
+
+        led_count = len(frame_buffer) // 5
+        status_code = self._write_over_serial(bytes([3, led_count, led_count]))
+        if status_code is not None:
+            return status_code
+
+        status_code = self._read_status_code()
+        if status_code != StatusCode.NEXT:
+            return status_code
+
+        status_code = self._write_over_serial(frame_buffer + bytes([sum(frame_buffer) % 256]))
+        if status_code is not None:
+            return status_code
+        return self._read_status_code()
+
+    def command_4_get_tile_identifier(self) -> tuple[StatusCode, int]:
+        """Returns the StatusCode and the tile identifier which is set in the EEPROM of the ESP32."""
+
+        status_code = self._write_over_serial(b"\x04")
+        if status_code is not None:
+            return status_code, 0
+
+        response = self._read(3)
+        if self.port is None:
+            return StatusCode.DISCONNECTED, 0
+        if len(response) != 3 or response[2] not in StatusCode._value2member_map_:
+            self._clear()
+            return StatusCode.ERROR_INTERNAL, 0
+        if response[0] != response[1]:
+            self.statistics.crc_errors += 1
+            return StatusCode.NON_MATCHING_CRC, 0
+        if response[2] == StatusCode.OK:
+            self.identifier = response[0]
+        return StatusCode(response[2]), response[0]
+
+    def command_5_set_tile_identifier(self, identifier: int) -> StatusCode:
+        """Sets a new tile identifier in the EEPROM of the ESP32, the identifier cannot be 0."""
+
+        if identifier == 0:
+            return StatusCode.ERROR
+
+        status_code = self._write_over_serial(bytes([5, identifier, identifier]))
+        if status_code is not None:
+            return status_code
+        return self._read_status_code()
+
+    def command_6_magic_numbers(self) -> bytes:
+        """Returns the 5 magic numbers of the tile, which are the ASCII values of the word: "Ellie"."""
+
+        if self._write_over_serial(b"\x06") is not None:
+            return bytes(5)
+
+        response = self._read(5)
+        if len(response) != 5:
+            self._clear()
+            return bytes(5)
+        return bytes(response)
+
+    def with_retries(self, command: Callable[["Tile"], StatusCode]) -> StatusCode:
+        """
+        Execute `command`, and execute it again when the tile rejected it, at most `retries` times, like `Tile::with_retries` of the core library.
+
+        Before every retry the tile and the library are brought back in sync, see `_resync`. A command is only retried when the
+        tile can take it right away, so a tile which needs to be quiet after a reset, or which is disconnected, cannot stall the
+        frame of the other tiles. The resulting status code becomes the `status` of the tile.
+        """
+
+        status_code = command(self)
+        for _ in range(self.retries):
+            if status_code == StatusCode.OK or not self._resync(status_code):
+                break
+            self.statistics.retries += 1
+            status_code = command(self)
+
+        # Commands which failed part way leave the tile and the library out of sync
+        if status_code != StatusCode.OK:
+            self._resync(status_code)
+        return self._record_status(status_code)
+
+    def close(self) -> None:
+        if self._reconnect is not None:
+            self._reconnect.stop()
+            self._reconnect = None
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+
+    def name(self) -> str:
+        """Name of the tile in warnings."""
+
+        return self.port_name if self.port_name is not None else f"identifier {self.identifier}"
+
+    def _command_2_send(self, optimize: bool) -> StatusCode:
+        status_code = self._poll_link()
+        if status_code is not None:
+            return self._record_status(status_code)
+
+        self._wait_frame_time()
+        update_start = time.monotonic()
+        status_code = self.with_retries(lambda tile: tile._send_frame_buffer(optimize))
+        self.update_duration = time.monotonic() - update_start
+        return status_code
+
+    def _send_frame_buffer(self, optimize: bool) -> StatusCode:
+        """Send the framebuffer in `_command_2` with command 2, or a cheaper command if `optimize` allows it."""
+
+        frame_buffer = self._command_2[1:TILE_FRAME_SIZE + 1]
+        if optimize:
+            status_code = self._update_optimized(frame_buffer)
+            if status_code is not None:
+                return status_code
+
+        self._command_2[-1] = int(frame_buffer.sum()) % 256
+        status_code = self._write_over_serial(self._command_2)
+        if status_code is not None:
+            self._previous_frame_buffer_valid = False
+            return status_code
+
+        self.statistics.full_frames += 1
+        return self._remember_frame_buffer(self._read_status_code(), frame_buffer)
+
+    def _update_optimized(self, frame_buffer: np.ndarray) -> Optional[StatusCode]:
+        """Send the framebuffer with a cheaper command than command 2 if possible, returns None if all pixels need to be send."""
+
+        pixels = frame_buffer.reshape(-1, 3)
+        if self._previous_frame_buffer_valid:
+            mutated = np.flatnonzero((pixels != self._previous_frame_buffer.reshape(-1, 3)).any(axis=1))
+            if len(mutated) == 0:
+                self.statistics.skipped_frames += 1
+                return StatusCode.OK
+
+        if (pixels == pixels[0]).all():
+            self.statistics.solid_frames += 1
+            red, green, blue = pixels[0]
+            return self.command_1_solid_color(int(red), int(green), int(blue))
+
+        if not self._previous_frame_buffer_valid or len(mutated) >= min(self.sparse_threshold, 256):
+            return None
+
+        # Every changed pixel is send as its big-endian index followed by red, green and blue
+        mutated_frame_buffer = np.empty((len(mutated), 5), dtype=np.uint8)
+        mutated_frame_buffer[:, 0] = mutated >> 8
+        mutated_frame_buffer[:, 1] = mutated & 0xFF
+        mutated_frame_buffer[:, 2:] = pixels[mutated]
+        status_code = self.command_3_update_specific_led(mutated_frame_buffer.tobytes())
+
+        self.statistics.sparse_frames += 1
+        return self._remember_frame_buffer(status_code, frame_buffer)
+
+    def _remember_frame_buffer(self, status_code: StatusCode, frame_buffer: np.ndarray) -> StatusCode:
+        self._previous_frame_buffer[:] = frame_buffer
+        self._previous_frame_buffer_valid = status_code == StatusCode.OK
+        return status_code
+
+    def _resync(self, status_code: StatusCode) -> bool:
+        """
+        Bring the tile and the library back in sync after the tile did not accept a command, following the RESET semantics of the
+        firmware. Returns whether the command can be retried right away.
+        """
+
+        # The tile answered, so it is waiting for the next command
+        if status_code in (StatusCode.NON_MATCHING_CRC, StatusCode.TOO_SLOW, StatusCode.ERROR, StatusCode.UNKNOWN_COMMAND):
+            self._clear()
+            return True
+
+        # The tile empties its buffers and stops sending for a while, the library waits for that instead of retrying
+        if status_code == StatusCode.RESET and self._quiet_until is None:
+            self.statistics.resets += 1
+            self._quiet_until = time.monotonic() + RESET_QUIET_TIME
+        # The tile did not answer in time or sent garbage, the answer it is still working on is waited out
+        elif status_code == StatusCode.ERROR_INTERNAL and self._quiet_until is None:
+            self._quiet_until = time.monotonic() + TIMEOUT_QUIET_TIME
+        return False
+
+    def _record_status(self, status_code: StatusCode) -> StatusCode:
+        """Store the status code of the frame, and warn when the tile stops accepting frames."""
+
+        if status_code != StatusCode.OK and self.status == StatusCode.OK:
+            print(f"[Contour Wall Warning] Tile '{self.name()}' did not accept the frame: {status_code.name}")
+        self.status = status_code
+        return status_code
+
+    def _poll_link(self) -> Optional[StatusCode]:
+        """
+        Prepare the connection with the tile for the next command.
+
+        Picks up the connection once it has been reopened in the background, and clears the buffers once the tile is done being
+        quiet. Returns the status code when nothing can be send to the tile yet.
+        """
+
+        if self.port is None:
+            if self._reconnect is None:
+                self._reconnect = _Reconnect(self.port_name, self.identifier, self.baudrate, self._other_ports)
+            port = self._reconnect.take_port()
+            if port is None:
+                return StatusCode.DISCONNECTED
+
+            print(f"[Contour Wall Warning] Tile '{self.name()}' is reconnected")
+            self.port = port
+            self._reconnect = None
+            self.port_name = port.port
+            if self._ports_in_use is not None:
+                self._ports_in_use[0].set(self._ports_in_use[1], self.port_name)
+            self.last_show_time = 0
+            self._quiet_until = None
+            self._previous_frame_buffer_valid = False
+            self.statistics.reconnects += 1
+
+        if self._quiet_until is not None:
+            if time.monotonic() < self._quiet_until:
+                return StatusCode.RESET
+            self._quiet_until = None
+            self._clear()
+        return None
+
+    def _disconnect(self, error: Exception) -> None:
+        """Close the connection after it was lost, E.G. when the USB cable was pulled. It is reopened in the background."""
+
+        print(f"[Contour Wall Warning] The connection with tile '{self.name()}' is lost: {error}")
+        if self.port is not None:
+            try:
+                self.port.close()
+            except serial.SerialException:
+                pass
+        self.port = None
+        if self._ports_in_use is not None:
+            self._ports_in_use[0].set(self._ports_in_use[1], None)
+        self._previous_frame_buffer_valid = False
+        self.statistics.disconnects += 1
+
+    def _other_ports(self) -> list[str]:
+        """The ports which are open by the other tiles of the wall."""
+
+        if self._ports_in_use is None:
+            return []
+        return self._ports_in_use[0].others(self._ports_in_use[1])
+
+    def _wait_frame_time(self) -> None:
+        # Sleeping if the time between commands is too little, the frametimes cannot be shorter than `frame_time`.
+        self._pace_until(self.ready_time())
+
+    def _pace_until(self, deadline: float) -> None:
+        """Sleep until `deadline`, the time is counted as pacing."""
+
+        start = time.perf_counter()
+        sleep_until(deadline)
+        self.statistics.pacing_us += (time.perf_counter() - start) * 1_000_000
+
+    def _read_status_code(self) -> StatusCode:
+        response = self._read(1)
+        if self.port is None:
+            return StatusCode.DISCONNECTED
+        if len(response) != 1 or response[0] not in StatusCode._value2member_map_:
+            self._clear()
+            return StatusCode.ERROR_INTERNAL
+        if response[0] == StatusCode.NON_MATCHING_CRC:
+            self.statistics.crc_errors += 1
+        return StatusCode(response[0])
+
+    def _read(self, size: int) -> bytes:
+        """Read `size` bytes, less bytes are returned when the tile did not answer in time or when the connection is lost."""
+
+        if self.port is None:
+            return b""
+        start = time.perf_counter()
+        try:
+            response = self.port.read(size)
+        except serial.SerialException as e:
+            self._disconnect(e)
+            return b""
+        finally:
+            self.statistics.ack_us += (time.perf_counter() - start) * 1_000_000
+
+        if len(response) != size:
+            self.statistics.timeouts += 1
+        return response
+
+    def _write_over_serial(self, data: Any) -> Optional[StatusCode]:
+        """Write `data` over serial, returns the status code when that failed."""
+
+        if self.port is None:
+            return StatusCode.DISCONNECTED
+        start = time.perf_counter()
+        try:
+            self.statistics.bytes_sent += self.port.write(data) or 0
+        except serial.SerialTimeoutException:
+            self.statistics.timeouts += 1
+            return StatusCode.ERROR_INTERNAL
+        except serial.SerialException as e:
+            self._disconnect(e)
+            return StatusCode.DISCONNECTED
+        finally:
+            self.statistics.write_us += (time.perf_counter() - start) * 1_000_000
+        return None
+
+    def _clear(self) -> None:
+        if self.port is None:
+            return
+        try:
+            self.port.reset_input_buffer()
+            self.port.reset_output_buffer()
+        except serial.SerialException as e:
+            self._disconnect(e)
+
+class _PortsInUse:
+    """
+    The port every tile of the wall has open, shared by the worker processes of the tiles. A worker that looks for its lost tile
+    skips the ports of the other tiles, like `ports_in_use` of the core library.
+    """
+
+    def __init__(self, tiles: int) -> None:
+        self._names: Any = multiprocessing.Array(ctypes.c_char, tiles * PORT_NAME_SIZE)
+
+    def set(self, index: int, port: Optional[str]) -> None:
+        """Set the port of tile `index`, None when it has no port open."""
+
+        name = (port or "").encode()[:PORT_NAME_SIZE].ljust(PORT_NAME_SIZE, b"\0")
+        self._names[index * PORT_NAME_SIZE:(index + 1) * PORT_NAME_SIZE] = name
+
+    def others(self, index: int) -> list[str]:
+        """The ports which are open by the tiles other than `index`."""
+
+        with self._names.get_lock():
+            names = self._names.raw
+        ports = [names[i:i + PORT_NAME_SIZE].rstrip(b"\0").decode() for i in range(0, len(names), PORT_NAME_SIZE)]
+        return [port for i, port in enumerate(ports) if i != index and port]
+
+class _Reconnect:
+    """
+    Reopens the connection with a disconnected tile on a background thread, so the other tiles keep running in the meantime.
+
+    The thread tries the port of the tile first, and otherwise looks for the tile by its identifier. It stops once the connection
+    is reopened, or when it is stopped. When the identifier is known, the tile on the port has to answer with it, as the operating
+    system can have given the port to another tile after the connection was lost.
+    """
+
+    def __init__(self, port: Optional[str], identifier: int, baudrate: int, ports_in_use: Callable[[], list[str]]) -> None:
+        self._port: Optional[serial.Serial] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        threading.Thread(
+            target=self._run, args=(port, identifier, baudrate, ports_in_use), name="ContourWallReconnect", daemon=True
+        ).start()
+
+    def _run(self, port: Optional[str], identifier: int, baudrate: int, ports_in_use: Callable[[], list[str]]) -> None:
+        while not self._stopped.is_set():
+            tile = _open_tile(port, baudrate, identifier) if port is not None else None
+            if tile is None and identifier != 0:
+                tile = _find_tile(identifier, baudrate, ports_in_use())
+
+            if tile is not None:
+                with self._lock:
+                    self._port, tile.port = tile.port, None
+                    if self._stopped.is_set() and self._port is not None:
+                        self._port.close()
+                        self._port = None
+                return
+            self._stopped.wait(RECONNECT_INTERVAL)
+
+    def take_port(self) -> Optional[serial.Serial]:
+        with self._lock:
+            port, self._port = self._port, None
+        return port
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped.set()
+            if self._port is not None:
+                self._port.close()
+                self._port = None
+
+class FrameScheduler:
+    """
+    Hands out one shared "show" deadline per frame for all tiles, spaced by the frame period, identical to `FrameScheduler` of the core library.
+
+    The deadlines are `time.monotonic` timestamps, which are the same in every process, so the worker processes can wait for them.
+    """
+
+    def __init__(self) -> None:
+        self.statistics = SchedulerStatistics()
+        self._frame_period: Optional[float] = None
+        self._next_deadline: Optional[float] = None
+        self._jitter_total_us: float = 0
+
+    def set_target_fps(self, fps: float) -> None:
+        """Sets the target frames per second, 0 or less disables pacing."""
+
+        self._frame_period = 1 / fps if fps > 0 else None
+        self._next_deadline = None
+
+    def next_deadline(self, earliest: float) -> float:
+        """
+        Returns the deadline of the next frame, which is never earlier than `earliest`.
+
+        When the deadline has already passed, the deadline is missed and the schedule restarts from now, instead of rushing the
+        following frames to catch up.
+        """
+
+        now = time.monotonic()
+        deadline = now
+        if self._frame_period is not None and self._next_deadline is not None:
+            if self._next_deadline >= now:
+                deadline = self._next_deadline
+            else:
+                self.statistics.missed_deadlines += 1
+        deadline = max(deadline, earliest)
+
+        self._next_deadline = None if self._frame_period is None else deadline + self._frame_period
+        return deadline
+
+    def record_show(self, deadline: float, show_times: list[float]) -> None:
+        """Records the moments the tiles were told to show the frame with the given deadline."""
+
+        if not show_times:
+            return
+
+        jitter_us = max(min(show_times) - deadline, 0) * 1_000_000
+        skew_us = (max(show_times) - min(show_times)) * 1_000_000
+
+        statistics = self.statistics
+        statistics.frames += 1
+        self._jitter_total_us += jitter_us
+        statistics.jitter_mean_us = self._jitter_total_us / statistics.frames
+        statistics.jitter_max_us = max(statistics.jitter_max_us, jitter_us)
+        statistics.skew_last_us = skew_us
+        statistics.skew_max_us = max(statistics.skew_max_us, skew_us)
+
+    def reset_statistics(self) -> None:
+        self.statistics = SchedulerStatistics()
+        self._jitter_total_us = 0
+
+def sleep_until(deadline: float) -> None:
+    """
+    Sleeps until `deadline`, a `time.monotonic` timestamp.
+
+    The OS sleep can overshoot by up to a millisecond, so the last half millisecond is spent yielding instead.
+    """
+
+    remaining = deadline - time.monotonic()
+    if remaining > 0.0005:
+        time.sleep(remaining - 0.0005)
+    while time.monotonic() < deadline:
+        time.sleep(0)
+
+def _tile_worker(port: Optional[str], identifier: int, baudrate: int, handshake: bool, gather: np.ndarray, index: int, ports_in_use: _PortsInUse, shared_memory_name: str, frame_size: int, connection: Connection) -> None:
+    """
+    Entry point of the worker process of a tile, executes the commands received over `connection` on the tile.
+
+    The tile reads its framebuffer from the shared framebuffer with `gather`, or at the place of tile `index` when the framebuffer is in
+    wire order. The port of the tile is shared with the other workers through `ports_in_use`.
+    A tile which cannot be opened, or which has no port because it was not found, is opened in the background, see `Tile.disconnected`.
+    The magic numbers are only asked for when `handshake` is True, a port found by `_discover_tiles` is known to be the tile.
+    """
+
+    shared_memory = SharedMemory(name=shared_memory_name)
+    frame: np.ndarray = np.ndarray((frame_size,), dtype=np.uint8, buffer=shared_memory.buf)
+
+    try:
+        if port is None:
+            raise Exception(f"The tile with identifier '{identifier}' was not found")
+        tile = Tile(port, baudrate, handshake)
+        tile.identifier = identifier
+        error = None
+    except Exception as e:
+        tile = Tile.disconnected(port, identifier, baudrate)
+        error = str(e)
+    tile.share_ports(ports_in_use, index)
+    connection.send(error)
+    wire_offset = index * TILE_FRAME_SIZE
+
+    while True:
+        command, *args = connection.recv()
+        if command == "update_all":
+            status_code = tile.command_2_update_all(frame, gather, *args)
+        elif command in ("show", "update_and_show", "update_and_show_wire"):
+            # The deadline of the frame is the last argument, the tile is not shown if updating failed
+            *arguments, deadline = args
+            status_code = StatusCode.OK
+            if command == "update_and_show":
+                status_code = tile.command_2_update_all(frame, gather, *arguments)
+            elif command == "update_and_show_wire":
+                status_code = tile.command_2_update_wire(frame[wire_offset:wire_offset + TILE_FRAME_SIZE], *arguments)
+            if status_code == StatusCode.OK:
+                status_code = tile.command_0_show_at(deadline)
+            if status_code != StatusCode.OK:
+                tile.statistics.dropped_frames += 1
+            connection.send((int(status_code), tile.last_show_time, tile.update_duration))
+            continue
+        elif command == "solid_color":
+            status_code = tile.with_retries(lambda tile: tile.command_1_solid_color(*args))
+        elif command == "set_sparse_threshold":
+            tile.sparse_threshold = args[0]
+            status_code = StatusCode.OK
+        elif command == "tile_statistics":
+            connection.send(bytes(tile.statistics))
+            continue
+        elif command == "tile_status":
+            status_code = tile.status
+        else:
+            break
+        connection.send(int(status_code))
+
+    tile.close()
+    del frame
+    shared_memory.close()
+
+def port_cache_path() -> str:
+    """Location of the port cache, identical to `PortCache::path` of the core library, so both backends share the cache."""
+
+    if PORT_CACHE_ENV in os.environ:
+        return os.environ[PORT_CACHE_ENV]
+    if "HOME" in os.environ:
+        return os.path.join(os.environ["HOME"], ".cache", "contourwall", "port_cache")
+    if "LOCALAPPDATA" in os.environ:
+        return os.path.join(os.environ["LOCALAPPDATA"], "contourwall", "port_cache")
+    return os.path.join(tempfile.gettempdir(), "contourwall_port_cache")
+
+def load_port_cache() -> dict[str, int]:
+    """
+    Load the port cache, which holds the identifier of the tile behind every port, keyed by the USB serial number of the port
+    or by its device name when the port has no serial number. An empty cache is returned when there is none.
+    """
+
+    cache: dict[str, int] = {}
+    try:
+        with open(port_cache_path()) as file:
+            for line in file:
+                identifier, _, key = line.rstrip("\n").partition(" ")
+                if not line.startswith("#") and identifier.isdigit() and int(identifier) <= 255 and key:
+                    cache[key] = int(identifier)
+    except OSError:
+        pass
+    return cache
+
+def save_port_cache(cache: dict[str, int]) -> None:
+    path = port_cache_path()
+    lines = ["# ContourWall port cache: <identifier> <USB serial number or device name>\n"]
+    lines += [f"{identifier} {key}\n" for key, identifier in sorted(cache.items(), key=lambda item: (item[1], item[0]))]
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            file.writelines(lines)
+    except OSError as e:
+        print(f"[Contour Wall Warning] The port cache could not be saved to '{path}': {e}")
+
+def _probe(port: str, baudrate: int) -> Optional[int]:
+    """Open the port as a tile and read its identifier, None is returned when the port is not a tile."""
+
+    try:
+        tile = Tile(port, baudrate)
+    except Exception as e:
+        print(f"'{port}', is not an ELLIE tile, because: {e}")
+        return None
+
+    status_code, identifier = tile.command_4_get_tile_identifier()
+    tile.close()
+    return identifier if status_code == StatusCode.OK else None
+
+def _open_tile(port: str, baudrate: int, identifier: int = 0) -> Optional[Tile]:
+    """Open the port as a tile, when `identifier` is not 0 the tile has to answer with it, otherwise None is returned."""
+
+    try:
+        tile = Tile(port, baudrate)
+    except Exception:
+        return None
+
+    if identifier != 0 and tile.command_4_get_tile_identifier() != (StatusCode.OK, identifier):
+        tile.close()
+        return None
+    return tile
+
+def _find_tile(identifier: int, baudrate: int, in_use: Sequence[str] = ()) -> Optional[Tile]:
+    """
+    Look for the tile with `identifier` on all USB ports, except the ports in `in_use` which are open by other tiles, so nothing is
+    written into the stream of a tile that is running. Used to find a tile again after its connection was lost, when the operating
+    system may have given its port another device name.
+    """
+
+    ports = [port.device for port in serial.tools.list_ports.comports() if port.vid is not None and port.device not in in_use]
+    for port, found in zip(ports, _probe_all(ports, baudrate)):
+        if found == identifier:
+            return _open_tile(port, baudrate)
+    return None
+
+def _probe_all(ports: list[str], baudrate: int) -> list[Optional[int]]:
+    """Probe all ports at the same time, as probing a port mostly waits on its timeout. The results are in the same order as the ports."""
+
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+        return list(executor.map(lambda port: _probe(port, baudrate), ports))
+
+def _discover_tiles(baudrate: int, expected: list[int]) -> dict[int, str]:
+    """
+    Ask every USB serial port for the identifier of its tile, returns the port of every identifier that was found.
+
+    When the port cache has a port for every identifier in `expected`, only those ports are validated. Otherwise, or when one
+    of them is no longer the cached tile, all USB ports are scanned and the port cache is updated.
+    """
+
+    # Only USB ports can be tiles
+    ports = [(port.serial_number or port.device, port.device) for port in serial.tools.list_ports.comports() if port.vid is not None]
+
+    cache = load_port_cache()
+    cached = [(device, cache[key]) for key, device in ports if key in cache]
+    if cached and set(expected) <= {identifier for _, identifier in cached}:
+        identifiers = _probe_all([device for device, _ in cached], baudrate)
+        found = {
+            identifier: device for (device, cached_identifier), identifier in zip(cached, identifiers) if identifier == cached_identifier
+        }
+        if set(expected) <= found.keys():
+            return found
+        print("[Contour Wall Warning] The port cache is outdated, all ports are scanned")
+
+    identifiers = _probe_all([device for _, device in ports], baudrate)
+    save_port_cache({key: identifier for (key, _), identifier in zip(ports, identifiers) if identifier is not None})
+    return {identifier: device for (_, device), identifier in zip(ports, identifiers) if identifier is not None}
+
+class SerialBackend:
+    """
+    Backend of the ContourWall which implements the tile protocol in Python, on top of pyserial.
+
+    Every tile is driven by its own worker process, so the tiles are updated in parallel without being limited by the GIL.
+    The frames are shared with the workers through a `multiprocessing.shared_memory` framebuffer, the workers gather
+    the framebuffer of their tile in wire order straight from it.
+    """
+
+    def __init__(self) -> None:
+        self._workers: list[tuple[multiprocessing.Process, Connection]] = []
+        self._shared_memory: Optional[SharedMemory] = None
+        self._frame: Optional[np.ndarray] = None
+        self._scheduler = FrameScheduler()
+        # The moment every tile is ready for the next frame and how long its last update took, as reported by the workers
+        self._ready_times: list[float] = []
+        self._update_durations: list[float] = []
+        # The gather map of every tile, see `Layout.gather_index`
+        self._gathers: list[np.ndarray] = []
+        self._ports_in_use: Optional[_PortsInUse] = None
+
+    def new(self, baudrate: int) -> None:
+        found = _discover_tiles(baudrate, list(range(1, 7)))
+        missing = [identifier for identifier in range(1, 7) if identifier not in found]
+        if missing:
+            print(f"[Contour Wall Warning] Only {6 - len(missing)}/6 tiles were found, the others are looked for in the background")
+        self._start_workers(
+            [found.get(identifier) for identifier in range(1, 7)],
+            [tile_gather_index(i, 6) for i in range(6)],
+            LEGACY_FRAME_SIZE,
+            baudrate,
+            identifiers=list(range(1, 7)),
+            discovered=True,
+        )
+
+    def new_with_ports(self, ports: list[str], baudrate: int) -> None:
+        self._start_workers(ports, [tile_gather_index(i, len(ports)) for i in range(len(ports))], LEGACY_FRAME_SIZE, baudrate)
+
+    def single_new_with_port(self, port: str, baudrate: int) -> None:
+        self._start_workers([port], [tile_gather_index(0, 1)], LEGACY_FRAME_SIZE, baudrate)
+
+    def new_with_layout(self, layout: Layout, ports: Optional[list[str]], baudrate: int) -> None:
+        identifiers = [placement.identifier for placement in layout.placements]
+        tile_ports: list[Optional[str]]
+        if ports is None:
+            found = _discover_tiles(baudrate, [identifier for identifier in identifiers if identifier != 0])
+            tile_ports = [found.get(identifier) if identifier != 0 else None for identifier in identifiers]
+        else:
+            tile_ports = list(ports)
+
+        # The shared framebuffer also has to fit a frame in wire order, which can be larger for a sparse layout
+        frame_size = max(layout.frame_len, len(layout) * TILE_FRAME_SIZE)
+        gathers = [layout.gather_index(i) for i in range(len(layout))]
+        self._start_workers(tile_ports, gathers, frame_size, baudrate, identifiers=identifiers, discovered=ports is None)
+
+    def tiles_len(self) -> int:
+        return len(self._workers)
+
+    def update_all(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None:
+        assert self._frame is not None, "The ContourWall has not been initialized"
+        np.copyto(self._frame[:frame.size], frame.reshape(-1))
+        self._execute(("update_all", optimize), tiles)
+
+    def show(self, tiles: Optional[np.ndarray] = None) -> None:
+        self._execute_scheduled(("show",), tiles, update=False)
+
+    def update_and_show(self, frame: np.ndarray, optimize: bool, tiles: Optional[np.ndarray] = None) -> None:
+        assert self._frame is not None, "The ContourWall has not been initialized"
+        np.copyto(self._frame[:frame.size], frame.reshape(-1))
+        self._execute_scheduled(("update_and_show", optimize), tiles, update=True)
+
+    def update_and_show_wire(self, frame: np.ndarray, optimize: bool) -> None:
+        assert self._frame is not None, "The ContourWall has not been initialized"
+        np.copyto(self._frame[:frame.size], frame.reshape(-1))
+        self._execute_scheduled(("update_and_show_wire", optimize), None, update=True)
+
+    def wire_order_index(self) -> np.ndarray:
+        return np.concatenate(self._gathers)
+
+    def _execute_scheduled(self, command: tuple, tiles: Optional[np.ndarray], update: bool) -> None:
+        """
+        Send a command which ends with showing the frame to the selected workers, with the deadline of the frame as last argument.
+
+        The deadline is never earlier than the moment the slowest tile is expected to be ready, including the time its update
+        takes when `update` is True.
+        """
+
+        start = time.perf_counter()
+        selected = [i for i in range(len(self._workers)) if tiles is None or tiles[i]]
+        earliest = max(
+            (self._ready_times[i] + (self._update_durations[i] if update else 0) for i in selected),
+            default=time.monotonic(),
+        )
+        deadline = self._scheduler.next_deadline(earliest)
+
+        for i in selected:
+            self._workers[i][1].send((*command, deadline))
+
+        show_times = []
+        for i in selected:
+            status_code, show_time, update_duration = self._workers[i][1].recv()
+            self._ready_times[i] = show_time + FRAME_TIME
+            self._update_durations[i] = update_duration
+            if status_code == StatusCode.OK:
+                show_times.append(show_time)
+
+        # When no tile is shown, the frame still takes its place in the schedule
+        if not selected:
+            sleep_until(deadline)
+        self._scheduler.record_show(deadline, show_times)
+        self._scheduler.statistics.core_us += (time.perf_counter() - start) * 1_000_000
+
+    def solid_color(self, r: int, g: int, b: int) -> None:
+        self._execute(("solid_color", r, g, b))
+
+    def set_sparse_threshold(self, threshold: int) -> None:
+        self._execute(("set_sparse_threshold", threshold))
+
+    def tile_statistics(self) -> list[TileStatistics]:
+        for _, connection in self._workers:
+            connection.send(("tile_statistics",))
+        return [TileStatistics.from_buffer_copy(connection.recv()) for _, connection in self._workers]
+
+    def tile_status(self) -> list[StatusCode]:
+        return self._execute(("tile_status",))
+
+    def set_target_fps(self, fps: float) -> None:
+        self._scheduler.set_target_fps(fps)
+
+    def scheduler_statistics(self, reset: bool) -> SchedulerStatistics:
+        statistics = self._scheduler.statistics
+        if reset:
+            self._scheduler.reset_statistics()
+        return statistics
+
+    def drop(self) -> None:
+        for process, connection in self._workers:
+            connection.send(("drop",))
+            process.join()
+            connection.close()
+        self._workers = []
+        self._gathers = []
+        self._ports_in_use = None
+        self._ready_times = []
+        self._update_durations = []
+
+        self._frame = None
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            self._shared_memory.unlink()
+            self._shared_memory = None
+
+    def _start_workers(self, ports: Sequence[Optional[str]], gathers: list[np.ndarray], frame_size: int, baudrate: int, identifiers: Optional[list[int]] = None, discovered: bool = False) -> None:
+        """
+        Start a worker for every tile. A tile without a port, or of which the port cannot be opened, is started as a disconnected
+        tile, which is opened in the background while the other tiles run. The identifiers are used to find such a tile again.
+
+        When the ports are `discovered` by `_discover_tiles`, they already passed the handshake, so the workers do not repeat it.
+        """
+
+        self._gathers = gathers
+        self._ports_in_use = _PortsInUse(len(ports))
+        self._shared_memory = SharedMemory(create=True, size=frame_size)
+        self._frame = np.ndarray((frame_size,), dtype=np.uint8, buffer=self._shared_memory.buf)
+        self._frame[:] = 0
+
+        for i, port in enumerate(ports):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_tile_worker,
+                args=(port, identifiers[i] if identifiers else 0, baudrate, not discovered, gathers[i], i, self._ports_in_use, self._shared_memory.name, frame_size, worker_connection),
+                name=f"ContourWallTile{i}",
+                daemon=True,
+            )
+            process.start()
+            self._workers.append((process, connection))
+            self._ready_times.append(0)
+            self._update_durations.append(0)
+
+        for i, (_, connection) in enumerate(self._workers):
+            error = connection.recv()
+            if error is not None:
+                print(f"[Contour Wall Warning] Tile {i} is looked for in the background, because: {error}")
+
+    def _execute(self, command: tuple, tiles: Optional[np.ndarray] = None) -> list[StatusCode]:
+        """
+        Send a command to all workers at once and wait for the status code of every tile.
+
+        When `tiles` is given, the command is only send to the workers of which the byte in `tiles` is not 0.
+        """
+
+        connections = [connection for i, (_, connection) in enumerate(self._workers) if tiles is None or tiles[i]]
+        for connection in connections:
+            connection.send(command)
+        return [StatusCode(connection.recv()) for connection in connections]
@@ -0,0 +1,185 @@
+"""
+Memory-mapped ring file of frames, used by the headless ContourWallEmulator to record what would have been shown.
+
+The file starts with a header of 8 unsigned 64-bit integers, followed by the timestamps and the frames. Every frame is written
+twice, at slot `i % capacity` and at slot `i % capacity + capacity`. Because of this mirroring any window of at most `capacity`
+consecutive frames is contiguous in the file, so the reader can return it as a numpy view without copying.
+
+Inspecting a recording is done like this:
+```bash
+python3 frame_log.py frames.cwlog
+```
+"""
+
+import argparse
+import time
+from typing import Literal, Optional
+
+import numpy as np
+
+MAGIC = int.from_bytes(b"CWFRAMES", "little")
+VERSION = 1
+HEADER_SIZE = 8 * 8
+
+# Positions in the header
+_MAGIC, _VERSION, _ROWS, _COLS, _CHANNELS, _CAPACITY, _COUNT = range(7)
+
+def _layout(capacity: int, frame_size: int) -> tuple[int, int, int]:
+    """Returns the offset of the timestamps, the offset of the frames and the total size of a frame log file."""
+
+    timestamps_offset = HEADER_SIZE
+    frames_offset = timestamps_offset + 2 * capacity * 8
+    return timestamps_offset, frames_offset, frames_offset + 2 * capacity * frame_size
+
+class _FrameLog:
+    def _map(self, path: str, mode: Literal["r", "r+"], header: Optional[np.ndarray] = None) -> None:
+        if header is None:
+            header = np.memmap(path, dtype=np.uint64, mode="r", shape=(8,))
+            if int(header[_MAGIC]) != MAGIC or int(header[_VERSION]) != VERSION:
+                raise Exception(f"'{path}' is not a frame log of the Contour Wall")
+
+        self.shape: tuple[int, int, int] = (int(header[_ROWS]), int(header[_COLS]), int(header[_CHANNELS]))
+        self.capacity: int = int(header[_CAPACITY])
+        frame_size = int(np.prod(self.shape))
+        timestamps_offset, frames_offset, size = _layout(self.capacity, frame_size)
+
+        self._file: np.memmap = np.memmap(path, dtype=np.uint8, mode=mode, shape=(size,))
+        self._header: np.ndarray = self._file[:HEADER_SIZE].view(np.uint64)
+        self._timestamps: np.ndarray = self._file[timestamps_offset:frames_offset].view(np.float64)
+        self._frames: np.ndarray = self._file[frames_offset:].reshape(2 * self.capacity, *self.shape)
+
+    @property
+    def count(self) -> int:
+        """The total amount of frames that have been appended, including the frames that have been overwritten"""
+
+        return int(self._header[_COUNT])
+
+class FrameLogWriter(_FrameLog):
+    def __init__(self, path: str, capacity: int = 3600, shape: tuple[int, int, int] = (40, 60, 3)) -> None:
+        """
+        Create a preallocated frame log at `path`, which holds the last `capacity` frames. An existing file is overwritten.
+
+        Example code:
+        ```
+            log = FrameLogWriter("frames.cwlog", capacity=1000)
+            log.append(pixels)
+        ```
+        """
+
+        if capacity < 1:
+            raise Exception(f"The capacity of a frame log has to be at least 1, not '{capacity}'")
+
+        header = np.array([MAGIC, VERSION, *shape, capacity, 0, 0], dtype=np.uint64)
+        _, _, size = _layout(capacity, int(np.prod(shape)))
+        with open(path, "wb") as file:
+            file.truncate(size)
+        self.path = path
+        self._map(path, "r+", header)
+        self._header[:] = header
+
+    def append(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """Append a frame with its timestamp, by default the current time in seconds since the epoch."""
+
+        count = self.count
+        slot = count % self.capacity
+        if timestamp is None:
+            timestamp = time.time()
+
+        np.copyto(self._frames[slot], frame, casting="unsafe")
+        self._frames[slot + self.capacity] = self._frames[slot]
+        self._timestamps[slot] = self._timestamps[slot + self.capacity] = timestamp
+
+        # The count is written last, so readers never see a frame that is only half written
+        self._header[_COUNT] = count + 1
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.flush()
+        del self._header, self._timestamps, self._frames, self._file
+
+class FrameLogReader(_FrameLog):
+    def __init__(self, path: str) -> None:
+        """
+        Open a frame log read-only. The frames are returned as views on the file, so they are not copied. The file can be read
+        while it is still being written by another process: `count` and the available frames are updated live.
+
+        Frames are indexed by the order in which they have been appended. Only the last `capacity` frames are available, and
+        a view on the oldest frames can be overwritten by the writer, call `.copy()` on a view that needs to be kept. When the
+        writer recreates the file, the reader has to be opened again.
+
+        Example code:
+        ```
+            log = FrameLogReader("frames.cwlog")
+            last_frame = log[-1]
+            timestamps, frames = log.time_range(time.time() - 1, time.time())
+        ```
+        """
+
+        self.path = path
+        self._map(path, "r")
+
+    @property
+    def first(self) -> int:
+        """Index of the oldest frame that is still available"""
+
+        return max(0, self.count - self.capacity)
+
+    def __len__(self) -> int:
+        return self.count - self.first
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.frame(index)
+
+    def frame(self, index: int) -> np.ndarray:
+        """Returns the frame with the given index, negative indices count back from the last frame."""
+
+        start, _ = self._resolve(index, index + 1 if index != -1 else None)
+        return self._frames[start]
+
+    def frames(self, start: Optional[int] = None, stop: Optional[int] = None) -> np.ndarray:
+        """Returns the frames from index `start` up to `stop` as a view of shape (n, rows, cols, channels)."""
+
+        first, last = self._resolve(start, stop)
+        return self._frames[first:last]
+
+    def timestamps(self, start: Optional[int] = None, stop: Optional[int] = None) -> np.ndarray:
+        """Returns the timestamps of the frames from index `start` up to `stop`."""
+
+        first, last = self._resolve(start, stop)
+        return self._timestamps[first:last]
+
+    def time_range(self, start_time: float, end_time: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the timestamps and the frames which were appended at or after `start_time` and before `end_time`."""
+
+        first, last = self._resolve(None, None)
+        timestamps = self._timestamps[first:last]
+        begin, end = np.searchsorted(timestamps, [start_time, end_time])
+        return timestamps[begin:end], self._frames[first + begin:first + end]
+
+    def _resolve(self, start: Optional[int], stop: Optional[int]) -> tuple[int, int]:
+        """Translate a range of frame indices to a range of slots in the mirrored file."""
+
+        count = self.count
+        first = max(0, count - self.capacity)
+        start = first if start is None else start + count if start < 0 else start
+        stop = count if stop is None else stop + count if stop < 0 else stop
+        if not first <= start <= stop <= count:
+            raise IndexError(f"Frames {start} to {stop} are not in the frame log, available are {first} to {count}")
+
+        slot = start % self.capacity if start < count else 0
+        return slot, slot + stop - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a summary of a frame log of the Contour Wall")
+    parser.add_argument("path", help="frame log to inspect")
+    args = parser.parse_args()
+
+    log = FrameLogReader(args.path)
+    timestamps = log.timestamps()
+    print(f"{log.path}: {log.count} frames appended, {len(log)}/{log.capacity} available, shape {log.shape}")
+    if len(timestamps) > 1:
+        intervals = np.diff(timestamps)
+        span = timestamps[-1] - timestamps[0]
+        print(f"{span:.3f}s recorded, {(len(timestamps) - 1) / span:.1f} fps, frame interval max {intervals.max() * 1000:.3f}ms")
@@ -0,0 +1,149 @@
+import ctypes
+from ctypes import c_uint8, c_uint16
+from typing import Sequence
+
+import numpy as np
+
+TILE_SIZE = 20
+
+class TilePlacement(ctypes.Structure):
+    """
+    TilePlacement is a ctypes structure with the position of a tile on the wall, identical to `TilePlacement` of the Rust shared object. It contains the following fields:
+    - row: The row of the tile on the grid of tiles, row 0 is the top row.
+    - col: The column of the tile on the grid of tiles, column 0 is the left column.
+    - rotation: The clockwise rotation of the tile as it is mounted on the wall in degrees, either 0, 90, 180 or 270.
+    - identifier: The identifier of the tile which is stored in the EEPROM of the tile, 0 if it is not used to find the tile.
+    """
+    _fields_ = [
+        ("row", c_uint16),
+        ("col", c_uint16),
+        ("rotation", c_uint16),
+        ("identifier", c_uint8),
+    ]
+
+    def __repr__(self) -> str:
+        return f"TilePlacement(row={self.row}, col={self.col}, rotation={self.rotation}, identifier={self.identifier})"
+
+class Layout:
+    def __init__(self, placements: Sequence[TilePlacement]) -> None:
+        """
+        The tiles of the wall, and the size of the pixel array of the wall, which is the bounding box of the tiles.
+
+        The tiles can be placed anywhere on a grid of 20x20 pixels, so walls of any size and shape are possible. Pixels of the
+        pixel array which are not covered by a tile are not shown. Identical to `Layout` of the core library.
+
+        Example code:
+        ```
+            # An L-shaped wall of three tiles, of which the bottom tile is mounted upside down
+            layout = Layout([
+                TilePlacement(row=0, col=0, identifier=1),
+                TilePlacement(row=0, col=1, identifier=2),
+                TilePlacement(row=1, col=0, rotation=180, identifier=3),
+            ])
+            cw.new_with_layout(layout)
+            cw.pixels.shape     # (40, 40, 3)
+        ```
+        """
+
+        if len(placements) == 0:
+            raise Exception("A layout needs at least one tile")
+
+        for i, placement in enumerate(placements):
+            if placement.rotation not in (0, 90, 180, 270):
+                raise Exception(f"The rotation of tile {i} has to be either 0, 90, 180 or 270, not '{placement.rotation}'")
+
+            for j, other in enumerate(placements[:i]):
+                if (other.row, other.col) == (placement.row, placement.col):
+                    raise Exception(f"Tile {j} and {i} are placed on the same position")
+                if placement.identifier != 0 and other.identifier == placement.identifier:
+                    raise Exception(f"Tile {j} and {i} have the same identifier '{placement.identifier}'")
+
+        self.placements: list[TilePlacement] = list(placements)
+        self.rows: int = (max(placement.row for placement in placements) + 1) * TILE_SIZE
+        self.cols: int = (max(placement.col for placement in placements) + 1) * TILE_SIZE
+
+    @staticmethod
+    def grid(tile_rows: int, tile_cols: int) -> "Layout":
+        """A rectangular wall of `tile_rows` by `tile_cols` tiles, the tiles are ordered row by row and identified from 1 onwards."""
+
+        return Layout([
+            TilePlacement(row=i // tile_cols, col=i % tile_cols, identifier=i + 1) for i in range(tile_rows * tile_cols)
+        ])
+
+    @staticmethod
+    def six_tiles() -> "Layout":
+        """
+        The wall of 6 tiles, in the order the ContourWall has always used: tile 0 is the top-left tile, tile 1 the bottom-left tile,
+        tile 2 the top-center tile, etcetera. The identifier of every tile is its index plus one.
+        """
+
+        return Layout([TilePlacement(row=i % 2, col=i // 2, identifier=i + 1) for i in range(6)])
+
+    def __len__(self) -> int:
+        return len(self.placements)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """Shape of the pixel array of the wall."""
+
+        return self.rows, self.cols, 3
+
+    @property
+    def frame_len(self) -> int:
+        """Length of the flattened pixel array of the wall in bytes."""
+
+        return self.rows * self.cols * 3
+
+    def gather_index(self, index: int) -> np.ndarray:
+        """
+        Returns the gather map of the tile at `index`: element `i` is the index in the flattened pixel array of the `i`th byte that
+        is send to the tile, so the framebuffer of the tile in wire order is gathered from the flattened pixel array with it.
+        """
+
+        placement = self.placements[index]
+        row, col = np.meshgrid(np.arange(TILE_SIZE), np.arange(TILE_SIZE), indexing="ij")
+        last = TILE_SIZE - 1
+
+        # Where every pixel of the tile ends up within the 20x20 pixels of the tile on the wall, after the tile is rotated
+        if placement.rotation == 90:
+            wall_row, wall_col = col, last - row
+        elif placement.rotation == 180:
+            wall_row, wall_col = last - row, last - col
+        elif placement.rotation == 270:
+            wall_row, wall_col = last - col, row
+        else:
+            wall_row, wall_col = row, col
+
+        wall_row = wall_row + placement.row * TILE_SIZE
+        wall_col = wall_col + placement.col * TILE_SIZE
+        unordered = (((wall_row * self.cols + wall_col) * 3)[:, :, np.newaxis] + np.arange(3)).reshape(-1)
+
+        gather = np.zeros(TILE_SIZE * TILE_SIZE * 3, dtype=np.intp)
+        gather[generate_index_conversion_vector()] = unordered
+        return gather
+
+    def wire_order_index(self) -> np.ndarray:
+        """Returns the gather maps of all tiles one after the other, see `ContourWall.wire_order_index`."""
+
+        return np.concatenate([self.gather_index(i) for i in range(len(self))])
+
+    def regions(self) -> np.ndarray:
+        """Returns the region of the pixel array every tile shows, as rows of [top, left, bottom, right], like `tile_regions` does."""
+
+        return np.array([
+            [p.row * TILE_SIZE, p.col * TILE_SIZE, (p.row + 1) * TILE_SIZE, (p.col + 1) * TILE_SIZE] for p in self.placements
+        ])
+
+def generate_index_conversion_vector() -> np.ndarray:
+    """
+    Python port of `generate_index_conversion_vector` of the core library.
+
+    Returns an array of 1200 indices, element `i` is the position of byte `i` of a row-major 20x20x3 tile framebuffer in the
+    order the LEDs are wired on a tile.
+    """
+
+    x = np.arange(TILE_SIZE).reshape(-1, 1)
+    y = np.arange(TILE_SIZE).reshape(1, -1)
+    row_start_value = (x // 5) * 100 + x % 5
+    matrix = (row_start_value + y * 5) * 3
+    return (matrix.reshape(-1, 1) + np.arange(3)).reshape(-1)
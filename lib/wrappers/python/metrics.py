@@ -0,0 +1,98 @@
+import ctypes
+import os
+import threading
+from typing import Sequence
+
+class Metrics:
+    def __init__(self, frames: int, prep_us: float, call_us: float, scheduler: ctypes.Structure, tiles: Sequence[ctypes.Structure]) -> None:
+        """
+        Snapshot of where the time of the frames went, see `ContourWall.metrics`. All times are totals in microseconds.
+
+        - frames: The amount of frames that were pushed.
+        - prep_us: The time spent in Python preparing the frames, which is applying the brightness and staging them.
+        - ffi_us: The time spent crossing into the backend and back, which is the time of the calls minus the time the backend
+          spent on the frames (`core_us` of the scheduler statistics).
+        - scheduler: The `SchedulerStatistics` of the backend.
+        - tiles: The `TileStatistics` of every tile, with the time every tile spent on reordering, writing, waiting for its
+          responses and pacing, and the amount of CRC errors, timeouts, dropped frames and bytes sent.
+
+        Example code:
+        ```
+            metrics = cw.metrics()
+            print(metrics.breakdown())  # {'prep_us': 45.1, 'ffi_us': 3.2, 'reorder_us': 1.5, 'write_us': 60.2, 'ack_us': 5803.0, 'pacing_us': 8611.4}
+        ```
+        """
+
+        self.frames = frames
+        self.prep_us = prep_us
+        self.ffi_us = max(call_us - getattr(scheduler, "core_us"), 0)
+        self.scheduler = scheduler
+        self.tiles = list(tiles)
+
+    def breakdown(self) -> dict[str, float]:
+        """
+        Returns the mean time per frame of every step, in microseconds.
+
+        The steps of the tiles happen in parallel, so for them the slowest tile is taken, which is the tile that limits the frame.
+        Mostly `write_us` means the baud rate is the limit, `ack_us` the firmware latching the LEDs and `pacing_us` the frame time
+        of the tiles or the target fps, while a large `prep_us` or `ffi_us` points at the Python code.
+        """
+
+        frames = max(self.frames, 1)
+        breakdown = {"prep_us": self.prep_us / frames, "ffi_us": self.ffi_us / frames}
+        for step in ("reorder_us", "write_us", "ack_us", "pacing_us"):
+            breakdown[step] = max((getattr(tile, step) for tile in self.tiles), default=0) / frames
+        return breakdown
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the metrics in the text format of Prometheus, the times in seconds. Counters end with `_total`, and the metrics of
+        the tiles have a `tile` label with the index of the tile.
+        """
+
+        lines = [
+            f"contourwall_frames_total {self.frames}",
+            f"contourwall_prep_seconds_total {self.prep_us / 1_000_000}",
+            f"contourwall_ffi_seconds_total {self.ffi_us / 1_000_000}",
+        ]
+        gauges = ("jitter_mean_us", "jitter_max_us", "skew_last_us", "skew_max_us")
+        lines += [f"contourwall_scheduler_{name} {value}" for name, value in _samples(self.scheduler, gauges)]
+        # The samples of a metric are grouped together, with a sample for every tile
+        for samples in zip(*[_samples(tile) for tile in self.tiles]):
+            lines += ['contourwall_tile_%s{tile="%d"} %s' % (name, i, value) for i, (name, value) in enumerate(samples)]
+        return "\n".join(lines) + "\n"
+
+def _samples(statistics: ctypes.Structure, gauges: Sequence[str] = ()) -> list[tuple[str, float]]:
+    """
+    The fields of the statistics as names and values, the fields in microseconds are converted to seconds. All fields are
+    counters which end with `_total`, except for the `gauges`.
+    """
+
+    samples = []
+    for field, _ in getattr(statistics, "_fields_"):
+        name, value = field, getattr(statistics, field)
+        if field.endswith("_us"):
+            name, value = field[:-3] + "_seconds", value / 1_000_000
+        if field not in gauges:
+            name += "_total"
+        samples.append((name, value))
+    return samples
+
+def write_metrics_file(path: str, metrics: Metrics) -> None:
+    """
+    Write the metrics to `path` in the text format of Prometheus. The file is replaced at once, so a scraper never reads a half
+    written file, E.G. the textfile collector of the Prometheus node exporter.
+    """
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as file:
+            file.write(metrics.to_prometheus())
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"[Contour Wall Warning] The metrics could not be written to '{path}': {e}")
+
+def write_metrics_file_in_background(path: str, metrics: Metrics) -> None:
+    """`write_metrics_file` on a separate thread, so writing the file never delays a frame."""
+
+    threading.Thread(target=write_metrics_file, args=(path, metrics), name="ContourWallMetrics", daemon=True).start()
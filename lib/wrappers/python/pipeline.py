@@ -0,0 +1,240 @@
+"""
+Pipeline of stages which run at the same time, E.G. capture, inference, drawing and sending to the Contour Wall.
+
+Every stage runs on its own thread, and takes the newest output of the stage before it. When a stage is slower than the
+stage before it, the older outputs are dropped instead of queued, so the frame rate is that of the slowest stage instead of
+the sum of all stages, and the latency never grows. The stages can run at the same time as OpenCV and MediaPipe release the
+GIL while they process a frame.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional, Sequence
+
+class LatestValue:
+    def __init__(self) -> None:
+        """
+        Queue of a single value between two stages, a value which is put before the previous value was taken replaces it.
+
+        Example code:
+        ```
+            latest = LatestValue()
+            latest.put(1)
+            latest.put(2)       # Replaces 1, which is counted as dropped
+            latest.get()        # 2
+        ```
+        """
+
+        self.dropped = 0
+        self._condition = threading.Condition()
+        self._value: Any = None
+        self._has_value = False
+        self._closed = False
+
+    def put(self, value: Any) -> None:
+        with self._condition:
+            if self._has_value:
+                self.dropped += 1
+            self._value = value
+            self._has_value = True
+            self._condition.notify()
+
+    def get(self) -> Optional[Any]:
+        """Wait for a value and take it, None is returned once the queue is closed and empty."""
+
+        with self._condition:
+            while not self._has_value and not self._closed:
+                self._condition.wait()
+            if not self._has_value:
+                return None
+            value, self._value, self._has_value = self._value, None, False
+            return value
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+class StageStatistics:
+    def __init__(self, name: str) -> None:
+        """
+        Timing of a stage of a pipeline.
+
+        - items: The amount of values the stage processed.
+        - dropped: The amount of values of the stage before it which it never took, because it was busy.
+        - busy_us: The total time spent in the function of the stage, in microseconds.
+        """
+
+        self.name = name
+        self.items = 0
+        self.dropped = 0
+        self.busy_us: float = 0
+
+class PipelineStatistics:
+    def __init__(self, stages: Sequence[StageStatistics], frames: int, elapsed: float, latency_us: float, latency_max_us: float) -> None:
+        """
+        Timing of a pipeline, see `Pipeline.statistics`.
+
+        - stages: The statistics of every stage.
+        - frames: The amount of values that went through the last stage.
+        - latency_us, latency_max_us: The mean and maximum time from the moment the first stage produced a value until the last
+          stage was done with it, E.G. from camera to wall, in microseconds.
+
+        Example code:
+        ```
+            statistics = pipeline.run()
+            print(f"{statistics.fps:.1f} fps, {statistics.latency_us / 1000:.0f} ms latency")
+            print(statistics.breakdown())   # {'capture': 3100.2, 'inference': 28010.5, 'rasterize': 1650.0, 'show': 950.1}
+        ```
+        """
+
+        self.stages = list(stages)
+        self.frames = frames
+        self.elapsed = elapsed
+        self.latency_us = latency_us
+        self.latency_max_us = latency_max_us
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.elapsed if self.elapsed > 0 else 0
+
+    def breakdown(self) -> dict[str, float]:
+        """Returns the mean time per value of every stage, in microseconds. The slowest stage sets the frame rate."""
+
+        return {stage.name: stage.busy_us / max(stage.items, 1) for stage in self.stages}
+
+class Pipeline:
+    def __init__(self, stages: Sequence[tuple[str, Callable]]) -> None:
+        """
+        Pipeline of named stages, every stage is a function which takes the output of the stage before it.
+
+        - The first stage takes no arguments, and produces the values, E.G. reads a frame from the camera. When it returns None
+          the pipeline stops.
+        - Every other stage returns the value for the next stage. When it returns None, the value is skipped.
+        - The last stage runs on the thread that calls `run`, as GUI functions like `cv.imshow` only work on the main thread on
+          some platforms. When it returns False the pipeline stops.
+
+        Example code:
+        ```
+            def send(pixels: np.ndarray) -> None:
+                cw.pixels[:] = pixels
+                cw.show()
+
+            pipeline = Pipeline([("capture", read_camera), ("inference", detect_pose), ("rasterize", draw_pose), ("send", send)])
+            statistics = pipeline.run()
+        ```
+        """
+
+        if len(stages) < 2:
+            raise Exception(f"A pipeline needs at least 2 stages, not {len(stages)}")
+
+        self._stages = list(stages)
+        self._statistics = [StageStatistics(name) for name, _ in stages]
+        self._queues = [LatestValue() for _ in stages[1:]]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._start = 0.0
+        self._latency_us: float = 0
+        self._latency_max_us: float = 0
+
+    def run(self, frames: Optional[int] = None) -> PipelineStatistics:
+        """
+        Run the pipeline until a stage stops it, an exception is raised, or `frames` values went through the last stage.
+        An exception of a stage is raised again here, after all stages stopped.
+        """
+
+        self._start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(i,), name=f"Pipeline{name.capitalize()}", daemon=True)
+            for i, (name, _) in enumerate(self._stages[:-1])
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._run_last_stage(frames)
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+        return self.statistics()
+
+    def stop(self) -> None:
+        """Stop all stages, the stages finish the value they are working on."""
+
+        self._stop.set()
+        for queue in self._queues:
+            queue.close()
+
+    def statistics(self) -> PipelineStatistics:
+        """The statistics of the pipeline so far, which can be called while it is running, E.G. to show the frame rate."""
+
+        with self._lock:
+            for statistics, queue in zip(self._statistics[1:], self._queues):
+                statistics.dropped = queue.dropped
+            last = self._statistics[-1]
+            return PipelineStatistics(
+                [_copy(statistics) for statistics in self._statistics], last.items, time.perf_counter() - self._start,
+                self._latency_us / max(last.items, 1), self._latency_max_us,
+            )
+
+    def _run_stage(self, index: int) -> None:
+        """Thread of every stage but the last, the values are passed on with the moment the first stage produced them."""
+
+        _, function = self._stages[index]
+        try:
+            while not self._stop.is_set():
+                if index == 0:
+                    value, produced = self._timed(index, function), time.perf_counter()
+                    if value is None:
+                        break
+                else:
+                    item = self._queues[index - 1].get()
+                    if item is None:
+                        break
+                    value, produced = self._timed(index, function, item[0]), item[1]
+                    if value is None:
+                        continue
+                self._queues[index].put((value, produced))
+        except BaseException as error:
+            self._error = error
+        finally:
+            # The stages after this one finish the values they already have, and then stop as well
+            self._queues[index].close()
+
+    def _run_last_stage(self, frames: Optional[int]) -> None:
+        _, function = self._stages[-1]
+        while frames is None or self._statistics[-1].items < frames:
+            item = self._queues[-1].get()
+            if item is None:
+                break
+            try:
+                result = self._timed(len(self._stages) - 1, function, item[0])
+            except BaseException as error:
+                self._error = error
+                break
+
+            latency_us = (time.perf_counter() - item[1]) * 1_000_000
+            with self._lock:
+                self._latency_us += latency_us
+                self._latency_max_us = max(self._latency_max_us, latency_us)
+            if result is False:
+                break
+
+    def _timed(self, index: int, function: Callable, *args: Any) -> Any:
+        start = time.perf_counter()
+        result = function(*args)
+        with self._lock:
+            statistics = self._statistics[index]
+            statistics.items += 1
+            statistics.busy_us += (time.perf_counter() - start) * 1_000_000
+        return result
+
+def _copy(statistics: StageStatistics) -> StageStatistics:
+    copy = StageStatistics(statistics.name)
+    copy.items, copy.dropped, copy.busy_us = statistics.items, statistics.dropped, statistics.busy_us
+    return copy
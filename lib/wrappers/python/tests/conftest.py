@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+# The modules of the wrapper are imported like the examples do, from the directory of the wrapper
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tile_simulator import SimulatedWall
+
+# The simulated tiles answer from a thread of the test process. When the workers of the tiles are forked from it, forking the
+# next worker keeps the simulated tiles from answering the handshake of the previous worker within the timeout of the port.
+multiprocessing.set_start_method("forkserver", force=True)
+
+@pytest.fixture
+def simulated_wall():
+    """
+    Starts simulated tiles, which are stopped after the test. The tiles do not latch, as the latch and the RX flush after it
+    would swallow a command that is send right after a show, which makes the tests depend on the timing of the machine.
+    """
+
+    walls = []
+    def start(tiles=6):
+        walls.append(SimulatedWall(tiles, baudrate=None, latch_delay=0))
+        return walls[-1]
+    yield start
+    for wall in walls:
+        wall.stop()
+
+@pytest.fixture
+def wall(simulated_wall):
+    return simulated_wall(6)
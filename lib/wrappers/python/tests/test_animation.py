@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from animation import AnimationPlayer
+from contourwall import ContourWall
+
+def new_contour_wall(wall) -> ContourWall:
+    # The Python backend talks to the simulated tiles without the Rust shared object
+    cw = ContourWall(backend="python")
+    cw.new_with_ports(*wall.ports)
+    return cw
+
+def test_fill_solid_is_recorded(simulated_wall, tmp_path):
+    wall = simulated_wall(6)
+    path = os.path.join(tmp_path, "fill.cwanim")
+    cw = new_contour_wall(wall)
+    canvas = cw.tracked_canvas()
+    cw.record(path)
+
+    canvas.fill((0, 0, 255))
+    cw.show()
+    cw.fill_solid(255, 0, 0)
+    cw.show()
+    assert (wall.dump_frame() == (255, 0, 0)).all()
+    cw.record(None)
+    cw.drop()
+
+    player = AnimationPlayer(path)
+    assert player.frames == 2
+    player.next_frame()
+    assert (player.frame == (0, 0, 255)).all()
+    player.next_frame()
+    assert (player.frame == (255, 0, 0)).all()
+
+    # Played back on another wall, the wall ends on the solid color
+    playback = simulated_wall(6)
+    cw = new_contour_wall(playback)
+    assert AnimationPlayer(path).play(cw, fps=1000) == 2
+    assert (playback.dump_frame() == (255, 0, 0)).all()
+    cw.drop()
@@ -0,0 +1,62 @@
+import numpy as np
+
+from contourwall import ContourWall
+from contourwall_async import AsyncContourWall
+
+def test_only_dirty_tiles_are_send(wall):
+    cw = ContourWall(backend="python")
+    cw.new_with_ports(*wall.ports)
+    canvas = cw.tracked_canvas()
+    acw = AsyncContourWall(cw)
+
+    # The tiles every frame is send to
+    sent_tiles = []
+    update_and_show = cw._backend.update_and_show
+    def record_tiles(frame, optimize, tiles=None):
+        sent_tiles.append(None if tiles is None else tiles.copy())
+        update_and_show(frame, optimize, tiles)
+    cw._backend.update_and_show = record_tiles
+
+    canvas.fill((0, 0, 255))
+    assert acw.show_nowait().result()
+    # Only the top-left tile was drawn on
+    canvas.rect(2, 2, 5, 5, (255, 0, 0))
+    assert acw.show_nowait().result()
+    # Nothing was drawn on
+    assert acw.show_nowait().result()
+
+    assert len(sent_tiles) == 2
+    assert sent_tiles[0].all()
+    assert list(sent_tiles[1]) == [1, 0, 0, 0, 0, 0]
+    assert (wall.dump_frame() == cw.pixels).all()
+
+    acw.close()
+    cw.drop()
+
+def test_pixels_are_read_live(wall):
+    cw = ContourWall(backend="python")
+    cw.new_with_ports(*wall.ports)
+    acw = AsyncContourWall(cw)
+
+    cw.pixels = np.full_like(cw.pixels, 255)
+    assert acw.pixels is cw.pixels
+    assert acw.show_nowait().result()
+    assert (wall.dump_frame() == 255).all()
+
+    acw.close()
+    cw.drop()
+
+def test_frame_which_a_tile_did_not_show_resolves_to_false(wall):
+    cw = ContourWall(backend="python")
+    cw.new_with_ports(*wall.ports)
+    acw = AsyncContourWall(cw)
+    assert acw.show_nowait().result()
+
+    # The tile is stopped here instead of by the fixture
+    lost = wall.tiles.pop(3)
+    lost.stop()
+    cw.pixels[:] = 255, 0, 0
+    assert not acw.show_nowait().result(timeout=30)
+
+    acw.close()
+    cw.drop()
@@ -0,0 +1,29 @@
+import numpy as np
+
+from contourwall import ContourWall
+from layout import Layout, TilePlacement
+
+def test_show_wire_sends_the_bytes_of_show(simulated_wall):
+    wall = simulated_wall(3)
+    # An L-shaped wall of rotated tiles, so the wire order differs from the pixel array for every tile
+    layout = Layout([
+        TilePlacement(row=0, col=0, rotation=90, identifier=1),
+        TilePlacement(row=0, col=1, rotation=180, identifier=2),
+        TilePlacement(row=1, col=0, rotation=270, identifier=3),
+    ])
+    cw = ContourWall(backend="python")
+    cw.new_with_layout(layout, wall.ports)
+    index = cw.wire_order_index()
+    assert (index == layout.wire_order_index()).all()
+
+    cw.pixels[:] = np.random.default_rng(0).integers(0, 256, cw.pixels.shape, dtype=np.uint8)
+    cw.show()
+    shown = [tile.dump_wire_frame() for tile in wall.tiles]
+
+    cw.show_wire(np.zeros(len(index), dtype=np.uint8))
+    assert not any(tile.dump_wire_frame().any() for tile in wall.tiles)
+
+    cw.show_wire(cw.pixels.reshape(-1)[index])
+    for tile, expected in zip(wall.tiles, shown):
+        assert (tile.dump_wire_frame() == expected).all()
+    cw.drop()
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import numpy as np
+import serial.tools.list_ports
+
+from contourwall import ContourWall
+from contourwall_serial import _find_tile, _open_tile
+
+def test_discovered_tiles_are_handshaked_once(wall, monkeypatch, tmp_path):
+    # The simulated tiles are listed as USB ports, in reverse so the tiles have to be found by their identifier
+    ports = [SimpleNamespace(device=port, serial_number=None, vid=0x303A) for port in reversed(wall.ports)]
+    monkeypatch.setattr(serial.tools.list_ports, "comports", lambda: ports)
+    monkeypatch.setenv("CONTOURWALL_PORT_CACHE", str(tmp_path / "port_cache"))
+
+    cw = ContourWall(backend="python")
+    cw.new()
+    for tile in wall.tiles:
+        assert tile.commands[6] == 1
+        assert tile.commands[4] == 1
+
+    cw.pixels[:] = np.random.default_rng(0).integers(0, 256, cw.pixels.shape, dtype=np.uint8)
+    cw.show()
+    assert (wall.dump_frame() == cw.pixels).all()
+    cw.drop()
+
+def test_reopened_port_has_to_be_the_same_tile(simulated_wall):
+    wall = simulated_wall(1)
+
+    # The operating system gave the port of the lost tile with identifier 2 to the tile with identifier 1
+    assert _open_tile(wall.ports[0], 2_000_000, identifier=2) is None
+    tile = _open_tile(wall.ports[0], 2_000_000, identifier=1)
+    assert tile is not None
+    tile.close()
+
+def test_lost_tile_is_not_looked_for_on_the_ports_of_other_tiles(wall, monkeypatch):
+    ports = [SimpleNamespace(device=port, serial_number=None, vid=0x303A) for port in wall.ports]
+    monkeypatch.setattr(serial.tools.list_ports, "comports", lambda: ports)
+
+    cw = ContourWall(backend="python")
+    cw.new_with_ports(*wall.ports)
+    ports_in_use = cw._backend._ports_in_use
+    assert ports_in_use.others(0) == wall.ports[1:]
+
+    handshakes = [tile.commands[6] for tile in wall.tiles]
+    # The tile with identifier 1 is not on any of the ports that are open by the other tiles
+    assert _find_tile(1, 2_000_000, ports_in_use.others(0)) is None
+    assert [tile.commands[6] for tile in wall.tiles] == handshakes
+    cw.drop()
@@ -0,0 +1,33 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from video import VideoPlayer
+
+@pytest.fixture
+def red_video(tmp_path):
+    path = str(tmp_path / "red.avi")
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*"MJPG"), 30, (120, 80))
+    for _ in range(10):
+        # OpenCV writes BGR, so this is red
+        writer.write(np.full((80, 120, 3), (0, 0, 255), dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_frames_are_rgb(red_video):
+    player = VideoPlayer(red_video, shape=(4, 6), loop=False)
+    try:
+        pixels, _, _ = player.read()
+        red, green, blue = pixels.reshape(-1, 3).mean(axis=0)
+        assert red > 200 and green < 50 and blue < 50
+        player.release()
+    finally:
+        player.close()
+
+def test_speed_has_to_be_positive(red_video):
+    player = VideoPlayer(red_video, shape=(4, 6), loop=False)
+    try:
+        with pytest.raises(Exception, match="speed"):
+            player.play(None, speed=0)
+    finally:
+        player.close()
@@ -0,0 +1,335 @@
+"""
+Tile simulator which behaves like `firmware/firmware.ino`, on a pseudo-terminal.
+
+Every simulated tile opens a pty, the device name of the pty can be passed to `ContourWall.single_new_with_port` and
+`ContourWall.new_with_ports` like the COM port of a physical tile. This makes it possible to run and measure the wrapper and
+the core library on a plain Linux or macOS machine, without the Contour Wall.
+
+Running six simulated tiles is done like this, the device names are printed and optionally symlinked:
+```bash
+python3 tile_simulator.py --tiles 6 --link-dir /tmp/contourwall
+```
+"""
+
+import argparse
+import os
+import pty
+import select
+import threading
+import time
+import tty
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+from contourwall import StatusCode
+from contourwall_serial import TILE_FRAME_SIZE, TILE_SIZE, generate_index_conversion_vector
+
+NUM_LEDS = 400
+SERIAL_TIMEOUT = 0.010      # Serial.setTimeout(10) of the firmware
+WS2812B_LATCH_DELAY = 0.012 # 400 LEDs * 24 bits * 1.25us, plus the reset time
+
+class TileSimulator:
+    def __init__(self, identifier: int = 1, baudrate: Optional[int] = 2_000_000, latch_delay: float = WS2812B_LATCH_DELAY) -> None:
+        """
+        Constructor for the TileSimulator class.
+
+        identifier: The tile identifier which is "stored in the EEPROM", returned by command 4.
+        baudrate: Used to simulate the transfer time of every byte over the serial connection (10 bits per byte). None disables it.
+        latch_delay: The time `FastLED.show()` blocks the firmware when showing the LEDs, in seconds.
+
+        Example code:
+        ```
+            simulator = TileSimulator()
+            simulator.start()
+
+            cw = ContourWall()
+            cw.single_new_with_port(simulator.port)
+        ```
+        """
+
+        self.identifier = identifier
+        self.baudrate = baudrate
+        self.latch_delay = latch_delay
+
+        self._master_fd, self._slave_fd = pty.openpty()
+        tty.setraw(self._slave_fd)
+        self.port: str = os.ttyname(self._slave_fd)
+
+        # LED state in wire order, `leds` is the received framebuffer and `shown_leds` what is currently shown on the LEDs
+        self.leds: np.ndarray = np.zeros(TILE_FRAME_SIZE, dtype=np.uint8)
+        self.shown_leds: np.ndarray = np.zeros(TILE_FRAME_SIZE, dtype=np.uint8)
+
+        # Statistics of the simulated tile
+        self.commands: Counter[int] = Counter()
+        self.status_codes: Counter[StatusCode] = Counter()
+        self.shown_frames: int = 0
+        self.show_timestamps: list[float] = []
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start answering commands in a background thread."""
+
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"TileSimulator{self.identifier}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the simulator and close the pseudo-terminal."""
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def dump_frame(self, shown: bool = True) -> np.ndarray:
+        """
+        Returns the framebuffer of the tile as a row-major 20x20x3 array, in the same pixel order as the wrapper uses.
+
+        shown: When True the frame which is currently shown on the LEDs is returned, otherwise the last received framebuffer.
+        """
+
+        with self._lock:
+            wire = (self.shown_leds if shown else self.leds).copy()
+        return wire[generate_index_conversion_vector()].reshape(TILE_SIZE, TILE_SIZE, 3)
+
+    def dump_wire_frame(self, shown: bool = True) -> np.ndarray:
+        """Returns the 1200 bytes of the framebuffer of the tile in the order the LEDs are wired."""
+
+        with self._lock:
+            return (self.shown_leds if shown else self.leds).copy()
+
+    def _loop(self) -> None:
+        while self._running:
+            command = self._read(1, timeout=0.1)
+            if len(command) == 0:
+                continue
+
+            self.commands[command[0]] += 1
+            if command[0] == 0:
+                self._command_0_show_pixels()
+            elif command[0] == 1:
+                self._command_1_solid_color()
+            elif command[0] == 2:
+                self._command_2_update_all()
+            elif command[0] == 3:
+                self._command_3_update_specific()
+            elif command[0] == 4:
+                self._command_4_get_tile_identifier()
+            elif command[0] == 5:
+                self._command_5_set_tile_identifier()
+            elif command[0] == 6:
+                self._write(b"Ellie")
+            else:
+                self._write(bytes([StatusCode.UNKNOWN_COMMAND]))
+
+    def _command_0_show_pixels(self) -> None:
+        with self._lock:
+            self.shown_leds[:] = self.leds
+            self.shown_frames += 1
+            self.show_timestamps.append(time.monotonic())
+
+        # FastLED.show() blocks the firmware while the LEDs latch, afterwards the RX buffer is emptied
+        time.sleep(self.latch_delay)
+        self._empty_rx_buffer()
+
+    def _command_1_solid_color(self) -> None:
+        data = self._read_bytes(4)
+        if len(data) != 4:
+            return self._finalize_command(StatusCode.TOO_SLOW)
+
+        if (data[0] + data[1] + data[2]) % 256 != data[3]:
+            return self._finalize_command(StatusCode.NON_MATCHING_CRC)
+
+        with self._lock:
+            self.leds.reshape(NUM_LEDS, 3)[:] = data[0], data[1], data[2]
+        self._finalize_command(StatusCode.OK)
+
+    def _command_2_update_all(self) -> None:
+        data = self._read_bytes(TILE_FRAME_SIZE + 1)
+        if len(data) != TILE_FRAME_SIZE + 1:
+            return self._finalize_command(StatusCode.TOO_SLOW)
+
+        if sum(data[:TILE_FRAME_SIZE]) % 256 != data[TILE_FRAME_SIZE]:
+            return self._finalize_command(StatusCode.NON_MATCHING_CRC)
+
+        with self._lock:
+            self.leds[:] = np.frombuffer(data[:TILE_FRAME_SIZE], dtype=np.uint8)
+        self._finalize_command(StatusCode.OK)
+
+    def _command_3_update_specific(self) -> None:
+        header = self._read(2, timeout=None)
+        if len(header) != 2:
+            return
+        pixel_update_count, crc = header[0], header[1]
+        if pixel_update_count != crc:
+            return self._finalize_command(StatusCode.NON_MATCHING_CRC)
+
+        self._write(bytes([StatusCode.NEXT]))
+        buffer_size = pixel_update_count * 5 + 1
+        data = self._read_bytes(buffer_size)
+        if len(data) != buffer_size:
+            return self._finalize_command(StatusCode.TOO_SLOW)
+
+        if sum(data[:-1]) % 256 != data[-1]:
+            return self._finalize_command(StatusCode.NON_MATCHING_CRC)
+
+        with self._lock:
+            for i in range(0, buffer_size - 1, 5):
+                led_index = (data[i] << 8) + data[i + 1]
+                if led_index < NUM_LEDS:
+                    self.leds[led_index * 3:led_index * 3 + 3] = data[i + 2], data[i + 3], data[i + 4]
+        self._finalize_command(StatusCode.OK)
+
+    def _command_4_get_tile_identifier(self) -> None:
+        self._write(bytes([self.identifier, self.identifier]))
+        self._finalize_command(StatusCode.OK if self.identifier else StatusCode.ERROR)
+
+    def _command_5_set_tile_identifier(self) -> None:
+        data = self._read(2, timeout=None)
+        if len(data) != 2:
+            return
+
+        identifier, crc = data[0], data[1]
+        if identifier != crc:
+            return self._finalize_command(StatusCode.NON_MATCHING_CRC)
+
+        self.identifier = identifier
+        self._finalize_command(StatusCode.OK)
+
+    def _finalize_command(self, status_code: StatusCode) -> None:
+        # The RX buffer should be empty, otherwise the firmware resets: both sides stop sending data for ~100ms
+        if self._available():
+            self.status_codes[StatusCode.RESET] += 1
+            self._write(bytes([StatusCode.RESET]))
+            time.sleep(0.060)
+            self._empty_rx_buffer()
+            time.sleep(0.020)
+        else:
+            self.status_codes[status_code] += 1
+            self._write(bytes([status_code]))
+
+    def _read_bytes(self, size: int) -> bytes:
+        """Equivalent of `while (Serial.available() < 1); Serial.readBytes(buffer, size)`"""
+
+        data = self._read(1, timeout=None)
+        return data + self._read(size - 1, timeout=SERIAL_TIMEOUT)
+
+    def _read(self, size: int, timeout: Optional[float]) -> bytes:
+        """
+        Read `size` bytes, `timeout` is the time to wait for each next byte like the Stream timeout of Arduino. None waits
+        until the simulator is stopped.
+        """
+
+        data = b""
+        while len(data) < size:
+            ready, _, _ = select.select([self._master_fd], [], [], 0.1 if timeout is None else timeout)
+            if not ready:
+                if timeout is None and self._running:
+                    continue
+                break
+
+            chunk = os.read(self._master_fd, size - len(data))
+            self._transfer_delay(len(chunk))
+            data += chunk
+        return data
+
+    def _write(self, data: bytes) -> None:
+        self._transfer_delay(len(data))
+        os.write(self._master_fd, data)
+
+    def _available(self) -> bool:
+        ready, _, _ = select.select([self._master_fd], [], [], 0)
+        return bool(ready)
+
+    def _empty_rx_buffer(self) -> None:
+        while self._available():
+            os.read(self._master_fd, 4096)
+
+    def _transfer_delay(self, size: int) -> None:
+        # Every byte takes 10 bits over the serial connection: 1 start bit, 8 data bits and 1 stop bit
+        if self.baudrate:
+            time.sleep(size * 10 / self.baudrate)
+
+class SimulatedWall:
+    def __init__(self, tiles: int = 6, baudrate: Optional[int] = 2_000_000, latch_delay: float = WS2812B_LATCH_DELAY) -> None:
+        """
+        Starts a simulated tile for every tile of the Contour Wall, the identifiers are 1 up to and including `tiles`.
+
+        Example code:
+        ```
+            wall = SimulatedWall()
+
+            cw = ContourWall()
+            cw.new_with_ports(*wall.ports)
+            cw.pixels[:] = 255, 0, 0
+            cw.show()
+
+            assert (wall.dump_frame() == cw.pixels).all()
+        ```
+        """
+
+        self.tiles = [TileSimulator(i + 1, baudrate, latch_delay) for i in range(tiles)]
+        for tile in self.tiles:
+            tile.start()
+
+    @property
+    def ports(self) -> list[str]:
+        return [tile.port for tile in self.tiles]
+
+    def dump_frame(self, shown: bool = True) -> np.ndarray:
+        """
+        Returns the frame of the full wall as a 40x60x3 array in 6 tile mode, or a 20x20x3 array in single tile mode.
+
+        The tiles are placed like the core library splits the framebuffer: tile 1 is top-left, tile 2 bottom-left, tile 3 top-center, etc.
+        """
+
+        if len(self.tiles) == 1:
+            return self.tiles[0].dump_frame(shown)
+
+        frame = np.zeros((TILE_SIZE * 2, TILE_SIZE * 3, 3), dtype=np.uint8)
+        for i, tile in enumerate(self.tiles):
+            row, column = i % 2, i // 2
+            frame[row * TILE_SIZE:(row + 1) * TILE_SIZE, column * TILE_SIZE:(column + 1) * TILE_SIZE] = tile.dump_frame(shown)
+        return frame
+
+    def stop(self) -> None:
+        for tile in self.tiles:
+            tile.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate Contour Wall tiles on pseudo-terminals")
+    parser.add_argument("--tiles", type=int, default=6, help="amount of simulated tiles")
+    parser.add_argument("--baudrate", type=int, default=2_000_000, help="simulated baudrate, 0 disables the transfer delay")
+    parser.add_argument("--latch-delay", type=float, default=WS2812B_LATCH_DELAY, help="time the LEDs take to latch, in seconds")
+    parser.add_argument("--link-dir", help="directory in which the symlinks 'tile1', 'tile2', ... to the pseudo-terminals are created")
+    parser.add_argument("--dump-dir", help="directory in which the shown frame of every tile is saved as 'tile<identifier>.npy' on exit")
+    args = parser.parse_args()
+
+    wall = SimulatedWall(args.tiles, args.baudrate or None, args.latch_delay)
+    for tile in wall.tiles:
+        print(f"Tile {tile.identifier}: {tile.port}")
+        if args.link_dir:
+            os.makedirs(args.link_dir, exist_ok=True)
+            link = os.path.join(args.link_dir, f"tile{tile.identifier}")
+            if os.path.islink(link):
+                os.remove(link)
+            os.symlink(tile.port, link)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+    for tile in wall.tiles:
+        print(f"Tile {tile.identifier}: {tile.shown_frames} shown frames, status codes: {dict(tile.status_codes)}")
+        if args.dump_dir:
+            os.makedirs(args.dump_dir, exist_ok=True)
+            np.save(os.path.join(args.dump_dir, f"tile{tile.identifier}.npy"), tile.dump_frame())
+    wall.stop()
@@ -0,0 +1,147 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+TILE_SIZE = 20
+
+Color = Sequence[int]
+
+def tile_regions(tiles_len: int, shape: tuple[int, ...]) -> np.ndarray:
+    """
+    Returns the region of the pixel array every tile shows, as rows of [top, left, bottom, right] (bottom and right are exclusive).
+
+    In 6 tile mode the tiles are ordered like `split_framebuffer` of the core library does: tile 0 is the top-left tile, tile 1
+    the bottom-left tile, tile 2 the top-center tile, etcetera. In single tile mode the tile shows the first 400 pixels of the
+    pixel array, the region of that tile covers all rows those pixels are on.
+    """
+
+    if tiles_len == 1:
+        return np.array([[0, 0, -(-TILE_SIZE * TILE_SIZE // shape[1]), shape[1]]])
+    if tiles_len == 6:
+        return np.array([
+            [(i % 2) * TILE_SIZE, (i // 2) * TILE_SIZE, (i % 2 + 1) * TILE_SIZE, (i // 2 + 1) * TILE_SIZE] for i in range(6)
+        ])
+    raise Exception(f"Amount of tiles has to be either 1 or 6, not '{tiles_len}'")
+
+class TrackedCanvas:
+    def __init__(self, pixels: np.ndarray, regions: np.ndarray) -> None:
+        """
+        Drawing API on top of a pixel array, which records which regions were drawn on.
+
+        Every drawing function marks the rectangle it touched as dirty, so the ContourWall knows which tiles changed without
+        comparing frames. Coordinates are (row, col), just like indexing the pixel array. Drawing outside of the pixel array is clipped.
+        When the pixel array is changed directly, `mark_dirty` or `mark_all_dirty` has to be called for the change to be shown.
+
+        Example code:
+        ```
+            canvas = cw.tracked_canvas()
+            canvas.rect(2, 2, 5, 5, (255, 0, 0))
+            cw.show()   # Only the top-left tile is updated
+        ```
+        """
+
+        self.pixels = pixels
+        self.dirty_rects: list[tuple[int, int, int, int]] = []
+        self._regions = regions
+        # Nothing is known about what the tiles show, so every tile starts dirty
+        self._dirty_tiles: np.ndarray = np.ones(len(regions), dtype=np.uint8)
+
+    @property
+    def dirty_tiles(self) -> np.ndarray:
+        """For every tile 1 when it has been drawn on since the last `take_dirty_tiles`, otherwise 0."""
+
+        return self._dirty_tiles.copy()
+
+    def take_dirty_tiles(self) -> np.ndarray:
+        """Returns the dirty tiles and marks all tiles as clean, this is done by `ContourWall.show`."""
+
+        dirty_tiles = self._dirty_tiles.copy()
+        self._dirty_tiles[:] = 0
+        self.dirty_rects.clear()
+        return dirty_tiles
+
+    def mark_dirty(self, row: int, col: int, height: int, width: int) -> None:
+        """Mark a rectangle as dirty, for changes that were made directly on the pixel array."""
+
+        bounds = self._clip(row, col, height, width)
+        if bounds is None:
+            return
+
+        top, left, bottom, right = bounds
+        self.dirty_rects.append((top, left, bottom - top, right - left))
+        regions = self._regions
+        self._dirty_tiles |= (
+            (top < regions[:, 2]) & (bottom > regions[:, 0]) & (left < regions[:, 3]) & (right > regions[:, 1])
+        )
+
+    def mark_all_dirty(self) -> None:
+        self.mark_dirty(0, 0, self.pixels.shape[0], self.pixels.shape[1])
+
+    def set_pixel(self, row: int, col: int, color: Color) -> None:
+        if 0 <= row < self.pixels.shape[0] and 0 <= col < self.pixels.shape[1]:
+            self.pixels[row, col] = color
+            self.mark_dirty(row, col, 1, 1)
+
+    def rect(self, row: int, col: int, height: int, width: int, color: Color) -> None:
+        """Draw a filled rectangle."""
+
+        bounds = self._clip(row, col, height, width)
+        if bounds is not None:
+            top, left, bottom, right = bounds
+            self.pixels[top:bottom, left:right] = color
+            self.mark_dirty(row, col, height, width)
+
+    def fill(self, color: Color) -> None:
+        self.pixels[:] = color
+        self.mark_all_dirty()
+
+    def blit(self, image: np.ndarray, row: int, col: int) -> None:
+        """Copy an image of shape (height, width, 3) onto the pixel array, with its top-left corner at (row, col)."""
+
+        height, width = image.shape[:2]
+        bounds = self._clip(row, col, height, width)
+        if bounds is not None:
+            top, left, bottom, right = bounds
+            self.pixels[top:bottom, left:right] = image[top - row:bottom - row, left - col:right - col]
+            self.mark_dirty(row, col, height, width)
+
+    def text(self, text: str, row: int, col: int, color: Color, character_index: dict, background: Optional[Color] = None) -> None:
+        """
+        Draw text with the characters of `character_index`, which is the index that is loaded by `font.load_character_index`.
+
+        Only the pixels of the characters are drawn in `color`, unless a `background` color is given for the other pixels.
+        Just like `font.put_text` there is one column between characters, and a new line starts 6 rows lower.
+
+        Example code:
+        ```
+            font.load_character_index()
+            canvas.text("12:34", 1, 0, (255, 255, 255), font.character_index)
+        ```
+        """
+
+        cursor_row, cursor_col = row, col
+        for c in text:
+            if c == "\n":
+                cursor_row, cursor_col = cursor_row + 6, col
+                continue
+
+            glyph, width, height = character_index[c]
+            bounds = self._clip(cursor_row, cursor_col, height, width)
+            if bounds is not None:
+                top, left, bottom, right = bounds
+                region = self.pixels[top:bottom, left:right]
+                lit = glyph[top - cursor_row:bottom - cursor_row, left - cursor_col:right - cursor_col, 0] > 0
+                if background is not None:
+                    region[:] = background
+                region[lit] = color
+                self.mark_dirty(cursor_row, cursor_col, height, width)
+            cursor_col += width + 1
+
+    def _clip(self, row: int, col: int, height: int, width: int) -> Optional[tuple[int, int, int, int]]:
+        """Returns the bounds [top, left, bottom, right] of the rectangle within the pixel array, None if it is outside of it."""
+
+        top, left = max(row, 0), max(col, 0)
+        bottom, right = min(row + height, self.pixels.shape[0]), min(col + width, self.pixels.shape[1])
+        if top >= bottom or left >= right:
+            return None
+        return top, left, bottom, right
@@ -0,0 +1,295 @@
+"""
+Video playback on the Contour Wall, with the decoding in a separate process.
+
+The decoder process reads the video, downscales every frame to the size of the wall and writes it into a ring of frames in
+shared memory. The ring holds a few frames, so a spike in decoding time is absorbed by the frames that are already decoded,
+while the process that shows the frames only copies them into the pixel array.
+
+Playing a video loop is done like this:
+```bash
+python3 video.py loop.mp4 --emulator
+```
+"""
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Event, Semaphore
+from typing import Any, Optional
+
+import cv2 as cv
+import numpy as np
+
+# Seconds the player waits for the decoder, before it checks whether the decoder is still running
+DECODER_POLL_INTERVAL = 0.5
+
+# Timestamp of a slot which marks the end of the video
+_END = -1.0
+
+class VideoStatistics:
+    def __init__(self) -> None:
+        """
+        Where the time of the played frames went, all times are totals in microseconds.
+
+        - frames: The amount of frames that were shown.
+        - dropped_frames: The amount of frames that were skipped because the wall fell behind the timestamps of the video.
+        - decode_us: The time the decoder spent reading and downscaling the frames, in the decoder process, also of the dropped frames.
+        - wait_us: The time the player waited for the decoder, which is only more than 0 when the decoder is too slow.
+        - send_us: The time spent showing the frames on the wall.
+        - late_us: The time the frames were shown after their timestamp.
+
+        Example code:
+        ```
+            statistics = player.play(cw)
+            print(statistics.breakdown())   # {'decode_us': 2210.5, 'wait_us': 0.0, 'send_us': 14012.2, 'late_us': 150.3}
+        ```
+        """
+
+        self.frames = 0
+        self.dropped_frames = 0
+        self.decode_us: float = 0
+        self.wait_us: float = 0
+        self.send_us: float = 0
+        self.late_us: float = 0
+
+    def breakdown(self) -> dict[str, float]:
+        """
+        Returns the mean time per frame of every step, in microseconds. The decoding time is per decoded frame, which includes
+        the dropped frames, the other steps are per shown frame.
+        """
+
+        frames = max(self.frames, 1)
+        breakdown = {name: getattr(self, name) / frames for name in ("decode_us", "wait_us", "send_us", "late_us")}
+        breakdown["decode_us"] = self.decode_us / max(self.frames + self.dropped_frames, 1)
+        return breakdown
+
+class VideoPlayer:
+    def __init__(self, path: str, shape: tuple[int, int] = (40, 60), capacity: int = 8, loop: bool = True) -> None:
+        """
+        Start decoding the video at `path` in a separate process, into a ring of `capacity` frames of `shape` (rows, columns).
+
+        The frames are downscaled with area interpolation, which averages all pixels of the video that fall on a pixel of the
+        wall. They are converted from the BGR order of OpenCV to the RGB order of the pixel array. With `loop` the video starts
+        over when it ends, the timestamps keep counting so the playback does not stall at the start of the video.
+
+        Example code:
+        ```
+            player = VideoPlayer("loop.mp4", shape=cw.pixels.shape[:2])
+            statistics = player.play(cw)
+            player.close()
+        ```
+        """
+
+        if capacity < 2:
+            raise Exception(f"The capacity of the video ring has to be at least 2, not '{capacity}'")
+
+        self.shape = (int(shape[0]), int(shape[1]), 3)
+        self.capacity = capacity
+        frame_size = int(np.prod(self.shape))
+
+        # The ring is the frames followed by the timestamp and decoding time of every slot
+        self._shared_memory = SharedMemory(create=True, size=capacity * (frame_size + 16))
+        self._frames, self._timestamps, self._decode_us = _ring(self._shared_memory, self.shape, capacity)
+
+        context = multiprocessing.get_context()
+        self._free: Semaphore = context.Semaphore(capacity)
+        self._filled: Semaphore = context.Semaphore(0)
+        self._stop: Event = context.Event()
+        connection, worker_connection = context.Pipe()
+        self._decoder = context.Process(
+            target=_decoder, name="ContourWallVideoDecoder", daemon=True,
+            args=(path, self.shape, capacity, loop, self._shared_memory.name, self._free, self._filled, self._stop, worker_connection),
+        )
+        self._decoder.start()
+        # Only the decoder holds the other end, so `recv` raises EOFError instead of blocking when the decoder dies
+        worker_connection.close()
+
+        # The decoder reports whether the video could be opened, with the frames per second of the video
+        try:
+            error, self.fps = connection.recv()
+        except EOFError:
+            error = f"The video decoder stopped before it opened '{path}'"
+        connection.close()
+        if error is not None:
+            self.close()
+            raise Exception(error)
+
+        self._slot = 0
+        self._ended = False
+
+    def read(self) -> Optional[tuple[np.ndarray, float, float]]:
+        """
+        Returns the next frame with its timestamp in seconds and the time it took to decode it in microseconds, or None at the
+        end of the video. The frame is a view into the ring, its slot is handed back to the decoder with `release`.
+        """
+
+        if self._ended:
+            return None
+        while not self._filled.acquire(timeout=DECODER_POLL_INTERVAL):
+            if not self._decoder.is_alive():
+                print("[Contour Wall Warning] The video decoder stopped unexpectedly")
+                self._ended = True
+                return None
+
+        slot = self._slot
+        if self._timestamps[slot] == _END:
+            self._ended = True
+            return None
+        return self._frames[slot], float(self._timestamps[slot]), float(self._decode_us[slot])
+
+    def release(self) -> None:
+        """Hand the slot of the frame returned by `read` back to the decoder."""
+
+        self._slot = (self._slot + 1) % self.capacity
+        self._free.release()
+
+    def play(self, cw: Any, frames: Optional[int] = None, speed: float = 1) -> VideoStatistics:
+        """
+        Show the video on `cw`, a `ContourWall` or `ContourWallEmulator`, paced to the timestamps of the video.
+
+        When the wall falls behind, frames which are more than one frame late are dropped instead of shown, so the video stays in
+        time. Playback stops at the end of the video, or after `frames` frames. Leave the target fps of the wall at 0, the player
+        paces the frames itself.
+        """
+
+        if speed <= 0:
+            raise Exception(f"The speed of the video has to be more than 0, not '{speed}'")
+
+        statistics = VideoStatistics()
+        frame_period = 1 / (self.fps * speed)
+        start: Optional[float] = None
+        first_timestamp = 0.0
+
+        while frames is None or statistics.frames < frames:
+            waiting = time.perf_counter()
+            frame = self.read()
+            statistics.wait_us += (time.perf_counter() - waiting) * 1_000_000
+            if frame is None:
+                break
+            pixels, timestamp, decode_us = frame
+            statistics.decode_us += decode_us
+
+            now = time.monotonic()
+            if start is None:
+                start, first_timestamp = now, timestamp
+            due = start + (timestamp - first_timestamp) / speed
+            if now > due + frame_period:
+                self.release()
+                statistics.dropped_frames += 1
+                continue
+            if due > now:
+                time.sleep(due - now)
+
+            np.copyto(cw.pixels, pixels, casting="unsafe")
+            self.release()
+            statistics.late_us += max(time.monotonic() - due, 0) * 1_000_000
+
+            sending = time.perf_counter()
+            cw.show()
+            statistics.send_us += (time.perf_counter() - sending) * 1_000_000
+            statistics.frames += 1
+
+        return statistics
+
+    def close(self) -> None:
+        """Stop the decoder and free the ring."""
+
+        self._stop.set()
+        # The decoder may be waiting for a free slot
+        self._free.release()
+        self._decoder.join(timeout=2)
+        if self._decoder.is_alive():
+            self._decoder.terminate()
+            self._decoder.join()
+
+        del self._frames, self._timestamps, self._decode_us
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+
+def _ring(shared_memory: SharedMemory, shape: tuple[int, int, int], capacity: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The frames, timestamps and decoding times of the slots of the ring, as views into the shared memory."""
+
+    frames_size = capacity * int(np.prod(shape))
+    frames = np.ndarray((capacity, *shape), dtype=np.uint8, buffer=shared_memory.buf)
+    timestamps = np.ndarray((capacity,), dtype=np.float64, buffer=shared_memory.buf, offset=frames_size)
+    decode_us = np.ndarray((capacity,), dtype=np.float64, buffer=shared_memory.buf, offset=frames_size + capacity * 8)
+    return frames, timestamps, decode_us
+
+def _decoder(path: str, shape: tuple[int, int, int], capacity: int, loop: bool, shared_memory_name: str, free: Semaphore, filled: Semaphore, stop: Event, connection: Connection) -> None:
+    """Process which decodes the video into the ring, a slot is only written after the player handed it back."""
+
+    capture = cv.VideoCapture(path)
+    if not capture.isOpened():
+        connection.send((f"The video '{path}' could not be opened", 0))
+        return
+    fps = capture.get(cv.CAP_PROP_FPS)
+    fps = fps if fps > 0 else 30
+    connection.send((None, fps))
+
+    shared_memory = SharedMemory(name=shared_memory_name)
+    frames, timestamps, decode_us = _ring(shared_memory, shape, capacity)
+
+    slot = 0
+    offset = 0.0       # The duration of the loops that have been played
+    timestamp = -1 / fps
+    looped_frames = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        ok, frame = capture.read()
+        if not ok:
+            # A video of which no frame could be read since it started over, cannot be looped
+            if loop and looped_frames > 0:
+                offset = timestamp + 1 / fps
+                looped_frames = 0
+                capture.set(cv.CAP_PROP_POS_FRAMES, 0)
+                continue
+            timestamp = _END
+        else:
+            looped_frames += 1
+            # Not every container has timestamps, the frame rate is used for those
+            position = capture.get(cv.CAP_PROP_POS_MSEC) / 1000 + offset
+            timestamp = position if position > timestamp else timestamp + 1 / fps
+        read_us = (time.perf_counter() - start) * 1_000_000
+
+        # Waiting for a free slot does not count as decoding time
+        free.acquire()
+        if stop.is_set():
+            break
+        start = time.perf_counter()
+        if timestamp != _END:
+            cv.resize(frame, (shape[1], shape[0]), dst=frames[slot], interpolation=cv.INTER_AREA)
+            cv.cvtColor(frames[slot], cv.COLOR_BGR2RGB, dst=frames[slot])
+        timestamps[slot] = timestamp
+        decode_us[slot] = read_us + (time.perf_counter() - start) * 1_000_000
+        filled.release()
+        slot = (slot + 1) % capacity
+        if timestamp == _END:
+            break
+
+    capture.release()
+    del frames, timestamps, decode_us
+    shared_memory.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a video on the Contour Wall")
+    parser.add_argument("path", help="The video to play")
+    parser.add_argument("--emulator", action="store_true", help="Play the video on the emulator instead of the Contour Wall")
+    parser.add_argument("--once", action="store_true", help="Stop at the end of the video instead of looping it")
+    args = parser.parse_args()
+
+    if args.emulator:
+        from contourwall_emulator import ContourWallEmulator
+        cw: Any = ContourWallEmulator()
+    else:
+        from contourwall import ContourWall
+        cw = ContourWall()
+        cw.new()
+
+    player = VideoPlayer(args.path, shape=cw.pixels.shape[:2], loop=not args.once)
+    try:
+        statistics = player.play(cw)
+        print(f"{statistics.frames} frames shown, {statistics.dropped_frames} dropped: {statistics.breakdown()}")
+    finally:
+        player.close()